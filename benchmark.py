@@ -0,0 +1,294 @@
+import argparse
+import json
+import os
+import statistics
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Tamanhos de ledger sintético do benchmark completo
+TAMANHOS = {
+    'pequeno': {'anos': 1, 'n_maquinas': 3, 'n_contratos': 5},
+    'medio': {'anos': 3, 'n_maquinas': 20, 'n_contratos': 50},
+    'grande': {'anos': 10, 'n_maquinas': 100, 'n_contratos': 500},
+}
+
+# Mesma variável de main.VAR_MEDIR_INICIALIZACAO (main.py não pode ser importado: abre a interface)
+VAR_MEDIR_INICIALIZACAO = 'SGF_MEDIR_INICIALIZACAO'
+
+
+def _cronometrar(funcao, repeticoes):
+    """Executa a função 'repeticoes' vezes e retorna os tempos (s)."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def _resumo(tempos):
+    return {
+        'mediana_s': round(statistics.median(tempos), 4),
+        'min_s': round(min(tempos), 4),
+        'max_s': round(max(tempos), 4),
+        'repeticoes': len(tempos),
+    }
+
+
+def serie_sintetica(dias, seed=42):
+    """Gera um histórico diário (ds, y) com tendência, sazonalidade semanal/anual e ruído."""
+    rng = np.random.default_rng(seed)
+    ds = pd.date_range(end=pd.Timestamp(datetime.now().date()) - pd.Timedelta(days=1), periods=dias, freq='D')
+    t = np.arange(dias)
+    semanal = np.where(ds.dayofweek < 5, 1500.0, -300.0) # Dias úteis x fim de semana
+    anual = 400.0 * np.sin(2 * np.pi * t / 365.25)
+    y = 200.0 + 0.5 * t + semanal + anual + rng.normal(0, 250.0, dias)
+    return pd.DataFrame({'ds': ds, 'y': y})
+
+
+def benchmark_warm_start(dias_historico=3 * 365, dias_novos=7, repeticoes=3, seed=42):
+    """
+    Compara o ajuste do zero com o ajuste incremental (warm start) do Prophet
+    quando apenas 'dias_novos' dias foram acrescentados ao histórico.
+    """
+    from prophet import Prophet
+    from prophet_model import MODEL_CONFIG, _parametros_warm_start, silenciar_logs_stan
+
+    silenciar_logs_stan()
+
+    df_completo = serie_sintetica(dias_historico + dias_novos, seed=seed)
+    df_anterior = df_completo.iloc[:dias_historico]
+
+    # Ajuste "de ontem", cujos parâmetros servem de ponto de partida
+    modelo_anterior = Prophet(**MODEL_CONFIG).fit(df_anterior)
+    init = _parametros_warm_start(modelo_anterior)
+
+    frio = _cronometrar(lambda: Prophet(**MODEL_CONFIG).fit(df_completo), repeticoes)
+    quente = _cronometrar(lambda: Prophet(**MODEL_CONFIG).fit(df_completo, init=init), repeticoes)
+
+    return {
+        'dias_historico': dias_historico,
+        'dias_novos': dias_novos,
+        'ajuste_do_zero': _resumo(frio),
+        'warm_start': _resumo(quente),
+        'aceleracao': round(statistics.median(frio) / statistics.median(quente), 2),
+    }
+
+
+def benchmark_simulacao(n_caminhos=10000, horizonte_dias=365, repeticoes=3, seed=42):
+    """Mede a simulação de Monte Carlo do saldo (caminhos x dias) sobre uma série sintética."""
+    from simulacao import simular_saldo
+
+    df_fluxo = serie_sintetica(365 + horizonte_dias, seed=seed)
+    df_fluxo['y_receita'] = df_fluxo['y'].clip(lower=0)
+    df_fluxo['y_despesa'] = 800.0
+    hoje = (df_fluxo['ds'].iloc[-1] - pd.Timedelta(days=horizonte_dias - 1)).date()
+
+    tempos = _cronometrar(
+        lambda: simular_saldo(df_fluxo, hoje=hoje, n_caminhos=n_caminhos, seed=seed),
+        repeticoes,
+    )
+    return {
+        'n_caminhos': n_caminhos,
+        'horizonte_dias': horizonte_dias,
+        'simular_saldo': _resumo(tempos),
+    }
+
+
+def extrato_sintetico(caminho, n_linhas, seed=42):
+    """Grava um extrato CSV no formato de banco (';', datas DD/MM/AAAA, valores '1.234,56' com sinal)."""
+    rng = np.random.default_rng(seed)
+    datas = pd.Timestamp(datetime.now().date()) - pd.to_timedelta(np.sort(rng.integers(0, 31, n_linhas))[::-1], unit='D')
+    valores = rng.normal(0, 2000.0, n_linhas).round(2)
+    historicos = np.where(valores < 0, 'Pagamento fornecedor ', 'Máquina ') + (np.arange(n_linhas) % 100).astype(str)
+    texto_valores = pd.Series(valores).map('{:,.2f}'.format).str.translate(str.maketrans(',.', '.,'))
+    pd.DataFrame({'Data': datas.strftime('%d/%m/%Y'), 'Histórico': historicos, 'Valor (R$)': texto_valores}).to_csv(
+        caminho, sep=';', index=False, encoding='cp1252'
+    )
+
+
+def benchmark_importacao(n_linhas=50000, repeticoes=3, seed=42):
+    """
+    Mede a importação de um extrato CSV de 'n_linhas' (um mês) em um banco vazio
+    e a reimportação do mesmo arquivo (todas as linhas reconhecidas como repetidas).
+    """
+    from database import DatabaseManager
+    from importacao import importar_arquivo
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, 'extrato.csv')
+        extrato_sintetico(caminho, n_linhas, seed)
+        tamanho_arquivo = os.path.getsize(caminho)
+
+        tempos_importacao, tempos_reimportacao = [], []
+        for repeticao in range(repeticoes):
+            db_manager = DatabaseManager(os.path.join(diretorio, f'importacao_{repeticao}.db'))
+            try:
+                db_manager.carregar_ledger()
+                tempos_importacao += _cronometrar(lambda: importar_arquivo(db_manager, caminho), 1)
+                tempos_reimportacao += _cronometrar(lambda: importar_arquivo(db_manager, caminho), 1)
+            finally:
+                db_manager.close()
+
+    return {
+        'linhas': n_linhas,
+        'bytes': tamanho_arquivo,
+        'importacao': dict(_resumo(tempos_importacao), linhas_por_s=round(n_linhas / statistics.median(tempos_importacao), 1)),
+        'reimportacao': _resumo(tempos_reimportacao),
+    }
+
+
+def benchmark_inicializacao(repeticoes=3):
+    """
+    Mede o tempo até a primeira janela (menu principal) de 'main.py'.
+
+    Cada repetição é um processo novo (partida a frio do interpretador). O
+    aplicativo é iniciado com a variável de ambiente de medição, que faz o
+    menu imprimir o próprio tempo e fechar. Requer um display gráfico.
+    """
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    ambiente = dict(os.environ, **{VAR_MEDIR_INICIALIZACAO: '1'})
+
+    tempos_processo = []
+    tempos_janela = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = subprocess.run(
+            [sys.executable, 'main.py'], cwd=diretorio, env=ambiente,
+            capture_output=True, text=True, timeout=120,
+        )
+        tempos_processo.append(time.perf_counter() - inicio)
+        if resultado.returncode != 0:
+            raise RuntimeError(f"main.py terminou com erro:\n{resultado.stderr}")
+
+        for linha in resultado.stdout.splitlines():
+            if linha.startswith('TEMPO_PRIMEIRA_JANELA_S='):
+                tempos_janela.append(float(linha.split('=', 1)[1]))
+
+    return {
+        'primeira_janela': _resumo(tempos_janela) if tempos_janela else None,
+        'processo_completo': _resumo(tempos_processo),
+    }
+
+
+def benchmark_tamanho(nome, anos, n_maquinas, n_contratos, horizonte_dias=180, repeticoes=3, seed=42):
+    """
+    Mede os caminhos críticos em um banco descartável com um ledger sintético:
+    inserção em lote, get_prophet_data, run_prophet_forecast, o motor rápido
+    (run_previsao_rapida) e serialização do gráfico.
+    """
+    from database import DatabaseManager
+    from populate_db import gerar_ledger_sintetico
+    from previsao_rapida import run_previsao_rapida
+    from prophet_model import run_prophet_forecast, silenciar_logs_stan
+    import graficos
+
+    silenciar_logs_stan()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        db_manager = DatabaseManager(os.path.join(diretorio, 'benchmark.db'))
+        try:
+            inicio = time.perf_counter()
+            totais = gerar_ledger_sintetico(db_manager, anos=anos, n_maquinas=n_maquinas,
+                                            n_contratos=n_contratos, seed=seed)
+            tempo_insercao = time.perf_counter() - inicio
+
+            df_prophet_data = db_manager.get_prophet_data(horizonte_dias=horizonte_dias)
+            tempos_dados = _cronometrar(
+                lambda: db_manager.get_prophet_data(horizonte_dias=horizonte_dias, usar_cache=False), repeticoes
+            )
+            # Mesmas consultas lendo do SQLite em vez do ledger em memória
+            db_sql = DatabaseManager(os.path.join(diretorio, 'benchmark.db'), ledger_em_memoria=False)
+            try:
+                tempos_dados_sql = _cronometrar(
+                    lambda: db_sql.get_prophet_data(horizonte_dias=horizonte_dias, usar_cache=False), repeticoes
+                )
+            finally:
+                db_sql.close()
+            # Janela reaberta sem gravações no meio: resultado vem do cache de consultas
+            tempos_dados_cache = _cronometrar(lambda: db_manager.get_prophet_data(horizonte_dias=horizonte_dias), repeticoes)
+
+            # Sem cache nem warm start: mede o ajuste completo
+            df_y = df_prophet_data[['ds', 'y']]
+            tempos_previsao = _cronometrar(
+                lambda: run_prophet_forecast(df_y, periods=horizonte_dias, usar_cache=False, warm_start=False),
+                repeticoes,
+            )
+            tempos_previsao_rapida = _cronometrar(lambda: run_previsao_rapida(df_y, periods=horizonte_dias), repeticoes)
+
+            caminho_grafico = os.path.join(diretorio, 'grafico.html')
+            tempos_grafico = _cronometrar(
+                lambda: graficos.salvar_grafico_previsao(df_prophet_data, '#E65100', '#C62828', plot_file=caminho_grafico),
+                repeticoes,
+            )
+            tamanho_grafico = os.path.getsize(caminho_grafico)
+        finally:
+            db_manager.close()
+
+    return {
+        'tamanho': nome,
+        'parametros': {'anos': anos, 'n_maquinas': n_maquinas, 'n_contratos': n_contratos, 'horizonte_dias': horizonte_dias},
+        'linhas': totais,
+        'insercao_em_lote': {
+            'tempo_s': round(tempo_insercao, 4),
+            'linhas_por_s': round((totais['entradas'] + totais['despesas']) / tempo_insercao, 1),
+        },
+        'get_prophet_data': _resumo(tempos_dados),
+        'get_prophet_data_sql': _resumo(tempos_dados_sql),
+        'get_prophet_data_cache': _resumo(tempos_dados_cache),
+        'run_prophet_forecast': _resumo(tempos_previsao),
+        'run_previsao_rapida': _resumo(tempos_previsao_rapida),
+        'grafico_html': dict(_resumo(tempos_grafico), bytes=tamanho_grafico),
+    }
+
+
+def benchmark_suite(tamanhos=('pequeno', 'medio'), repeticoes=3):
+    """Executa benchmark_tamanho para cada tamanho e inclui metadados do ambiente."""
+    return {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'ambiente': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+        },
+        'resultados': [benchmark_tamanho(nome, repeticoes=repeticoes, **TAMANHOS[nome]) for nome in tamanhos],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks dos caminhos críticos do sistema.')
+    parser.add_argument('benchmark', choices=['suite', 'warm-start', 'startup', 'simulacao', 'importacao'], help='Benchmark a executar.')
+    parser.add_argument('--repeticoes', type=int, default=3, help='Repetições de cada medição (padrão: 3).')
+    parser.add_argument('--tamanhos', default='pequeno,medio',
+                        help=f"Tamanhos do ledger para 'suite', separados por vírgula ({', '.join(TAMANHOS)}).")
+    parser.add_argument('--saida', default=None, help='Grava o resultado em JSON neste arquivo (além de imprimir).')
+    args = parser.parse_args()
+
+    if args.benchmark == 'suite':
+        tamanhos = [t.strip() for t in args.tamanhos.split(',') if t.strip()]
+        invalidos = [t for t in tamanhos if t not in TAMANHOS]
+        if invalidos:
+            parser.error(f"Tamanho(s) desconhecido(s): {', '.join(invalidos)}")
+        resultado = benchmark_suite(tamanhos, repeticoes=args.repeticoes)
+    elif args.benchmark == 'warm-start':
+        resultado = benchmark_warm_start(repeticoes=args.repeticoes)
+    elif args.benchmark == 'startup':
+        resultado = benchmark_inicializacao(repeticoes=args.repeticoes)
+    elif args.benchmark == 'simulacao':
+        resultado = benchmark_simulacao(repeticoes=args.repeticoes)
+    elif args.benchmark == 'importacao':
+        resultado = benchmark_importacao(repeticoes=args.repeticoes)
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto)
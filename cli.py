@@ -0,0 +1,387 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+
+from motores_previsao import MOTORES, MOTOR_PADRAO
+
+# Interface de linha de comando (sem interface gráfica): pode rodar em agendadores
+# (cron, Agendador de Tarefas) e em servidores sem display. Não importa tkinter.
+# Cada comando faz poucas consultas e encerra, então lê direto do SQLite
+# (ledger_em_memoria=False) em vez de carregar o ledger inteiro em memória.
+
+# Formatos de saída aceitos (inferidos pela extensão do arquivo quando não informados)
+FORMATOS_SAIDA = ['csv', 'parquet', 'json']
+
+
+def parse_data(texto):
+    """Aceita DD/MM/AAAA (formato da interface) ou AAAA-MM-DD."""
+    for formato in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"Data inválida '{texto}'. Use DD/MM/AAAA ou AAAA-MM-DD.")
+
+
+def gravar_dataframe(df, caminho, formato=None):
+    """Grava o DataFrame em CSV, Parquet ou JSON (registros, datas ISO)."""
+    formato = formato or os.path.splitext(caminho)[1].lstrip('.').lower()
+    if formato == 'csv':
+        df.to_csv(caminho, index=False, date_format='%Y-%m-%d')
+    elif formato == 'parquet':
+        # Requer pyarrow ou fastparquet (dependência opcional)
+        df.to_parquet(caminho, index=False)
+    elif formato == 'json':
+        df.to_json(caminho, orient='records', date_format='iso', indent=2)
+    else:
+        raise ValueError(f"Formato de saída desconhecido '{formato}'. Use: {', '.join(FORMATOS_SAIDA)}.")
+
+
+def caminho_saida(saida, db_path, formato, varios_bancos):
+    """Com vários bancos, 'saida' é um diretório e cada banco gera '<banco>_previsao.<formato>'."""
+    if not varios_bancos:
+        return saida
+    os.makedirs(saida, exist_ok=True)
+    nome = os.path.splitext(os.path.basename(db_path))[0]
+    return os.path.join(saida, f"{nome}_previsao.{formato}")
+
+
+def prever_banco(db_path, horizonte_dias, data_referencia, por_maquina=False, maquinas=None,
+                 usar_feriados=True, regiao_feriados=None, motor='prophet'):
+    """
+    Gera a previsão de um banco, no mesmo formato da janela de previsão
+    ('ds', 'yhat', 'yhat_lower', 'yhat_upper', 'y_receita', 'y_despesa').
+    Com por_maquina=True, retorna o formato longo de motores_previsao.prever_por_maquina
+    (apenas das 'maquinas' informadas, se houver). 'motor' é uma chave de motores_previsao.MOTORES.
+    """
+    import pandas as pd
+    from database import DatabaseManager
+    from motores_previsao import prever, prever_por_maquina
+
+    if motor == 'prophet':
+        from prophet_model import silenciar_logs_stan
+        # Mantém a saída limpa em execuções agendadas
+        silenciar_logs_stan()
+
+    db_manager = DatabaseManager(db_path, ledger_em_memoria=False)
+    try:
+        if por_maquina:
+            series = db_manager.get_prophet_data_por_maquina(horizonte_dias=horizonte_dias, data_referencia=data_referencia,
+                                                             maquinas=maquinas)
+            return prever_por_maquina(series, periods=horizonte_dias, motor=motor, data_referencia=data_referencia,
+                                      usar_feriados=usar_feriados, regiao_feriados=regiao_feriados)
+
+        df_prophet_data = db_manager.get_prophet_data(horizonte_dias=horizonte_dias, data_referencia=data_referencia)
+    finally:
+        db_manager.close()
+
+    df_forecast = prever(df_prophet_data[['ds', 'y']], periods=horizonte_dias, motor=motor, data_referencia=data_referencia,
+                         usar_feriados=usar_feriados, regiao_feriados=regiao_feriados)
+    if df_forecast.empty:
+        return df_forecast
+
+    # Combina a previsão (yhat) com as receitas e despesas projetadas, como na interface
+    return pd.merge(df_forecast, df_prophet_data[['ds', 'y_receita', 'y_despesa']], on='ds', how='left')
+
+
+def comando_prever(args):
+    if args.formato is None:
+        if len(args.db) > 1:
+            args.formato = 'csv'
+        else:
+            args.formato = os.path.splitext(args.saida)[1].lstrip('.').lower()
+            if args.formato not in FORMATOS_SAIDA:
+                print(f"ERRO: Não foi possível inferir o formato de '{args.saida}'. Use --formato.")
+                return 1
+
+    falhas = 0
+    for db_path in args.db:
+        if not os.path.exists(db_path):
+            print(f"ERRO: Banco de dados '{db_path}' não encontrado.")
+            falhas += 1
+            continue
+        try:
+            df_resultado = prever_banco(db_path, args.horizonte, args.data_base,
+                                        por_maquina=args.por_maquina or bool(args.maquina), maquinas=args.maquina,
+                                        usar_feriados=not args.sem_feriados, regiao_feriados=args.regiao_feriados,
+                                        motor=args.motor)
+            if df_resultado.empty:
+                print(f"ERRO: Nenhuma previsão gerada para '{db_path}'.")
+                falhas += 1
+                continue
+            destino = caminho_saida(args.saida, db_path, args.formato, len(args.db) > 1)
+            gravar_dataframe(df_resultado, destino, args.formato)
+            print(f"✅ Previsão de '{db_path}' gravada em '{destino}' ({len(df_resultado)} linhas).")
+        except Exception as e:
+            print(f"ERRO: Falha ao gerar a previsão de '{db_path}': {e}")
+            falhas += 1
+
+    return 1 if falhas else 0
+
+
+def comando_exportar(args):
+    from database import DatabaseManager
+    from exportacao import FORMATOS_EXPORTACAO, exportar_ledger
+
+    if not os.path.exists(args.db):
+        print(f"ERRO: Banco de dados '{args.db}' não encontrado.")
+        return 1
+
+    formato = args.formato or os.path.splitext(args.saida)[1].lstrip('.').lower()
+    if formato not in FORMATOS_EXPORTACAO:
+        print(f"ERRO: Não foi possível inferir o formato de '{args.saida}'. Use --formato.")
+        return 1
+
+    db_manager = DatabaseManager(args.db, ledger_em_memoria=False)
+    try:
+        total = exportar_ledger(
+            db_manager, args.saida, formato,
+            data_inicio=args.inicio, data_fim=args.fim,
+            expandir_recorrentes=args.expandir_recorrencias, tamanho_lote=args.lote,
+        )
+    except Exception as e:
+        print(f"ERRO: Falha ao exportar '{args.db}': {e}")
+        return 1
+    finally:
+        db_manager.close()
+
+    print(f"✅ {total} lançamentos de '{args.db}' exportados para '{args.saida}'.")
+    return 0
+
+
+def comando_importar(args):
+    from database import DatabaseManager
+    from importacao import FORMATOS_IMPORTACAO, importar_arquivo
+
+    if not os.path.exists(args.arquivo):
+        print(f"ERRO: Arquivo '{args.arquivo}' não encontrado.")
+        return 1
+
+    formato = args.formato or os.path.splitext(args.arquivo)[1].lstrip('.').lower()
+    if formato not in FORMATOS_IMPORTACAO:
+        print(f"ERRO: Não foi possível inferir o formato de '{args.arquivo}'. Use --formato.")
+        return 1
+
+    def mostrar_progresso(linhas, bytes_lidos, bytes_total):
+        print(f"  {linhas} linhas lidas ({bytes_lidos / max(bytes_total, 1):.0%})")
+
+    db_manager = DatabaseManager(args.db, ledger_em_memoria=False)
+    try:
+        resumo = importar_arquivo(
+            db_manager, args.arquivo, formato, maquina_padrao=args.maquina,
+            tamanho_bloco=args.bloco, progresso=mostrar_progresso,
+        )
+    except Exception as e:
+        print(f"ERRO: Falha ao importar '{args.arquivo}': {e}")
+        return 1
+    finally:
+        db_manager.close()
+
+    print(f"✅ '{args.arquivo}' importado em '{args.db}': {resumo['entradas']} entradas, {resumo['despesas']} despesas "
+          f"({resumo['duplicadas']} repetidas e {resumo['invalidas']} inválidas ignoradas).")
+    if resumo['ocorrencias_expandidas']:
+        print(f"  {resumo['ocorrencias_expandidas']} ocorrências de despesas recorrentes expandidas ignoradas.")
+    for linha, motivo in resumo['linhas_invalidas']:
+        print(f"  Linha {linha}: {motivo}")
+    return 0
+
+
+def comando_simular(args):
+    from database import DatabaseManager
+    from simulacao import simular_saldo
+
+    if not os.path.exists(args.db):
+        print(f"ERRO: Banco de dados '{args.db}' não encontrado.")
+        return 1
+
+    db_manager = DatabaseManager(args.db, ledger_em_memoria=False)
+    try:
+        df_fluxo = db_manager.get_prophet_data(horizonte_dias=args.horizonte, data_referencia=args.data_base)
+    finally:
+        db_manager.close()
+
+    df_saldo, resumo = simular_saldo(
+        df_fluxo, hoje=args.data_base, saldo_inicial=args.saldo_inicial,
+        n_caminhos=args.caminhos, seed=args.seed,
+    )
+
+    print(f"Simulação: {resumo['n_caminhos']} caminhos, {resumo['dias']} dias, saldo inicial R$ {resumo['saldo_inicial']:.2f}")
+    print(f"Probabilidade de saldo negativo em algum dia do período: {resumo['prob_negativo_no_periodo']:.1%}")
+    for percentil, valor in resumo['saldo_final'].items():
+        print(f"  Saldo final {percentil}: R$ {valor:.2f}")
+
+    if args.saida:
+        try:
+            gravar_dataframe(df_saldo, args.saida, args.formato)
+        except Exception as e:
+            print(f"ERRO: Falha ao gravar '{args.saida}': {e}")
+            return 1
+        print(f"✅ Saldos diários gravados em '{args.saida}'.")
+    return 0
+
+
+def comando_backtest(args):
+    from database import DatabaseManager
+    from prophet_model import run_backtest, silenciar_logs_stan
+
+    silenciar_logs_stan()
+
+    if not os.path.exists(args.db):
+        print(f"ERRO: Banco de dados '{args.db}' não encontrado.")
+        return 1
+
+    db_manager = DatabaseManager(args.db, ledger_em_memoria=False)
+    try:
+        df_prophet_data = db_manager.get_prophet_data(horizonte_dias=0, data_referencia=args.data_base,
+                                                      anos_historico=args.anos)
+    finally:
+        db_manager.close()
+
+    metricas = run_backtest(
+        df_prophet_data, horizonte_dias=args.horizonte, inicial_dias=args.inicial, periodo_dias=args.periodo,
+        data_referencia=args.data_base, usar_cache=not args.sem_cache,
+        usar_feriados=not args.sem_feriados, regiao_feriados=args.regiao_feriados,
+    )
+    if metricas.empty:
+        return 1
+
+    # Resumo em faixas de 30 dias de horizonte (o arquivo de saída tem todos os dias)
+    faixas = ((metricas['horizonte_dias'] - 1) // 30) * 30 + 1
+    # WAPE da faixa: soma dos erros sobre a soma dos |y| de todas as previsões da faixa
+    ponderadas = metricas.assign(erro_total=metricas['mae'] * metricas['n'],
+                                 abs_y_total=metricas['media_abs_y'] * metricas['n'])
+    resumo = ponderadas.groupby(faixas).agg(mae=('mae', 'mean'), erro_total=('erro_total', 'sum'),
+                                            abs_y_total=('abs_y_total', 'sum'), cobertura=('cobertura', 'mean'))
+    resumo['wape'] = resumo['erro_total'] / resumo['abs_y_total']
+    print(f"{'Horizonte':>12} {'MAE (R$)':>12} {'WAPE':>8} {'Cobertura':>10}")
+    for inicio, linha in resumo.iterrows():
+        fim = min(inicio + 29, int(metricas['horizonte_dias'].max()))
+        print(f"{f'{inicio}-{fim} dias':>12} {linha['mae']:>12.2f} {linha['wape']:>8.1%} {linha['cobertura']:>10.1%}")
+
+    if args.saida:
+        try:
+            gravar_dataframe(metricas, args.saida, args.formato)
+        except Exception as e:
+            print(f"ERRO: Falha ao gravar '{args.saida}': {e}")
+            return 1
+        print(f"✅ Métricas por horizonte gravadas em '{args.saida}'.")
+    return 0
+
+
+def adicionar_opcoes_feriados(subparser):
+    subparser.add_argument('--sem-feriados', action='store_true', help='Não modela os feriados.')
+    subparser.add_argument('--regiao-feriados', default=None,
+                           help='Inclui os feriados de uma UF (ex: SP) ou município (ex: "São Paulo Capital").')
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description='Sistema de Gestão da Frota - comandos sem interface gráfica.')
+    parser.add_argument('--diagnostico', action='store_true',
+                        help='Mede os tempos das etapas e imprime o resumo ao final (log em diagnostico.jsonl).')
+    parser.add_argument('--perfil', action='store_true',
+                        help='Com --diagnostico, grava também capturas do cProfile.')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    prever = subparsers.add_parser('prever', help='Gera a previsão de fluxo de caixa e grava em arquivo.')
+    prever.add_argument('--db', action='append', required=True,
+                        help='Arquivo do banco de dados (repita a opção para vários bancos).')
+    prever.add_argument('--horizonte', type=int, default=180, help='Dias de previsão (padrão: 180).')
+    prever.add_argument('--data-base', type=parse_data, default=None,
+                        help='Data de referência ("hoje" da previsão), DD/MM/AAAA ou AAAA-MM-DD (padrão: hoje).')
+    prever.add_argument('--saida', required=True,
+                        help='Arquivo de saída; com vários --db, um diretório (um arquivo por banco).')
+    prever.add_argument('--formato', choices=FORMATOS_SAIDA, default=None,
+                        help='Formato de saída (padrão: extensão do arquivo; csv para vários bancos).')
+    prever.add_argument('--por-maquina', action='store_true',
+                        help='Ajusta um modelo por máquina, em paralelo, e inclui o total da frota.')
+    prever.add_argument('--maquina', action='append', default=None,
+                        help='Prevê apenas esta máquina (repita a opção para várias; implica --por-maquina).')
+    prever.add_argument('--motor', choices=list(MOTORES), default=MOTOR_PADRAO,
+                        help=f'Motor de previsão: prophet (completo) ou rapido (Holt-Winters em NumPy, '
+                             f'milissegundos por série) (padrão: {MOTOR_PADRAO}).')
+    adicionar_opcoes_feriados(prever)
+    prever.set_defaults(funcao=comando_prever)
+
+    exportar = subparsers.add_parser('exportar', help='Exporta entradas e despesas para CSV ou Parquet (em fluxo).')
+    exportar.add_argument('--db', required=True, help='Arquivo do banco de dados.')
+    exportar.add_argument('--saida', required=True, help='Arquivo de saída (.csv ou .parquet).')
+    exportar.add_argument('--formato', choices=['csv', 'parquet'], default=None,
+                          help='Formato de saída (padrão: extensão do arquivo).')
+    exportar.add_argument('--inicio', type=parse_data, default=None, help='Data inicial (DD/MM/AAAA ou AAAA-MM-DD).')
+    exportar.add_argument('--fim', type=parse_data, default=None, help='Data final (DD/MM/AAAA ou AAAA-MM-DD).')
+    exportar.add_argument('--expandir-recorrencias', action='store_true',
+                          help='Uma linha por ocorrência das despesas recorrentes (até --fim, ou até hoje).')
+    exportar.add_argument('--lote', type=int, default=5000,
+                          help='Linhas lidas do banco por vez (padrão: 5000).')
+    exportar.set_defaults(funcao=comando_exportar)
+
+    importar = subparsers.add_parser('importar', help='Importa um extrato OFX ou uma planilha CSV (em blocos, sem repetir lançamentos).')
+    importar.add_argument('--db', required=True, help='Arquivo do banco de dados (criado se não existir).')
+    importar.add_argument('arquivo', help='Arquivo de entrada (.csv ou .ofx).')
+    importar.add_argument('--formato', choices=['csv', 'ofx'], default=None,
+                          help='Formato de entrada (padrão: extensão do arquivo).')
+    importar.add_argument('--maquina', default=None,
+                          help='Máquina das entradas sem máquina informada (padrão no OFX: "Extrato bancário").')
+    importar.add_argument('--bloco', type=int, default=20000,
+                          help='Linhas lidas e gravadas por vez (padrão: 20000).')
+    importar.set_defaults(funcao=comando_importar)
+
+    simular = subparsers.add_parser('simular', help='Simula o saldo de caixa (Monte Carlo) e a chance de ficar negativo.')
+    simular.add_argument('--db', required=True, help='Arquivo do banco de dados.')
+    simular.add_argument('--saldo-inicial', type=float, default=0.0, help='Saldo em caixa hoje, em R$ (padrão: 0).')
+    simular.add_argument('--horizonte', type=int, default=365, help='Dias simulados (padrão: 365).')
+    simular.add_argument('--caminhos', type=int, default=10000, help='Trajetórias sorteadas (padrão: 10000).')
+    simular.add_argument('--seed', type=int, default=None, help='Semente aleatória (resultado reproduzível).')
+    simular.add_argument('--data-base', type=parse_data, default=None,
+                         help='Data de referência ("hoje"), DD/MM/AAAA ou AAAA-MM-DD (padrão: hoje).')
+    simular.add_argument('--saida', default=None, help='Grava os percentis de saldo por dia neste arquivo (opcional).')
+    simular.add_argument('--formato', choices=FORMATOS_SAIDA, default=None,
+                         help='Formato de saída (padrão: extensão do arquivo).')
+    simular.set_defaults(funcao=comando_simular)
+
+    backtest = subparsers.add_parser('backtest', help='Mede a precisão da previsão no histórico (origem móvel, em paralelo).')
+    backtest.add_argument('--db', required=True, help='Arquivo do banco de dados.')
+    backtest.add_argument('--horizonte', type=int, default=180, help='Dias previstos a partir de cada corte (padrão: 180).')
+    backtest.add_argument('--inicial', type=int, default=None,
+                          help='Dias de histórico antes do primeiro corte (padrão: 3x o horizonte).')
+    backtest.add_argument('--periodo', type=int, default=None, help='Dias entre cortes (padrão: metade do horizonte).')
+    backtest.add_argument('--anos', type=int, default=3, help='Anos de histórico lidos do banco (padrão: 3).')
+    backtest.add_argument('--data-base', type=parse_data, default=None,
+                          help='Data de referência ("hoje"), DD/MM/AAAA ou AAAA-MM-DD (padrão: hoje).')
+    backtest.add_argument('--sem-cache', action='store_true', help='Ignora o resultado em cache e refaz o backtest.')
+    backtest.add_argument('--saida', default=None, help='Grava as métricas por horizonte neste arquivo (opcional).')
+    backtest.add_argument('--formato', choices=FORMATOS_SAIDA, default=None,
+                          help='Formato de saída (padrão: extensão do arquivo).')
+    adicionar_opcoes_feriados(backtest)
+    backtest.set_defaults(funcao=comando_backtest)
+
+    return parser
+
+
+def imprimir_diagnostico():
+    import diagnostico
+
+    dados = diagnostico.resumo()
+    print(f"\n{'Etapa':<40} {'Chamadas':>9} {'Total (ms)':>11} {'Média (ms)':>11} {'Máx (ms)':>10}")
+    for m in dados['metricas']:
+        print(f"{m['nome']:<40} {m['chamadas']:>9} {m['total_ms']:>11.1f} {m['media_ms']:>11.1f} {m['max_ms']:>10.1f}")
+    for nome, valor in sorted(dados['contadores'].items()):
+        print(f"{nome}: {valor}")
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    if args.diagnostico:
+        import diagnostico
+        diagnostico.ativar(True, perfil=args.perfil)
+
+    codigo = args.funcao(args)
+
+    if args.diagnostico:
+        imprimir_diagnostico()
+    return codigo
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,58 +1,689 @@
+import os
 import sqlite3
-from datetime import datetime, timedelta
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from datetime import datetime
 from dateutil.relativedelta import relativedelta
-import pandas as pd
 import numpy as np
 
+import diagnostico
+from fluxo_caixa import expandir_recorrencias, montar_fluxo_diario
+from ledger_colunar import LedgerColunar
+
 # Nome do arquivo do banco de dados
 DB_NAME = 'gestao_frota.db'
 
+# Versão do esquema do banco (gravada em PRAGMA user_version)
+SCHEMA_VERSION = 4
+
+# Quantidade de linhas enviadas por executemany nas inserções em massa
+TAMANHO_LOTE = 5000
+
+# Formato de data usado na interface e nas colunas de texto originais
+FORMATO_DATA = '%d/%m/%Y'
+
+# Ajustes aplicados a cada conexão aberta.
+# WAL: leitores não bloqueiam o escritor (e vice-versa), inclusive entre processos
+# no mesmo computador. Requer o arquivo em disco local (não funciona em pasta de rede).
+JOURNAL_MODE = 'WAL'
+PRAGMAS_CONEXAO = {
+    'synchronous': 'NORMAL', # Seguro com WAL; evita uma sincronização em disco por commit
+    'cache_size': -32000, # Em KiB (negativo): ~32 MB de cache de páginas por conexão
+    'mmap_size': 256 * 1024 * 1024, # Leituras via memória mapeada (até 256 MB do arquivo)
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'ON', # Valida entradas.maquina_id contra o cadastro de máquinas
+}
+
+# Espera pelo lock de escrita de outra conexão/processo antes de falhar com "database is locked"
+BUSY_TIMEOUT_MS = 5000
+
+# Quantidade de resultados de consultas analíticas mantidos em memória (LRU)
+CACHE_CONSULTAS_MAX = 32
+
+# Frota cadastrada pela interface em um banco sem máquinas (ver cadastrar_frota_padrao)
+MAQUINAS_PADRAO = ['Escavadeira', 'Caminhão', 'Retro-Escavadeira']
+
+# Colunas de entradas cuja alteração afeta daily_cashflow / o ledger em memória
+# (os triggers de UPDATE ignoram as demais, ex: maquina_id)
+COLUNAS_FLUXO_ENTRADAS = 'tipo, valor, data_registro_iso'
+COLUNAS_LEDGER_ENTRADAS = 'maquina, tipo, valor, data_registro_iso'
+
+# Retentativas (com espera exponencial) quando o banco continua ocupado após o busy_timeout
+TENTATIVAS_OCUPADO = 5
+ESPERA_INICIAL_OCUPADO_S = 0.05
+
+# Mantém entradas e despesas em colunas NumPy (ledger_colunar) para as consultas
+# analíticas, em vez de reler e converter as linhas do SQLite a cada previsão
+LEDGER_EM_MEMORIA = True
+
+
+@lru_cache(maxsize=8192)
+def data_para_iso(data_str):
+    """
+    Converte uma data DD/MM/AAAA para AAAA-MM-DD (ordenável). Retorna None se inválida.
+
+    Em cache: nas inserções em lote as mesmas datas se repetem muito e o strptime é caro.
+    """
+    try:
+        return datetime.strptime(data_str, FORMATO_DATA).date().isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+def _banco_ocupado(erro):
+    """Indica se o erro do SQLite é de banco ocupado/travado (vale tentar de novo)."""
+    mensagem = str(erro).lower()
+    return 'locked' in mensagem or 'busy' in mensagem
+
+
 class DatabaseManager:
-    """Gerencia todas as interações com o banco de dados SQLite."""
+    """
+    Gerencia todas as interações com o banco de dados SQLite.
+
+    Cada thread usa a própria conexão (criada na primeira utilização), então o
+    objeto pode ser compartilhado com threads de segundo plano. As consultas
+    analíticas usam uma segunda conexão, somente leitura, por thread.
+    """
     
-    def __init__(self):
-        """Inicializa a conexão e garante que as tabelas existam."""
-        self.conn = sqlite3.connect(DB_NAME)
-        self.cursor = self.conn.cursor()
+    def __init__(self, db_name=DB_NAME, ledger_em_memoria=LEDGER_EM_MEMORIA):
+        """
+        Inicializa a conexão e garante que as tabelas existam.
+
+        Args:
+            db_name (str): Caminho do arquivo do banco (padrão: DB_NAME).
+            ledger_em_memoria (bool): Responde get_prophet_data e
+                get_prophet_data_por_maquina a partir do ledger em memória
+                (carregado na primeira consulta ou em carregar_ledger()). Com
+                False, cada consulta vai ao SQLite (ex: execuções únicas da CLI).
+        """
+        self.db_name = db_name
+        self.ledger_em_memoria = ledger_em_memoria
+        self._local = threading.local() # Conexões e nível de transação de cada thread
+        # Todas as conexões abertas, para fechar em close()
+        self._conexoes = []
+        self._conexoes_leitura = []
+        self._lock_conexoes = threading.Lock()
+
+        # Cache dos resultados das consultas analíticas: {chave: (geração, resultado)}.
+        # A geração aumenta a cada gravação (deste processo ou de outros), o que
+        # invalida todos os resultados anteriores.
+        self._cache_consultas = OrderedDict()
+        self._geracao = 0
+        self._lock_cache = threading.Lock()
+
+        # Ledger em colunas (None = ainda não carregado). As inserções feitas por
+        # este objeto são anexadas a ele; gravações de fora provocam uma recarga.
+        self._ledger = None
+        self._lock_ledger = threading.Lock()
+
+        conn = self._conexao()
+        # Persistente: fica gravado no arquivo e vale para os outros processos
+        self._com_retentativas(lambda: conn.execute(f'PRAGMA journal_mode = {JOURNAL_MODE}'))
         self.setup_db()
-        print(f"Banco de dados '{DB_NAME}' inicializado.")
+        print(f"Banco de dados '{db_name}' inicializado.")
+
+    @property
+    def conn(self):
+        """Conexão de leitura e escrita da thread atual."""
+        return self._conexao()
+
+    def _abrir_conexao(self, somente_leitura=False):
+        """Abre uma conexão com busy_timeout e PRAGMAS_CONEXAO aplicados."""
+        if somente_leitura:
+            # URI 'mode=ro': o SQLite recusa qualquer escrita por esta conexão
+            uri = f"{Path(os.path.abspath(self.db_name)).as_uri()}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT_MS / 1000,
+                                   isolation_level=None, check_same_thread=False)
+        else:
+            # isolation_level=None: as transações são abertas explicitamente em transacao()
+            conn = sqlite3.connect(self.db_name, timeout=BUSY_TIMEOUT_MS / 1000,
+                                   isolation_level=None, check_same_thread=False)
+        conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        for nome, valor in PRAGMAS_CONEXAO.items():
+            conn.execute(f'PRAGMA {nome} = {valor}')
+        with self._lock_conexoes:
+            (self._conexoes_leitura if somente_leitura else self._conexoes).append(conn)
+        return conn
+
+    def _conexao(self):
+        """Conexão de leitura e escrita da thread atual (aberta na primeira chamada)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._abrir_conexao()
+        return conn
+
+    def _conexao_leitura(self):
+        """Conexão somente leitura da thread atual, para consultas analíticas."""
+        conn = getattr(self._local, 'conn_leitura', None)
+        if conn is None:
+            conn = self._local.conn_leitura = self._abrir_conexao(somente_leitura=True)
+        return conn
+
+    @staticmethod
+    def _com_retentativas(funcao):
+        """Executa 'funcao', repetindo com espera exponencial enquanto o banco estiver ocupado."""
+        for tentativa in range(TENTATIVAS_OCUPADO):
+            try:
+                return funcao()
+            except sqlite3.OperationalError as e:
+                if not _banco_ocupado(e) or tentativa == TENTATIVAS_OCUPADO - 1:
+                    raise
+                time.sleep(ESPERA_INICIAL_OCUPADO_S * 2 ** tentativa)
 
     def setup_db(self):
         """Cria as tabelas se não existirem."""
-        
+        with self.transacao() as cursor:
+            self._criar_tabelas(cursor)
+
+        self._migrar_esquema()
+
+    @staticmethod
+    def _criar_tabelas(cursor):
+        # Cadastro das máquinas da frota
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS maquinas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome TEXT NOT NULL UNIQUE
+            )
+        ''')
+
         # Tabela para registrar as Entradas (Receitas da frota)
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS entradas (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                maquina TEXT NOT NULL,
+                maquina TEXT NOT NULL, -- Nome da máquina (mantido junto com maquina_id)
+                maquina_id INTEGER REFERENCES maquinas (id),
                 tipo TEXT NOT NULL, -- Usado para identificar o tipo de registro (ex: 'hora_trabalhada')
                 valor REAL NOT NULL, -- Valor total da receita gerada no dia
-                data_registro TEXT NOT NULL -- DD/MM/AAAA (data em que o trabalho foi realizado)
+                data_registro TEXT NOT NULL, -- DD/MM/AAAA (data em que o trabalho foi realizado)
+                data_registro_iso TEXT -- AAAA-MM-DD (mesma data, ordenável e indexada)
             )
         ''')
 
         # Tabela para registrar as Saídas (Despesas)
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS despesas (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 titulo TEXT NOT NULL,
                 valor REAL NOT NULL,
                 data_saida TEXT NOT NULL, -- Data da primeira saída (DD/MM/AAAA)
                 recorrente INTEGER NOT NULL, -- 0 (Não) ou 1 (Sim)
-                frequencia TEXT -- 'Mensal', 'Trimestral', 'Anual', etc.
+                frequencia TEXT, -- 'Mensal', 'Trimestral', 'Anual', etc.
+                data_saida_iso TEXT -- AAAA-MM-DD (mesma data, ordenável e indexada)
             )
         ''')
-        self.conn.commit()
+
+    def _migrar_esquema(self):
+        """
+        Aplica as migrações pendentes de acordo com PRAGMA user_version.
+
+        Tudo em uma única transação: se outro computador abrir o mesmo banco ao
+        mesmo tempo, ele espera e depois encontra a versão já atualizada.
+        """
+        with self.transacao() as cursor:
+            versao = cursor.execute('PRAGMA user_version').fetchone()[0]
+
+            if versao < 1:
+                self._migrar_v1_datas_iso(cursor)
+            if versao < 2:
+                self._migrar_v2_fluxo_diario(cursor)
+            if versao < 3:
+                self._migrar_v3_versao_ledger(cursor)
+            if versao < 4:
+                self._migrar_v4_maquinas(cursor)
+
+            if versao < SCHEMA_VERSION:
+                cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def _migrar_v1_datas_iso(self, cursor):
+        """
+        Migração 1: adiciona colunas de data ISO (AAAA-MM-DD) com índices e
+        preenche os registros existentes a partir das colunas DD/MM/AAAA.
+        """
+        colunas = [
+            ('entradas', 'data_registro', 'data_registro_iso'),
+            ('despesas', 'data_saida', 'data_saida_iso'),
+        ]
+        for tabela, coluna_origem, coluna_iso in colunas:
+            existentes = {row[1] for row in cursor.execute(f'PRAGMA table_info({tabela})')}
+            if coluna_iso not in existentes:
+                cursor.execute(f'ALTER TABLE {tabela} ADD COLUMN {coluna_iso} TEXT')
+
+            # Backfill: converte em Python para aceitar as mesmas datas que o strptime aceita (ex: 1/2/2025)
+            pendentes = cursor.execute(
+                f'SELECT id, {coluna_origem} FROM {tabela} WHERE {coluna_iso} IS NULL'
+            ).fetchall()
+            atualizacoes = []
+            for row_id, data_str in pendentes:
+                data_iso = data_para_iso(data_str)
+                if data_iso is None:
+                    print(f"Aviso: Data inválida '{data_str}' em {tabela} (id {row_id}). Registro será ignorado nas consultas.")
+                    continue
+                atualizacoes.append((data_iso, row_id))
+            cursor.executemany(f'UPDATE {tabela} SET {coluna_iso} = ? WHERE id = ?', atualizacoes)
+
+        # Índices para consultas por intervalo de datas
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_entradas_tipo_data ON entradas (tipo, data_registro_iso)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_despesas_recorrente_data ON despesas (recorrente, data_saida_iso)')
+
+    def _migrar_v2_fluxo_diario(self, cursor):
+        """
+        Migração 2: cria a tabela agregada 'daily_cashflow' (um registro por dia),
+        mantida pelos triggers de entradas/despesas, e a preenche com o histórico.
+
+        Apenas despesas NÃO recorrentes são materializadas; as recorrentes são
+        expandidas na leitura (fluxo_caixa.expandir_recorrencias).
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS daily_cashflow (
+                dia TEXT PRIMARY KEY, -- AAAA-MM-DD
+                receita REAL NOT NULL DEFAULT 0, -- Soma das entradas 'hora_trabalhada' do dia
+                n_receitas INTEGER NOT NULL DEFAULT 0, -- Quantidade de entradas do dia (0 = sem receita registrada)
+                despesa REAL NOT NULL DEFAULT 0 -- Soma das despesas não recorrentes do dia
+            ) WITHOUT ROWID
+        ''')
+        self._criar_triggers_fluxo_diario(cursor)
+        self.rebuild_daily_cashflow()
+
+    @staticmethod
+    def _criar_triggers_fluxo_diario(cursor):
+        """Triggers que mantêm 'daily_cashflow' a cada inclusão, alteração ou remoção."""
+        # Cláusulas reutilizadas pelos triggers (NEW = linha incluída, OLD = linha removida)
+        soma_receita = '''
+            INSERT INTO daily_cashflow (dia, receita, n_receitas) VALUES (NEW.data_registro_iso, NEW.valor, 1)
+            ON CONFLICT (dia) DO UPDATE SET receita = receita + excluded.receita, n_receitas = n_receitas + 1;
+        '''
+        subtrai_receita = '''
+            UPDATE daily_cashflow SET receita = receita - OLD.valor, n_receitas = n_receitas - 1
+            WHERE dia = OLD.data_registro_iso;
+        '''
+        soma_despesa = '''
+            INSERT INTO daily_cashflow (dia, despesa) VALUES (NEW.data_saida_iso, NEW.valor)
+            ON CONFLICT (dia) DO UPDATE SET despesa = despesa + excluded.despesa;
+        '''
+        subtrai_despesa = '''
+            UPDATE daily_cashflow SET despesa = despesa - OLD.valor
+            WHERE dia = OLD.data_saida_iso;
+        '''
+        entrada_nova = "NEW.tipo = 'hora_trabalhada' AND NEW.data_registro_iso IS NOT NULL"
+        entrada_antiga = "OLD.tipo = 'hora_trabalhada' AND OLD.data_registro_iso IS NOT NULL"
+        despesa_nova = 'NEW.recorrente = 0 AND NEW.data_saida_iso IS NOT NULL'
+        despesa_antiga = 'OLD.recorrente = 0 AND OLD.data_saida_iso IS NOT NULL'
+
+        triggers = [
+            ('trg_entradas_insert', 'AFTER INSERT ON entradas', entrada_nova, soma_receita),
+            ('trg_entradas_delete', 'AFTER DELETE ON entradas', entrada_antiga, subtrai_receita),
+            ('trg_entradas_update_old', f'AFTER UPDATE OF {COLUNAS_FLUXO_ENTRADAS} ON entradas', entrada_antiga, subtrai_receita),
+            ('trg_entradas_update_new', f'AFTER UPDATE OF {COLUNAS_FLUXO_ENTRADAS} ON entradas', entrada_nova, soma_receita),
+            ('trg_despesas_insert', 'AFTER INSERT ON despesas', despesa_nova, soma_despesa),
+            ('trg_despesas_delete', 'AFTER DELETE ON despesas', despesa_antiga, subtrai_despesa),
+            ('trg_despesas_update_old', 'AFTER UPDATE ON despesas', despesa_antiga, subtrai_despesa),
+            ('trg_despesas_update_new', 'AFTER UPDATE ON despesas', despesa_nova, soma_despesa),
+        ]
+        for nome, evento, condicao, corpo in triggers:
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {nome} {evento} WHEN {condicao} BEGIN {corpo} END')
+
+    def _migrar_v3_versao_ledger(self, cursor):
+        """
+        Migração 3: cria o contador 'ledger_versao', incrementado por triggers a
+        cada linha incluída, alterada ou removida em entradas/despesas.
+
+        Com a leitura de uma única linha se sabe se o ledger em memória ainda
+        corresponde ao banco (inclusive após gravações de outros processos).
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ledger_versao (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                versao INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('INSERT OR IGNORE INTO ledger_versao (id, versao) VALUES (1, 0)')
+        self._criar_triggers_versao_ledger(cursor)
+
+    @staticmethod
+    def _criar_triggers_versao_ledger(cursor):
+        """Triggers que incrementam 'ledger_versao' a cada linha incluída, alterada ou removida."""
+        incrementa = 'UPDATE ledger_versao SET versao = versao + 1 WHERE id = 1;'
+        eventos = {
+            'insert': 'INSERT',
+            'update': 'UPDATE', # Em entradas, apenas as colunas que o ledger usa (ver _migrar_v4_maquinas)
+            'delete': 'DELETE',
+        }
+        for tabela in ('entradas', 'despesas'):
+            for sufixo, evento in eventos.items():
+                if tabela == 'entradas' and sufixo == 'update':
+                    evento = f'UPDATE OF {COLUNAS_LEDGER_ENTRADAS}'
+                cursor.execute(
+                    f'CREATE TRIGGER IF NOT EXISTS trg_{tabela}_versao_{sufixo} '
+                    f'AFTER {evento} ON {tabela} BEGIN {incrementa} END'
+                )
+
+    def _migrar_v4_maquinas(self, cursor):
+        """
+        Migração 4: cadastro de máquinas ('maquinas') com chave estrangeira
+        entradas.maquina_id e índice (maquina_id, data) para as consultas por máquina.
+
+        As máquinas já usadas em entradas são cadastradas e vinculadas. A coluna
+        de texto 'maquina' é mantida (exportação e versões anteriores do aplicativo).
+        """
+        existentes = {row[1] for row in cursor.execute('PRAGMA table_info(entradas)')}
+        if 'maquina_id' not in existentes:
+            cursor.execute('ALTER TABLE entradas ADD COLUMN maquina_id INTEGER REFERENCES maquinas (id)')
+
+        # Os triggers de UPDATE de entradas passam a disparar só nas colunas que
+        # usam: preencher maquina_id não mexe em daily_cashflow nem no ledger
+        for trigger in ('trg_entradas_update_old', 'trg_entradas_update_new', 'trg_entradas_versao_update'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        self._criar_triggers_fluxo_diario(cursor)
+        self._criar_triggers_versao_ledger(cursor)
+
+        cursor.execute('INSERT OR IGNORE INTO maquinas (nome) SELECT DISTINCT maquina FROM entradas')
+        cursor.execute('''
+            UPDATE entradas SET maquina_id = (SELECT id FROM maquinas WHERE maquinas.nome = entradas.maquina)
+            WHERE maquina_id IS NULL
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_entradas_maquina_data ON entradas (maquina_id, data_registro_iso)')
+
+    def rebuild_daily_cashflow(self):
+        """
+        Recalcula a tabela 'daily_cashflow' inteira a partir de entradas e despesas.
+
+        Necessário apenas para bancos existentes (a migração já chama este
+        método) ou se os dados forem alterados fora do aplicativo com os
+        triggers desativados.
+        """
+        with self.transacao() as cursor:
+            cursor.execute('DELETE FROM daily_cashflow')
+            cursor.execute('''
+                INSERT INTO daily_cashflow (dia, receita, n_receitas, despesa)
+                SELECT dia, SUM(receita), SUM(n_receitas), SUM(despesa)
+                FROM (
+                    SELECT data_registro_iso AS dia, valor AS receita, 1 AS n_receitas, 0 AS despesa
+                    FROM entradas
+                    WHERE tipo = 'hora_trabalhada' AND data_registro_iso IS NOT NULL
+                    UNION ALL
+                    SELECT data_saida_iso AS dia, 0 AS receita, 0 AS n_receitas, valor AS despesa
+                    FROM despesas
+                    WHERE recorrente = 0 AND data_saida_iso IS NOT NULL
+                )
+                GROUP BY dia
+            ''')
+
+    @contextmanager
+    def transacao(self):
+        """
+        Agrupa várias operações em uma única transação da conexão da thread atual.
+
+        Faz commit ao sair do bloco (uma única sincronização em disco) e
+        rollback se ocorrer qualquer erro. Blocos aninhados participam da
+        transação mais externa. O lock de escrita é obtido já no início
+        (BEGIN IMMEDIATE), com retentativas se outra conexão estiver gravando.
+        """
+        conn = self._conexao()
+        nivel = getattr(self._local, 'nivel_transacao', 0)
+        if nivel > 0:
+            self._local.nivel_transacao = nivel + 1
+            try:
+                yield conn.cursor()
+            finally:
+                self._local.nivel_transacao = nivel
+            return
+
+        self._com_retentativas(lambda: conn.execute('BEGIN IMMEDIATE'))
+        self._local.nivel_transacao = 1
+        try:
+            yield conn.cursor()
+        except BaseException:
+            self._local.nivel_transacao = 0
+            conn.rollback()
+            raise
+        self._local.nivel_transacao = 0
+        self._com_retentativas(conn.commit)
+        self._nova_geracao()
+
+    @contextmanager
+    def _leitura(self):
+        """
+        Abre uma transação de leitura na conexão somente leitura da thread atual.
+
+        As consultas do bloco enxergam o mesmo estado do banco (um snapshot do
+        WAL), mesmo que outra conexão grave no meio delas, e não bloqueiam escritas.
+        """
+        conn = self._conexao_leitura()
+        self._com_retentativas(lambda: conn.execute('BEGIN'))
+        try:
+            yield conn.cursor()
+        finally:
+            conn.rollback() # Só leitura: encerrar a transação basta
+
+    def _nova_geracao(self):
+        """Invalida os resultados em cache (chamado após cada gravação)."""
+        with self._lock_cache:
+            self._geracao += 1
+
+    def _verificar_alteracoes_externas(self):
+        """
+        Detecta gravações de outras conexões (outras threads ou outros processos).
+
+        O PRAGMA data_version da conexão somente leitura muda sempre que outra
+        conexão faz commit no arquivo. Na primeira consulta de cada thread não
+        há valor anterior para comparar, então o cache é invalidado por segurança.
+        """
+        versao = self._conexao_leitura().execute('PRAGMA data_version').fetchone()[0]
+        if getattr(self._local, 'data_version', None) != versao:
+            self._local.data_version = versao
+            self._nova_geracao()
+
+    def _consulta_em_cache(self, chave, calcular, usar_cache=True):
+        """
+        Retorna o resultado em cache para 'chave' se nada foi gravado desde que
+        ele foi calculado; caso contrário executa 'calcular()' e guarda o resultado.
+
+        O chamador recebe sempre uma cópia, para que alterações no DataFrame não
+        afetem o cache.
+        """
+        if not usar_cache:
+            return calcular()
+
+        self._verificar_alteracoes_externas()
+        with self._lock_cache:
+            geracao = self._geracao
+            item = self._cache_consultas.get(chave)
+            if item is not None and item[0] == geracao:
+                self._cache_consultas.move_to_end(chave)
+                diagnostico.contar('cache_consultas.acerto')
+                return self._copiar_resultado(item[1])
+
+        diagnostico.contar('cache_consultas.falha')
+
+        resultado = calcular()
+        with self._lock_cache:
+            # Se houve gravação durante o cálculo, a geração antiga já deixa o item inválido
+            self._cache_consultas[chave] = (geracao, resultado)
+            self._cache_consultas.move_to_end(chave)
+            while len(self._cache_consultas) > CACHE_CONSULTAS_MAX:
+                self._cache_consultas.popitem(last=False)
+        return self._copiar_resultado(resultado)
+
+    @staticmethod
+    def _copiar_resultado(resultado):
+        if isinstance(resultado, dict):
+            return {chave: df.copy() for chave, df in resultado.items()}
+        return resultado.copy()
+
+    def carregar_ledger(self):
+        """
+        Carrega o ledger em memória agora (em vez de na primeira consulta).
+
+        Útil em uma thread de segundo plano logo após abrir o aplicativo. Não faz
+        nada se o ledger já estiver atualizado ou se ledger_em_memoria=False.
+        """
+        if self.ledger_em_memoria:
+            self._ledger_atual()
+
+    def _ledger_atual(self):
+        """Retorna o ledger em memória, (re)carregando-o se o banco mudou por fora."""
+        with self._lock_ledger:
+            versao = self._conexao_leitura().execute('SELECT versao FROM ledger_versao').fetchone()[0]
+            if self._ledger is None or self._ledger.versao != versao:
+                self._ledger = self._carregar_ledger()
+            return self._ledger
+
+    def _carregar_ledger(self):
+        """Lê entradas e despesas (em lotes, de um mesmo snapshot) para um novo LedgerColunar."""
+        ledger = LedgerColunar()
+        with diagnostico.medir('ledger.carregar'), self._leitura() as cursor:
+            ledger.versao = cursor.execute('SELECT versao FROM ledger_versao').fetchone()[0]
+
+            cursor.execute('SELECT maquina, tipo, valor, data_registro_iso FROM entradas WHERE data_registro_iso IS NOT NULL')
+            for lote in iter(lambda: cursor.fetchmany(TAMANHO_LOTE), []):
+                maquinas, tipos, valores, datas = zip(*lote)
+                ledger.anexar_entradas(maquinas, tipos, valores, datas)
+
+            cursor.execute('SELECT valor, data_saida_iso, recorrente, frequencia FROM despesas WHERE data_saida_iso IS NOT NULL')
+            for lote in iter(lambda: cursor.fetchmany(TAMANHO_LOTE), []):
+                valores, datas, recorrentes, frequencias = zip(*lote)
+                ledger.anexar_despesas(valores, datas, recorrentes, frequencias)
+        return ledger
+
+    def _versao_ledger(self, cursor):
+        """
+        Lê o contador de alterações dentro da transação de uma inserção (antes dela).
+
+        Com o lock de escrita já obtido, nenhuma outra conexão grava até o commit,
+        então o contador após a inserção é exatamente este valor + linhas inseridas.
+        Retorna None em transações aninhadas: a externa ainda pode desfazer tudo.
+        """
+        if not self.ledger_em_memoria or self._ledger is None or self._local.nivel_transacao > 1:
+            return None
+        return cursor.execute('SELECT versao FROM ledger_versao').fetchone()[0]
+
+    def _anexar_ao_ledger(self, versao_antes, quantidade, anexar):
+        """
+        Após o commit de uma inserção, aplica 'anexar(ledger)' se o ledger estava
+        em dia com o banco; senão apenas o marca para ser recarregado.
+        """
+        if not self.ledger_em_memoria:
+            return
+        with self._lock_ledger:
+            ledger = self._ledger
+            if ledger is None or ledger.versao is None:
+                return
+            if versao_antes is not None and ledger.versao == versao_antes:
+                anexar(ledger)
+                ledger.versao = versao_antes + quantidade
+            elif versao_antes is None or ledger.versao != versao_antes + quantidade:
+                # Já recarregado com estas linhas por outra thread, ou fora de sincronia
+                ledger.versao = None
+
+    @staticmethod
+    def _em_lotes(registros, tamanho_lote):
+        """Divide um iterável em listas de até 'tamanho_lote' itens."""
+        iterador = iter(registros)
+        while True:
+            lote = list(islice(iterador, tamanho_lote))
+            if not lote:
+                return
+            yield lote
+
+    @staticmethod
+    def _ids_maquinas(cursor, nomes):
+        """Retorna {nome: id} das máquinas informadas, cadastrando as que ainda não existem."""
+        nomes = sorted(set(nomes))
+        cursor.executemany('INSERT OR IGNORE INTO maquinas (nome) VALUES (?)', [(nome,) for nome in nomes])
+        ids = {}
+        # Em blocos, abaixo do limite de parâmetros por consulta do SQLite
+        for bloco in DatabaseManager._em_lotes(nomes, 500):
+            marcadores = ', '.join('?' * len(bloco))
+            ids.update(cursor.execute(f'SELECT nome, id FROM maquinas WHERE nome IN ({marcadores})', bloco))
+        return ids
+
+    def cadastrar_maquina(self, nome):
+        """
+        Cadastra uma máquina na frota.
+
+        Returns:
+            int: Id da máquina (o existente, se o nome já estiver cadastrado), ou None em caso de erro.
+        """
+        nome = (nome or '').strip()
+        if not nome:
+            print("Erro ao cadastrar máquina: nome vazio.")
+            return None
+        try:
+            with self.transacao() as cursor:
+                return self._ids_maquinas(cursor, [nome])[nome]
+        except Exception as e:
+            print(f"Erro ao cadastrar máquina: {e}")
+            return None
+
+    def cadastrar_frota_padrao(self):
+        """
+        Cadastra MAQUINAS_PADRAO se o cadastro estiver vazio (banco novo), para o
+        formulário de entradas não abrir sem máquinas.
+
+        Chamado pela interface; os bancos criados pela CLI ou pela importação
+        começam sem máquinas (cadastradas junto com as entradas).
+        """
+        try:
+            with self.transacao() as cursor:
+                if cursor.execute('SELECT COUNT(*) FROM maquinas').fetchone()[0] == 0:
+                    self._ids_maquinas(cursor, MAQUINAS_PADRAO)
+        except Exception as e:
+            print(f"Erro ao cadastrar a frota padrão: {e}")
+
+    def listar_maquinas(self, busca=None, limite=None, deslocamento=0):
+        """
+        Lista as máquinas cadastradas em ordem alfabética, uma página por vez.
+
+        Args:
+            busca (str): Trecho do nome (sem diferenciar maiúsculas); None lista todas.
+            limite (int): Máquinas por página (None = todas).
+            deslocamento (int): Quantidade de máquinas puladas (página * limite).
+
+        Returns:
+            list[tuple[int, str]]: (id, nome) de cada máquina.
+        """
+        filtro, parametros = self._filtro_busca_maquina(busca)
+        with self._leitura() as cursor:
+            return cursor.execute(
+                f'SELECT id, nome FROM maquinas{filtro} ORDER BY nome LIMIT ? OFFSET ?',
+                parametros + [-1 if limite is None else limite, deslocamento],
+            ).fetchall()
+
+    def contar_maquinas(self, busca=None):
+        """Quantidade de máquinas cadastradas que atendem à 'busca' (para a paginação)."""
+        filtro, parametros = self._filtro_busca_maquina(busca)
+        with self._leitura() as cursor:
+            return cursor.execute(f'SELECT COUNT(*) FROM maquinas{filtro}', parametros).fetchone()[0]
+
+    @staticmethod
+    def _filtro_busca_maquina(busca):
+        busca = (busca or '').strip()
+        if not busca:
+            return '', []
+        # Escapa os curingas do LIKE para buscar o texto literal
+        trecho = busca.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return " WHERE nome LIKE ? ESCAPE '\\'", [f'%{trecho}%']
 
     def insert_entrada(self, maquina, valor_total, data_trabalho):
         """Insere um novo registro de valor total de frota gerado em um dia."""
         # Usa 'hora_trabalhada' no campo 'tipo' para identificar este novo formato de entrada.
+        data_iso = data_para_iso(data_trabalho)
         try:
-            self.cursor.execute('''
-                INSERT INTO entradas (maquina, tipo, valor, data_registro)
-                VALUES (?, ?, ?, ?)
-            ''', (maquina, 'hora_trabalhada', valor_total, data_trabalho))
-            self.conn.commit()
+            with diagnostico.medir('sql.insert_entrada'), self.transacao() as cursor:
+                versao = self._versao_ledger(cursor)
+                maquina_id = self._ids_maquinas(cursor, [maquina])[maquina]
+                cursor.execute('''
+                    INSERT INTO entradas (maquina, maquina_id, tipo, valor, data_registro, data_registro_iso)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (maquina, maquina_id, 'hora_trabalhada', valor_total, data_trabalho, data_iso))
+            self._anexar_ao_ledger(versao, 1, lambda ledger: ledger.anexar_entradas(
+                [maquina], ['hora_trabalhada'], [valor_total], [data_iso]))
             return True
         except Exception as e:
             print(f"Erro ao inserir entrada: {e}")
@@ -61,132 +692,377 @@ class DatabaseManager:
     def insert_saida(self, titulo, valor, data_saida, recorrente, frequencia):
         """Insere um novo registro de despesa (Saída)."""
         recorrente_int = 1 if recorrente else 0
+        data_iso = data_para_iso(data_saida)
         try:
-            self.cursor.execute('''
-                INSERT INTO despesas (titulo, valor, data_saida, recorrente, frequencia)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (titulo, valor, data_saida, recorrente_int, frequencia))
-            self.conn.commit()
+            with diagnostico.medir('sql.insert_saida'), self.transacao() as cursor:
+                versao = self._versao_ledger(cursor)
+                cursor.execute('''
+                    INSERT INTO despesas (titulo, valor, data_saida, recorrente, frequencia, data_saida_iso)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (titulo, valor, data_saida, recorrente_int, frequencia, data_iso))
+            self._anexar_ao_ledger(versao, 1, lambda ledger: ledger.anexar_despesas(
+                [valor], [data_iso], [recorrente_int], [frequencia]))
             return True
         except Exception as e:
             print(f"Erro ao inserir saída: {e}")
             return False
 
-    def get_prophet_data(self, horizonte_dias=365):
+    def insert_entradas_many(self, registros, tamanho_lote=TAMANHO_LOTE):
+        """
+        Insere várias entradas em uma única transação.
+
+        Máquinas que ainda não estão no cadastro são cadastradas.
+
+        Args:
+            registros: Iterável de tuplas (maquina, valor_total, data_trabalho).
+            tamanho_lote (int): Linhas enviadas por chamada de executemany.
+
+        Returns:
+            int: Quantidade de registros inseridos (0 em caso de erro; nada é gravado).
+        """
+        linhas = (
+            (maquina, 'hora_trabalhada', valor_total, data_trabalho, data_para_iso(data_trabalho))
+            for maquina, valor_total, data_trabalho in registros
+        )
+        total = 0
+        try:
+            with diagnostico.medir('sql.insert_entradas_many'), self.transacao() as cursor:
+                versao = self._versao_ledger(cursor)
+                # Linhas inseridas, em colunas, para anexar ao ledger após o commit
+                pendentes = LedgerColunar() if versao is not None else None
+                for lote in self._em_lotes(linhas, tamanho_lote):
+                    ids = self._ids_maquinas(cursor, {linha[0] for linha in lote})
+                    cursor.executemany('''
+                        INSERT INTO entradas (maquina, maquina_id, tipo, valor, data_registro, data_registro_iso)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', ((maquina, ids[maquina], *resto) for maquina, *resto in lote))
+                    total += len(lote)
+                    if pendentes is not None:
+                        maquinas, tipos, valores, _, datas = zip(*lote)
+                        pendentes.anexar_entradas(maquinas, tipos, valores, datas)
+            self._anexar_ao_ledger(versao, total, lambda ledger: ledger.anexar_ledger(pendentes))
+            return total
+        except Exception as e:
+            print(f"Erro ao inserir entradas em lote: {e}")
+            return 0
+
+    def insert_saidas_many(self, registros, tamanho_lote=TAMANHO_LOTE):
+        """
+        Insere várias despesas em uma única transação.
+
+        Args:
+            registros: Iterável de tuplas (titulo, valor, data_saida, recorrente, frequencia).
+            tamanho_lote (int): Linhas enviadas por chamada de executemany.
+
+        Returns:
+            int: Quantidade de registros inseridos (0 em caso de erro; nada é gravado).
+        """
+        linhas = (
+            (titulo, valor, data_saida, 1 if recorrente else 0, frequencia, data_para_iso(data_saida))
+            for titulo, valor, data_saida, recorrente, frequencia in registros
+        )
+        total = 0
+        try:
+            with diagnostico.medir('sql.insert_saidas_many'), self.transacao() as cursor:
+                versao = self._versao_ledger(cursor)
+                # Linhas inseridas, em colunas, para anexar ao ledger após o commit
+                pendentes = LedgerColunar() if versao is not None else None
+                for lote in self._em_lotes(linhas, tamanho_lote):
+                    cursor.executemany('''
+                        INSERT INTO despesas (titulo, valor, data_saida, recorrente, frequencia, data_saida_iso)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', lote)
+                    total += len(lote)
+                    if pendentes is not None:
+                        _, valores, _, recorrentes, frequencias, datas = zip(*lote)
+                        pendentes.anexar_despesas(valores, datas, recorrentes, frequencias)
+            self._anexar_ao_ledger(versao, total, lambda ledger: ledger.anexar_ledger(pendentes))
+            return total
+        except Exception as e:
+            print(f"Erro ao inserir saídas em lote: {e}")
+            return 0
+
+    def get_prophet_data(self, horizonte_dias=365, data_referencia=None, anos_historico=1, usar_cache=True):
         """
         Gera um DataFrame unificado no formato do Prophet (ds, y), 
         agregando todas as receitas e despesas por dia.
         
         y = Receita - Despesa (Fluxo de Caixa)
+
+        Args:
+            horizonte_dias (int): Dias após a data de referência incluídos na série.
+            data_referencia (date): "Hoje" da série (padrão: data atual). Permite
+                gerar a série como ela seria vista em outra data.
+            anos_historico (int): Anos de histórico antes da data de referência
+                (padrão: 1; o backtest usa históricos mais longos).
+            usar_cache (bool): Reaproveita o resultado anterior se nada foi gravado desde então.
         """
-        
+        today = data_referencia or datetime.now().date()
+        with diagnostico.medir('get_prophet_data', horizonte_dias=horizonte_dias):
+            return self._consulta_em_cache(
+                ('prophet_data', horizonte_dias, today, anos_historico),
+                lambda: self._montar_prophet_data(horizonte_dias, today, anos_historico),
+                usar_cache,
+            )
+
+    def _montar_prophet_data(self, horizonte_dias, today, anos_historico):
         # --- 1. CONFIGURAÇÃO DE DATAS ---
         # Definir o intervalo de tempo para agregação (ex: 1 ano para trás e 1 ano para frente)
-        end_date = datetime.now().date() + relativedelta(days=horizonte_dias)
-        start_date = datetime.now().date() - relativedelta(years=1)
+        end_date = today + relativedelta(days=horizonte_dias)
+        start_date = today - relativedelta(years=anos_historico)
         
-        # Gerar a série temporal de dates (ds) no formato datetime64[ns]
-        dates = pd.date_range(start=start_date, end=end_date, freq='D')
-        df_prophet = pd.DataFrame({'ds': dates})
+        # Limites do intervalo em AAAA-MM-DD para as consultas por faixa (BETWEEN)
+        start_iso = start_date.isoformat()
+        end_iso = end_date.isoformat()
+
+        if self.ledger_em_memoria:
+            # Mesmo cálculo, vetorizado sobre as colunas em memória (sem SQL)
+            ledger = self._ledger_atual()
+            with diagnostico.medir('ledger.fluxo_diario'):
+                return ledger.fluxo_diario(start_date, end_date, today)
         
-        # Inicializa dicionários de agregação (date objects as keys)
-        despesas_agg = {}
-        receitas_agg = {}
+        # --- 2. CONSULTAS (na mesma transação de leitura, para ler um estado consistente) ---
+        with diagnostico.medir('sql.get_prophet_data'), self._leitura() as cursor:
+            # 2.1. Receitas e despesas não recorrentes já somadas por dia pelos triggers
+            # (uma consulta por faixa na chave primária da tabela agregada)
+            fluxo_diario = cursor.execute('''
+                SELECT dia, receita, despesa, n_receitas
+                FROM daily_cashflow
+                WHERE dia BETWEEN ? AND ?
+            ''', (start_iso, end_iso)).fetchall()
+            
+            # 2.2. Apenas as despesas recorrentes que começaram até o fim do intervalo
+            despesas_recorrentes = cursor.execute('''
+                SELECT data_saida_iso, valor, frequencia
+                FROM despesas
+                WHERE recorrente = 1 AND data_saida_iso <= ?
+            ''', (end_iso,)).fetchall()
         
-        # --- 2. PROCESSAR DESPESAS (Saídas) ---
-        despesas = self.cursor.execute('SELECT titulo, valor, data_saida, recorrente, frequencia FROM despesas').fetchall()
+        # --- 3. RECEITAS E DESPESAS NÃO RECORRENTES ---
+        # Apenas os dias com lançamento de receita contam para a média e para o histórico
+        receitas_historicas = [(dia, receita) for dia, receita, _, n_receitas in fluxo_diario if n_receitas > 0]
+        datas_receitas, valores_receitas = self._colunas_data_valor(receitas_historicas)
+        datas_pontuais = np.array([dia for dia, _, _, _ in fluxo_diario], dtype='datetime64[D]')
+        valores_pontuais = np.array([despesa for _, _, despesa, _ in fluxo_diario], dtype=np.float64)
         
-        for titulo, valor, data_str, recorrente, frequencia in despesas:
-            try:
-                data_inicial = datetime.strptime(data_str, '%d/%m/%Y').date()
-            except ValueError:
-                print(f"Aviso: Data de despesa inválida '{data_str}'. Ignorando.")
-                continue
-            
-            if not recorrente:
-                # Despesa não recorrente
-                despesas_agg[data_inicial] = despesas_agg.get(data_inicial, 0.0) + valor
-            else:
-                # Despesa recorrente: simular ocorrências futuras
-                if frequencia == 'Mensal':
-                    delta = relativedelta(months=1)
-                elif frequencia == 'Trimestral':
-                    delta = relativedelta(months=3)
-                elif frequencia == 'Semestral':
-                    delta = relativedelta(months=6)
-                elif frequencia == 'Anual':
-                    delta = relativedelta(years=1)
-                else:
-                    continue # Ignora frequência desconhecida
-                    
-                data_atual = data_inicial
-                while data_atual <= end_date:
-                    despesas_agg[data_atual] = despesas_agg.get(data_atual, 0.0) + valor
-                    data_atual += delta
+        # --- 4. DESPESAS RECORRENTES ---
+        # Expande, de uma vez, apenas as ocorrências que caem dentro do intervalo
+        frequencias = [frequencia for _, _, frequencia in despesas_recorrentes]
+        datas_recorrentes, valores_recorrentes = self._colunas_data_valor(despesas_recorrentes)
+        with diagnostico.medir('agregacao.expandir_recorrencias'):
+            datas_ocorrencias, valores_ocorrencias = expandir_recorrencias(
+                datas_recorrentes, valores_recorrentes, frequencias, start_date, end_date
+            )
                     
-        # --- 3. PROCESSAR RECEITAS (Entradas) ---
-        # 3.1. Busca receitas históricas (valor total de trabalho registrado)
-        receitas_historicas = self.cursor.execute('''
-            SELECT data_registro, SUM(valor) 
-            FROM entradas 
-            WHERE tipo='hora_trabalhada' 
-            GROUP BY data_registro
-        ''').fetchall()
-
-        # 3.2. Popula o dicionário de receitas e calcula a média histórica
-        valores_historicos = []
-        for data_str, valor_total in receitas_historicas:
-            try:
-                data_obj = datetime.strptime(data_str, '%d/%m/%Y').date()
-                receitas_agg[data_obj] = valor_total
-                valores_historicos.append(valor_total)
-            except ValueError:
-                print(f"Aviso: Data de receita inválida '{data_str}'. Ignorando.")
-                continue
-
-        # 3.3. Calcula a média diária das receitas para a PREVISÃO (futuro)
-        if valores_historicos:
-            media_receita_diaria = np.mean(valores_historicos)
+        # --- 5. MONTAR A SÉRIE DIÁRIA (ds, y, y_receita, y_despesa) ---
+        # y = y_receita - y_despesa é calculado pelo montador em arrays pré-alocados
+        with diagnostico.medir('agregacao.montar_fluxo_diario'):
+            return montar_fluxo_diario(
+                start_date, end_date, today,
+                datas_receitas, valores_receitas,
+                np.concatenate([datas_pontuais, datas_ocorrencias]),
+                np.concatenate([valores_pontuais, valores_ocorrencias]),
+            )
+
+    def get_prophet_data_por_maquina(self, horizonte_dias=365, data_referencia=None, usar_cache=True, maquinas=None):
+        """
+        Gera uma série diária de receita por máquina (uma única consulta agrupada).
+        'horizonte_dias', 'data_referencia' e 'usar_cache' funcionam como em get_prophet_data.
+
+        Args:
+            maquinas (Iterable[str]): Apenas estas máquinas (None = toda a frota);
+                no SQLite a consulta usa o índice (maquina_id, data).
+
+        Returns:
+            dict: {maquina: DataFrame com 'ds', 'y', 'y_receita', 'y_despesa'}, onde
+            y = y_receita (despesas são da frota e não são rateadas por máquina).
+        """
+        today = data_referencia or datetime.now().date()
+        maquinas = tuple(sorted(set(maquinas))) if maquinas is not None else None
+        with diagnostico.medir('get_prophet_data_por_maquina', horizonte_dias=horizonte_dias):
+            return self._consulta_em_cache(
+                ('prophet_data_por_maquina', horizonte_dias, today, maquinas),
+                lambda: self._montar_prophet_data_por_maquina(horizonte_dias, today, maquinas),
+                usar_cache,
+            )
+
+    def _montar_prophet_data_por_maquina(self, horizonte_dias, today, maquinas=None):
+        end_date = today + relativedelta(days=horizonte_dias)
+        start_date = today - relativedelta(years=1)
+
+        if self.ledger_em_memoria:
+            ledger = self._ledger_atual()
+            with diagnostico.medir('ledger.receitas_por_maquina'):
+                return ledger.receitas_por_maquina(start_date, end_date, today, maquinas)
+
+        parametros = [start_date.isoformat(), end_date.isoformat()]
+        if maquinas is None:
+            origem, filtro = 'entradas', "tipo='hora_trabalhada'"
         else:
-            media_receita_diaria = 500.00 # Valor padrão se não houver dados históricos
+            # Poucas máquinas: busca pelo índice (maquina_id, data) em vez de varrer o intervalo
+            # inteiro da frota (sem ANALYZE o SQLite escolheria o índice por tipo)
+            origem = 'entradas INDEXED BY idx_entradas_maquina_data'
+            filtro = f"maquina_id IN (SELECT id FROM maquinas WHERE nome IN ({', '.join('?' * len(maquinas))})) AND tipo='hora_trabalhada'"
+            parametros = list(maquinas) + parametros
 
-        # 3.4. Aplica a média diária para os dias FUTUROS
-        today = datetime.now().date()
-        
-        current_date_loop = today
-        while current_date_loop <= end_date:
-            # Apenas adiciona a média se não for um dia de receita histórica registrada
-            if current_date_loop not in receitas_agg:
-                 receitas_agg[current_date_loop] = media_receita_diaria
-            current_date_loop += timedelta(days=1)
-        
-        # --- 4. MERGE NO DATAFRAME FINAL ---
-        
-        # Converte os dicionários para DataFrames temporários
-        df_despesas = pd.DataFrame(list(despesas_agg.items()), columns=['ds_date', 'y_despesa'])
-        df_receitas = pd.DataFrame(list(receitas_agg.items()), columns=['ds_date', 'y_receita'])
-        
-        # Garante que a coluna de data esteja em datetime64[ns]
-        df_despesas['ds'] = pd.to_datetime(df_despesas['ds_date'])
-        df_receitas['ds'] = pd.to_datetime(df_receitas['ds_date'])
-        
-        # Junta os DataFrames no DataFrame principal
-        df_final = df_prophet.merge(df_receitas[['ds', 'y_receita']], on='ds', how='left')
-        df_final['y_receita'] = df_final['y_receita'].fillna(0.0).astype(float) 
+        with diagnostico.medir('sql.get_prophet_data_por_maquina'), self._leitura() as cursor:
+            receitas = cursor.execute(f'''
+                SELECT maquina, data_registro_iso, SUM(valor)
+                FROM {origem}
+                WHERE {filtro} AND data_registro_iso BETWEEN ? AND ?
+                GROUP BY maquina, data_registro_iso
+                ORDER BY maquina
+            ''', parametros).fetchall()
 
-        df_final = df_final.merge(df_despesas[['ds', 'y_despesa']], on='ds', how='left')
-        df_final['y_despesa'] = df_final['y_despesa'].fillna(0.0).astype(float)
-        
-        # --- 5. CALCULAR O FLUXO DE CAIXA (y) ---
-        df_final['y'] = df_final['y_receita'] - df_final['y_despesa']
-        
-        # Retorna todas as colunas necessárias para o gráfico e o Prophet
-        # Incluímos y_receita e y_despesa
-        return df_final[['ds', 'y', 'y_receita', 'y_despesa']].set_index('ds').sort_index().reset_index()
+        # Separa as linhas por máquina (já vêm ordenadas) e monta cada série em arrays
+        linhas_por_maquina = {}
+        for maquina, data_iso, valor_total in receitas:
+            linhas_por_maquina.setdefault(maquina, []).append((data_iso, valor_total))
+
+        sem_despesas = (np.array([], dtype='datetime64[D]'), np.array([], dtype=np.float64))
+        series = {}
+        with diagnostico.medir('agregacao.series_por_maquina', maquinas=len(linhas_por_maquina)):
+            for maquina, linhas in linhas_por_maquina.items():
+                datas, valores = self._colunas_data_valor(linhas)
+                series[maquina] = montar_fluxo_diario(start_date, end_date, today, datas, valores, *sem_despesas)
+        return series
+
+    def iterar_entradas(self, data_inicio=None, data_fim=None, tamanho_lote=TAMANHO_LOTE):
+        """
+        Percorre as entradas em lotes (fetchmany), ordenadas por data, sem carregar tudo na memória.
+
+        Args:
+            data_inicio, data_fim (date): Filtro opcional por data (inclusivo).
+            tamanho_lote (int): Linhas por lote.
+
+        Yields:
+            list[tuple]: Lotes de (id, maquina, tipo, valor, data_iso).
+        """
+        filtro, parametros = self._filtro_datas('data_registro_iso', data_inicio, data_fim)
+        yield from self._iterar_lotes(f'''
+            SELECT id, maquina, tipo, valor, data_registro_iso
+            FROM entradas
+            WHERE data_registro_iso IS NOT NULL{filtro}
+            ORDER BY data_registro_iso, id
+        ''', parametros, tamanho_lote)
+
+    def iterar_despesas(self, data_inicio=None, data_fim=None, recorrente=None, tamanho_lote=TAMANHO_LOTE):
+        """
+        Percorre as despesas em lotes (fetchmany), ordenadas pela data da primeira saída.
+
+        Args:
+            data_inicio, data_fim (date): Filtro opcional pela data da primeira saída (inclusivo).
+            recorrente (bool): Apenas recorrentes (True), apenas não recorrentes (False) ou todas (None).
+            tamanho_lote (int): Linhas por lote.
+
+        Yields:
+            list[tuple]: Lotes de (id, titulo, valor, data_iso, recorrente, frequencia).
+        """
+        filtro, parametros = self._filtro_datas('data_saida_iso', data_inicio, data_fim)
+        if recorrente is not None:
+            filtro += ' AND recorrente = ?'
+            parametros.append(1 if recorrente else 0)
+        yield from self._iterar_lotes(f'''
+            SELECT id, titulo, valor, data_saida_iso, recorrente, frequencia
+            FROM despesas
+            WHERE data_saida_iso IS NOT NULL{filtro}
+            ORDER BY data_saida_iso, id
+        ''', parametros, tamanho_lote)
+
+    def contar_chaves_lancamentos(self, datas_iso):
+        """
+        Conta os lançamentos já gravados nas datas informadas, por chave natural
+        (usado pela importação para descartar linhas repetidas).
+
+        As consultas filtram pelas colunas dos índices idx_entradas_tipo_data e
+        idx_despesas_recorrente_data, então leem só as linhas dessas datas.
+
+        Args:
+            datas_iso: Iterável de datas AAAA-MM-DD.
+
+        Returns:
+            tuple[Counter, Counter]: Entradas por (data_iso, maquina, centavos) e
+            despesas por (data_iso, titulo, centavos).
+        """
+        entradas, despesas = Counter(), Counter()
+        with self._leitura() as cursor:
+            for bloco in self._em_lotes(sorted(set(datas_iso)), 500):
+                marcadores = ', '.join('?' * len(bloco))
+                entradas.update(
+                    (data_iso, maquina, round(valor * 100))
+                    for data_iso, maquina, valor in cursor.execute(f'''
+                        SELECT data_registro_iso, maquina, valor FROM entradas
+                        WHERE tipo = 'hora_trabalhada' AND data_registro_iso IN ({marcadores})
+                    ''', bloco)
+                )
+                despesas.update(
+                    (data_iso, titulo, round(valor * 100))
+                    for data_iso, titulo, valor in cursor.execute(f'''
+                        SELECT data_saida_iso, titulo, valor FROM despesas
+                        WHERE recorrente IN (0, 1) AND data_saida_iso IN ({marcadores})
+                    ''', bloco)
+                )
+        return entradas, despesas
+
+    @staticmethod
+    def _filtro_datas(coluna, data_inicio, data_fim):
+        """Monta as condições ' AND coluna >= ? AND coluna <= ?' e seus parâmetros (AAAA-MM-DD)."""
+        filtro, parametros = '', []
+        if data_inicio is not None:
+            filtro += f' AND {coluna} >= ?'
+            parametros.append(data_inicio.isoformat())
+        if data_fim is not None:
+            filtro += f' AND {coluna} <= ?'
+            parametros.append(data_fim.isoformat())
+        return filtro, parametros
+
+    def _iterar_lotes(self, sql, parametros, tamanho_lote):
+        """
+        Executa a consulta na conexão somente leitura e devolve o resultado em lotes.
+
+        Todos os lotes vêm do mesmo snapshot do banco, mesmo que haja gravações
+        durante a leitura. Consuma um iterador por vez em cada thread.
+        """
+        with self._leitura() as cursor:
+            cursor.execute(sql, parametros)
+            while True:
+                lote = cursor.fetchmany(tamanho_lote)
+                if not lote:
+                    return
+                yield lote
+
+    @staticmethod
+    def _colunas_data_valor(linhas):
+        """Converte linhas (data_iso, valor, ...) em arrays (datetime64[D], float64)."""
+        datas = np.array([linha[0] for linha in linhas], dtype='datetime64[D]')
+        valores = np.array([linha[1] for linha in linhas], dtype=np.float64)
+        return datas, valores
 
     def close(self):
-        """Fecha a conexão com o banco de dados."""
-        self.conn.close()
+        """Fecha as conexões com o banco de dados (de todas as threads)."""
+        with self._lock_conexoes:
+            # Somente leitura primeiro: a última conexão a fechar faz o checkpoint
+            # do WAL e remove os arquivos -wal/-shm, o que exige escrita
+            for conn in self._conexoes_leitura + self._conexoes:
+                conn.close()
+            self._conexoes_leitura.clear()
+            self._conexoes.clear()
+        self._local = threading.local()
 
 # Inicializa o DB ao importar
-# db_manager = DatabaseManager()
\ No newline at end of file
+# db_manager = DatabaseManager()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Manutenção do banco de dados da frota.')
+    parser.add_argument('--rebuild-cashflow', action='store_true',
+                        help="Recalcula a tabela agregada 'daily_cashflow' a partir de entradas e despesas.")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager()
+    if args.rebuild_cashflow:
+        db_manager.rebuild_daily_cashflow()
+        print("Tabela 'daily_cashflow' recalculada.")
+    db_manager.close()
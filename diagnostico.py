@@ -0,0 +1,233 @@
+import atexit
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Instrumentação dos caminhos críticos (consultas SQL, agregação, ajuste e
+# previsão do Prophet, tabela e gráfico). Desligada, cada ponto medido custa
+# apenas a verificação de uma flag; ligada, acumula contagem e tempos por nome,
+# grava uma linha JSON por medição e, opcionalmente, capturas do cProfile.
+#
+# As medições ficam no processo atual: o que roda em processos do pool (previsão
+# por máquina, backtest) não aparece aqui.
+
+# Variáveis de ambiente que ligam a instrumentação/o cProfile já na inicialização
+VAR_DIAGNOSTICO = 'SGF_DIAGNOSTICO'
+VAR_PERFIL = 'SGF_DIAGNOSTICO_PERFIL'
+
+# Log estruturado: uma linha JSON por medição (None = não grava)
+ARQUIVO_LOG = 'diagnostico.jsonl'
+
+# As linhas do log são acumuladas em memória e gravadas juntas (arquivo aberto
+# uma vez enquanto a instrumentação estiver ligada), a cada LINHAS_POR_GRAVACAO
+# linhas ou INTERVALO_GRAVACAO_S segundos, ao desligar e ao encerrar o processo
+LINHAS_POR_GRAVACAO = 200
+INTERVALO_GRAVACAO_S = 1.0
+
+# Capturas do cProfile (.prof, abrir com pstats ou snakeviz)
+PASTA_PERFIS = 'diagnostico_perfis'
+MAX_PERFIS = 20 # Mantém apenas as capturas mais recentes
+
+_estado = {
+    'ativo': os.environ.get(VAR_DIAGNOSTICO) == '1',
+    'perfil': os.environ.get(VAR_PERFIL) == '1',
+}
+_metricas = {} # nome -> {'chamadas', 'total_s', 'min_s', 'max_s', 'ultimo_s'}
+_contadores = {} # nome -> quantidade
+_lock = threading.Lock()
+
+_log = {'arquivo': None, 'pendentes': [], 'ultima_gravacao': 0.0}
+_lock_log = threading.Lock() # Separado de _lock: gravar no disco não atrasa as medições
+
+# O cProfile só admite um perfil ativo por vez no processo
+_lock_perfil = threading.Lock()
+
+
+def ativar(ativo=True, perfil=None):
+    """
+    Liga/desliga a instrumentação em tempo de execução.
+
+    Args:
+        ativo (bool): Mede tempos e contagens.
+        perfil (bool): Também grava capturas do cProfile nos pontos perfilados
+            (None mantém a opção atual).
+    """
+    _estado['ativo'] = bool(ativo)
+    if perfil is not None:
+        _estado['perfil'] = bool(perfil)
+    if not _estado['ativo']:
+        fechar_log()
+
+
+def esta_ativo():
+    return _estado['ativo']
+
+
+def perfil_ativo():
+    return _estado['ativo'] and _estado['perfil']
+
+
+def _registrar(nome, duracao, extras):
+    with _lock:
+        metrica = _metricas.get(nome)
+        if metrica is None:
+            metrica = _metricas[nome] = {'chamadas': 0, 'total_s': 0.0, 'min_s': duracao, 'max_s': duracao, 'ultimo_s': duracao}
+        metrica['chamadas'] += 1
+        metrica['total_s'] += duracao
+        metrica['min_s'] = min(metrica['min_s'], duracao)
+        metrica['max_s'] = max(metrica['max_s'], duracao)
+        metrica['ultimo_s'] = duracao
+
+    _gravar_log({'evento': nome, 'duracao_ms': round(duracao * 1000, 3), **extras})
+
+
+def _gravar_log(registro):
+    if not ARQUIVO_LOG:
+        return
+    registro = {
+        'ts': datetime.now().isoformat(timespec='milliseconds'),
+        'thread': threading.current_thread().name,
+        **registro,
+    }
+    linha = json.dumps(registro, ensure_ascii=False, default=str) + '\n'
+    with _lock_log:
+        _log['pendentes'].append(linha)
+        if (len(_log['pendentes']) >= LINHAS_POR_GRAVACAO
+                or time.monotonic() - _log['ultima_gravacao'] >= INTERVALO_GRAVACAO_S):
+            _descarregar_log()
+
+
+def _descarregar_log():
+    """Grava as linhas pendentes (o chamador segura _lock_log)."""
+    pendentes = _log['pendentes']
+    _log['ultima_gravacao'] = time.monotonic()
+    if not pendentes:
+        return
+    try:
+        if _log['arquivo'] is None:
+            _log['arquivo'] = open(ARQUIVO_LOG, 'a', encoding='utf-8')
+        _log['arquivo'].writelines(pendentes)
+        _log['arquivo'].flush()
+    except OSError as e:
+        print(f"Aviso: Não foi possível gravar o log de diagnóstico: {e}")
+    pendentes.clear()
+
+
+def fechar_log():
+    """Grava as linhas pendentes e fecha o arquivo de log (reaberto na próxima medição)."""
+    with _lock_log:
+        _descarregar_log()
+        if _log['arquivo'] is not None:
+            _log['arquivo'].close()
+            _log['arquivo'] = None
+
+
+atexit.register(fechar_log)
+
+
+@contextmanager
+def medir(nome, **extras):
+    """
+    Mede o tempo do bloco e acumula em 'nome' (sem custo relevante se desligado).
+
+    'extras' (ex: linhas=..., horizonte=...) vão apenas para o log JSON.
+    """
+    if not _estado['ativo']:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _registrar(nome, time.perf_counter() - inicio, extras)
+
+
+def contar(nome, quantidade=1):
+    """Incrementa um contador (ex: acertos do cache)."""
+    if not _estado['ativo']:
+        return
+    with _lock:
+        _contadores[nome] = _contadores.get(nome, 0) + quantidade
+
+
+@contextmanager
+def perfilar(nome):
+    """
+    Com o cProfile ligado, grava uma captura do bloco em PASTA_PERFIS/<nome>_<data>.prof.
+
+    Se outro bloco já estiver sendo perfilado (outra thread), este roda sem captura.
+    """
+    if not perfil_ativo() or not _lock_perfil.acquire(blocking=False):
+        yield
+        return
+    perfil = cProfile.Profile()
+    try:
+        perfil.enable()
+        try:
+            yield
+        finally:
+            perfil.disable()
+        _salvar_perfil(nome, perfil)
+    finally:
+        _lock_perfil.release()
+
+
+def _salvar_perfil(nome, perfil):
+    try:
+        os.makedirs(PASTA_PERFIS, exist_ok=True)
+        caminho = os.path.join(PASTA_PERFIS, f"{nome}_{datetime.now():%Y%m%d_%H%M%S_%f}.prof")
+        perfil.dump_stats(caminho)
+        _gravar_log({'evento': 'perfil', 'nome': nome, 'arquivo': caminho})
+
+        capturas = sorted(
+            (os.path.join(PASTA_PERFIS, arquivo) for arquivo in os.listdir(PASTA_PERFIS) if arquivo.endswith('.prof')),
+            key=os.path.getmtime, reverse=True,
+        )
+        for antigo in capturas[MAX_PERFIS:]:
+            os.remove(antigo)
+    except OSError as e:
+        print(f"Aviso: Não foi possível salvar a captura do cProfile: {e}")
+
+
+def resumo():
+    """
+    Retorna as métricas acumuladas, da maior para a menor soma de tempo.
+
+    Returns:
+        dict: {'metricas': [{'nome', 'chamadas', 'total_ms', 'media_ms', 'min_ms', 'max_ms', 'ultimo_ms'}, ...],
+        'contadores': {nome: quantidade}}
+    """
+    with _lock:
+        metricas = [
+            {
+                'nome': nome,
+                'chamadas': m['chamadas'],
+                'total_ms': m['total_s'] * 1000,
+                'media_ms': m['total_s'] * 1000 / m['chamadas'],
+                'min_ms': m['min_s'] * 1000,
+                'max_ms': m['max_s'] * 1000,
+                'ultimo_ms': m['ultimo_s'] * 1000,
+            }
+            for nome, m in _metricas.items()
+        ]
+        contadores = dict(_contadores)
+    metricas.sort(key=lambda m: m['total_ms'], reverse=True)
+    return {'metricas': metricas, 'contadores': contadores}
+
+
+def limpar():
+    """Zera as métricas e os contadores (o log e as capturas em disco são mantidos)."""
+    with _lock:
+        _metricas.clear()
+        _contadores.clear()
+
+
+def exportar_json(caminho):
+    """Grava o resumo atual em JSON e retorna o caminho absoluto."""
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(dict(resumo(), gerado_em=datetime.now().isoformat(timespec='seconds')), f, indent=2, ensure_ascii=False)
+    return os.path.abspath(caminho)
@@ -0,0 +1,180 @@
+import csv
+import os
+from datetime import datetime
+
+import numpy as np
+
+from database import TAMANHO_LOTE
+from fluxo_caixa import expandir_recorrencias
+
+# Exportação do ledger (entradas e despesas) em fluxo: os registros passam do
+# banco para o arquivo em lotes de fetchmany, então a memória usada não cresce
+# com o tamanho do histórico.
+
+FORMATOS_EXPORTACAO = ['csv', 'parquet']
+
+# Colunas do arquivo exportado (mesma ordem em CSV e Parquet)
+COLUNAS_EXPORTACAO = [
+    'lancamento', # 'entrada' ou 'despesa'
+    'id', # id do registro na tabela de origem
+    'descricao', # Máquina (entradas) ou título (despesas)
+    'tipo', # Tipo da entrada (ex: 'hora_trabalhada'); vazio nas despesas
+    'valor',
+    'data', # AAAA-MM-DD (nas recorrentes expandidas, a data de cada ocorrência)
+    'recorrente', # 0 ou 1 (0 nas ocorrências expandidas, exceto na primeira, que é o próprio contrato)
+    'frequencia', # 'N/A' nas ocorrências expandidas, exceto na primeira
+    'data_primeira_saida', # AAAA-MM-DD, apenas despesas (nas ocorrências, a do contrato de origem)
+]
+
+
+class _EscritorCSV:
+    """Grava os lotes em CSV à medida que chegam."""
+
+    def __init__(self, caminho):
+        self._arquivo = open(caminho, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._arquivo)
+        self._writer.writerow(COLUNAS_EXPORTACAO)
+
+    def escrever(self, linhas):
+        self._writer.writerows(linhas)
+
+    def fechar(self):
+        self._arquivo.close()
+
+
+class _EscritorParquet:
+    """Grava cada lote como um row group do arquivo Parquet (requer pyarrow)."""
+
+    def __init__(self, caminho):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("A exportação em Parquet requer o pacote 'pyarrow' (pip install pyarrow).")
+
+        self._pa = pa
+        self._schema = pa.schema([
+            ('lancamento', pa.string()),
+            ('id', pa.int64()),
+            ('descricao', pa.string()),
+            ('tipo', pa.string()),
+            ('valor', pa.float64()),
+            ('data', pa.date32()),
+            ('recorrente', pa.int8()),
+            ('frequencia', pa.string()),
+            ('data_primeira_saida', pa.date32()),
+        ])
+        self._writer = pq.ParquetWriter(caminho, self._schema)
+
+    def escrever(self, linhas):
+        colunas = list(zip(*linhas))
+        arrays = []
+        for campo, valores in zip(self._schema, colunas):
+            if campo.type == self._pa.date32():
+                # Datas AAAA-MM-DD (ou None) -> datetime64[D] -> date32
+                valores = np.array(valores, dtype='datetime64[D]')
+            arrays.append(self._pa.array(valores, type=campo.type))
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def fechar(self):
+        self._writer.close()
+
+
+def _linhas_entradas(lote):
+    return [('entrada', id_, maquina, tipo, valor, data_iso, 0, None, None)
+            for id_, maquina, tipo, valor, data_iso in lote]
+
+
+def _linhas_despesas(lote):
+    return [('despesa', id_, titulo, None, valor, data_iso, recorrente, frequencia, data_iso)
+            for id_, titulo, valor, data_iso, recorrente, frequencia in lote]
+
+
+def _lotes_ocorrencias(lote, data_inicio, data_fim, tamanho_lote):
+    """
+    Expande um lote de despesas recorrentes em uma linha por ocorrência dentro de
+    [data_inicio, data_fim], devolvida em lotes de até 'tamanho_lote' linhas.
+
+    A primeira ocorrência (data == data_primeira_saida) é o próprio contrato e
+    mantém recorrente e frequencia; as seguintes saem como despesas não
+    recorrentes (recorrente=0, frequencia='N/A'), ligadas ao contrato pela
+    data_primeira_saida. Assim, somar as linhas "recorrentes" do arquivo (ou
+    reimportá-lo) conta cada contrato uma única vez.
+
+    Um contrato iniciado antes de 'data_inicio' não tem essa primeira ocorrência
+    no intervalo: se ele tiver ocorrências no intervalo, a linha do contrato (com
+    a data da primeira saída, fora do intervalo) sai antes delas, para que o
+    arquivo reimportado continue gerando a recorrência.
+    """
+    datas_iniciais = np.array([linha[3] for linha in lote], dtype='datetime64[D]')
+    inicio = data_inicio if data_inicio is not None else datas_iniciais.min()
+    datas, _, indices = expandir_recorrencias(
+        datas_iniciais, [linha[2] for linha in lote], [linha[5] for linha in lote],
+        inicio, data_fim, retornar_indices=True,
+    )
+    com_ocorrencias = np.unique(indices)
+    anteriores = com_ocorrencias[datas_iniciais[com_ocorrencias] < np.datetime64(inicio, 'D')]
+    if anteriores.size:
+        yield _linhas_despesas([lote[indice] for indice in anteriores])
+    for posicao in range(0, len(indices), tamanho_lote):
+        fatia = slice(posicao, posicao + tamanho_lote)
+        linhas = []
+        for data_iso, indice in zip(datas[fatia].astype(str), indices[fatia]):
+            id_, titulo, valor, data_inicial, recorrente, frequencia = lote[indice]
+            if data_iso != data_inicial:
+                recorrente, frequencia = 0, 'N/A'
+            linhas.append(('despesa', id_, titulo, None, valor, data_iso, recorrente, frequencia, data_inicial))
+        yield linhas
+
+
+def exportar_ledger(db_manager, caminho, formato=None, data_inicio=None, data_fim=None,
+                    expandir_recorrentes=False, tamanho_lote=TAMANHO_LOTE):
+    """
+    Exporta entradas e despesas para CSV ou Parquet, lote a lote.
+
+    Args:
+        db_manager (DatabaseManager): Banco de origem.
+        caminho (str): Arquivo de saída.
+        formato (str): 'csv' ou 'parquet' (padrão: extensão do arquivo).
+        data_inicio, data_fim (date): Filtro opcional por data (inclusivo).
+        expandir_recorrentes (bool): Gera uma linha por ocorrência das despesas
+            recorrentes (até data_fim, ou até hoje se não informada) em vez de
+            uma linha com a data da primeira saída. Os contratos iniciados antes
+            de data_inicio saem também com a própria linha (ver _lotes_ocorrencias).
+        tamanho_lote (int): Linhas lidas por fetchmany (limita a memória usada).
+
+    Returns:
+        int: Quantidade de linhas gravadas.
+    """
+    formato = formato or os.path.splitext(caminho)[1].lstrip('.').lower()
+    if formato == 'csv':
+        escritor = _EscritorCSV(caminho)
+    elif formato == 'parquet':
+        escritor = _EscritorParquet(caminho)
+    else:
+        raise ValueError(f"Formato de exportação desconhecido '{formato}'. Use: {', '.join(FORMATOS_EXPORTACAO)}.")
+
+    total = 0
+    try:
+        # 1. Entradas
+        for lote in db_manager.iterar_entradas(data_inicio, data_fim, tamanho_lote):
+            escritor.escrever(_linhas_entradas(lote))
+            total += len(lote)
+
+        # 2. Despesas (as recorrentes à parte quando forem expandidas)
+        recorrente = False if expandir_recorrentes else None
+        for lote in db_manager.iterar_despesas(data_inicio, data_fim, recorrente, tamanho_lote):
+            escritor.escrever(_linhas_despesas(lote))
+            total += len(lote)
+
+        if expandir_recorrentes:
+            fim = data_fim or datetime.now().date()
+            # Contratos iniciados antes de 'data_inicio' podem ter ocorrências no intervalo
+            for lote in db_manager.iterar_despesas(None, fim, True, tamanho_lote):
+                for linhas in _lotes_ocorrencias(lote, data_inicio, fim, tamanho_lote):
+                    escritor.escrever(linhas)
+                    total += len(linhas)
+    finally:
+        escritor.fechar()
+
+    return total
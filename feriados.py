@@ -0,0 +1,152 @@
+import csv
+import hashlib
+import json
+import os
+import threading
+from datetime import date
+
+import diagnostico
+
+# Tabela de feriados (formato 'holidays' do Prophet: colunas 'ds' e 'holiday')
+# para um intervalo de anos. Nacionais e, opcionalmente, os de uma UF ou de um
+# município suportado pelo pacote 'holidays' (ex: 'São Paulo Capital'), mais os
+# municipais listados em ARQUIVO_FERIADOS_MUNICIPAIS.
+#
+# Gerar a tabela exige importar o pacote 'holidays' e calcular as datas móveis
+# (~0,2 s); ela fica em memória (por processo) e em disco (entre execuções), de
+# modo que cada previsão paga apenas uma consulta a um dicionário.
+
+PAIS = 'BR'
+
+# Unidades da federação aceitas como região (o pacote 'holidays' também aceita alguns municípios)
+UFS = ['AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG', 'MS', 'MT', 'PA', 'PB',
+       'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO']
+
+# Inclui os pontos facultativos (Carnaval, Corpus Christi, vésperas de Natal e Ano-Novo...),
+# dias em que boa parte das obras e clientes também para
+INCLUIR_PONTOS_FACULTATIVOS = True
+
+# Feriados municipais extras, um por linha: 'data;nome', com data DD/MM (todo ano)
+# ou DD/MM/AAAA (só naquele ano). Ignorado se o arquivo não existir.
+ARQUIVO_FERIADOS_MUNICIPAIS = 'feriados_municipais.csv'
+
+# Cache em disco: mesma pasta do cache de modelos (prophet_model.MODEL_CACHE_DIR),
+# onde os arquivos com este prefixo expiram por idade
+CACHE_DIR = '.prophet_cache'
+PREFIXO_CACHE = 'feriados_'
+
+_cache_memoria = {} # chave -> (tabela, assinatura)
+_lock = threading.Lock()
+
+
+def _assinatura_arquivo(caminho):
+    """(mtime, tamanho) do arquivo, ou None se ele não existir: muda quando o arquivo é editado."""
+    try:
+        estado = os.stat(caminho)
+    except OSError:
+        return None
+    return [estado.st_mtime_ns, estado.st_size]
+
+
+def _feriados_municipais(caminho, ano_inicio, ano_fim):
+    """Lê ARQUIVO_FERIADOS_MUNICIPAIS e retorna [(data_iso, nome), ...] dentro do intervalo de anos."""
+    registros = []
+    with open(caminho, 'r', encoding='utf-8-sig', newline='') as f:
+        for numero, linha in enumerate(csv.reader(f, delimiter=';'), start=1):
+            if not linha or not linha[0].strip() or linha[0].strip().lower() == 'data':
+                continue
+            partes = linha[0].strip().split('/')
+            nome = linha[1].strip() if len(linha) > 1 and linha[1].strip() else 'Feriado municipal'
+            try:
+                dia, mes = int(partes[0]), int(partes[1])
+                anos = [int(partes[2])] if len(partes) == 3 else range(ano_inicio, ano_fim + 1)
+                registros.extend(
+                    (date(ano, mes, dia).isoformat(), nome) for ano in anos if ano_inicio <= ano <= ano_fim
+                )
+            except (IndexError, ValueError):
+                print(f"Aviso: Linha {numero} de '{caminho}' ignorada (use DD/MM ou DD/MM/AAAA;nome).")
+    return registros
+
+
+def _gerar_feriados(ano_inicio, ano_fim, regiao, arquivo_municipal):
+    """Calcula os feriados do intervalo com o pacote 'holidays' (dependência do Prophet)."""
+    import holidays
+
+    categorias = ('public', 'optional') if INCLUIR_PONTOS_FACULTATIVOS else ('public',)
+    calendario = holidays.country_holidays(PAIS, subdiv=regiao, years=range(ano_inicio, ano_fim + 1),
+                                           categories=categorias)
+    registros = [(dia.isoformat(), nome) for dia, nome in calendario.items()]
+    if arquivo_municipal and os.path.exists(arquivo_municipal):
+        registros += _feriados_municipais(arquivo_municipal, ano_inicio, ano_fim)
+    return sorted(set(registros))
+
+
+def _caminho_cache(chave):
+    return os.path.join(CACHE_DIR, f"{PREFIXO_CACHE}{chave}.json")
+
+
+def _ler_cache_disco(chave):
+    try:
+        with open(_caminho_cache(chave), 'r', encoding='utf-8') as f:
+            return [tuple(registro) for registro in json.load(f)]
+    except (OSError, ValueError):
+        return None
+
+
+def _salvar_cache_disco(chave, registros):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        caminho = _caminho_cache(chave)
+        # Grava em arquivo temporário e renomeia, para nunca deixar um JSON pela metade
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(registros, f, ensure_ascii=False)
+        os.replace(temporario, caminho)
+    except OSError as e:
+        print(f"Aviso: Não foi possível salvar os feriados no cache: {e}")
+
+
+def tabela_feriados(ano_inicio, ano_fim, regiao=None, arquivo_municipal=ARQUIVO_FERIADOS_MUNICIPAIS):
+    """
+    Feriados de 'ano_inicio' a 'ano_fim' (inclusive) no formato do Prophet.
+
+    Args:
+        ano_inicio, ano_fim (int): Intervalo de anos.
+        regiao (str): UF (ex: 'SP') ou município suportado pelo pacote 'holidays'
+            (ex: 'São Paulo Capital'); None = apenas nacionais.
+        arquivo_municipal (str): CSV de feriados municipais extras (None = nenhum).
+
+    Returns:
+        tuple[pd.DataFrame, str]: Tabela com 'ds' (datetime) e 'holiday' e uma
+        assinatura (hash) do conteúdo, para as chaves de cache dos modelos.
+
+    Raises:
+        NotImplementedError: Região não suportada pelo pacote 'holidays'.
+    """
+    import pandas as pd
+
+    parametros = [PAIS, ano_inicio, ano_fim, regiao, INCLUIR_PONTOS_FACULTATIVOS,
+                  _assinatura_arquivo(arquivo_municipal) if arquivo_municipal else None]
+    chave = hashlib.sha256(json.dumps(parametros).encode('utf-8')).hexdigest()[:32]
+
+    with _lock:
+        em_memoria = _cache_memoria.get(chave)
+    if em_memoria is None:
+        with diagnostico.medir('feriados.tabela', anos=ano_fim - ano_inicio + 1):
+            registros = _ler_cache_disco(chave)
+            if registros is None:
+                registros = _gerar_feriados(ano_inicio, ano_fim, regiao, arquivo_municipal)
+                _salvar_cache_disco(chave, registros)
+            else:
+                diagnostico.contar('cache_feriados.disco')
+
+        tabela = pd.DataFrame(registros, columns=['ds', 'holiday'])
+        tabela['ds'] = pd.to_datetime(tabela['ds'])
+        assinatura = hashlib.sha256(json.dumps(registros, ensure_ascii=False).encode('utf-8')).hexdigest()
+        em_memoria = (tabela, assinatura)
+        with _lock:
+            _cache_memoria[chave] = em_memoria
+
+    tabela, assinatura = em_memoria
+    # Cópia: o Prophet guarda e ajusta a tabela recebida
+    return tabela.copy(), assinatura
@@ -0,0 +1,159 @@
+import numpy as np
+
+# Passo, em meses, de cada frequência de despesa recorrente
+FREQUENCIA_MESES = {
+    'Mensal': 1,
+    'Trimestral': 3,
+    'Semestral': 6,
+    'Anual': 12,
+}
+
+
+def _ocorrencia(meses_iniciais, dias_iniciais, passos, n):
+    """
+    Calcula a n-ésima ocorrência de cada despesa (vetorizado).
+
+    O dia do mês é limitado ao último dia do mês de destino, como faz o
+    relativedelta (ex: 31/01 + 1 mês = 28/02 ou 29/02).
+    """
+    meses = meses_iniciais + n * passos
+    inicio_mes = meses.astype('datetime64[M]').astype('datetime64[D]')
+    inicio_proximo_mes = (meses + 1).astype('datetime64[M]').astype('datetime64[D]')
+    dias_no_mes = (inicio_proximo_mes - inicio_mes).astype(np.int64)
+    return inicio_mes + np.minimum(dias_iniciais, dias_no_mes - 1)
+
+
+def expandir_recorrencias(datas_iniciais, valores, frequencias, start_date, end_date, retornar_indices=False):
+    """
+    Gera, em uma única passada vetorizada, todas as ocorrências das despesas
+    recorrentes que caem dentro de [start_date, end_date].
+
+    Cada ocorrência é calculada diretamente a partir da data inicial
+    (data_inicial + n * passo), sem percorrer as ocorrências anteriores ao
+    intervalo. Frequências desconhecidas são ignoradas.
+
+    Args:
+        datas_iniciais: Datas da primeira saída (date, str AAAA-MM-DD ou datetime64).
+        valores: Valor de cada despesa.
+        frequencias: 'Mensal', 'Trimestral', 'Semestral' ou 'Anual'.
+        start_date (date): Início do intervalo (inclusivo).
+        end_date (date): Fim do intervalo (inclusivo).
+        retornar_indices (bool): Inclui no retorno, para cada ocorrência, o índice
+            (na entrada) da despesa que a gerou.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Datas das ocorrências (datetime64[D]) e seus valores (float64).
+        Com retornar_indices=True, uma terceira posição com os índices (int64).
+    """
+    datas = np.asarray(datas_iniciais, dtype='datetime64[D]')
+    valores = np.asarray(valores, dtype=np.float64)
+    passos = np.array([FREQUENCIA_MESES.get(f, 0) for f in frequencias], dtype=np.int64)
+
+    # Ignora frequências desconhecidas
+    validos = passos > 0
+    datas, valores, passos = datas[validos], valores[validos], passos[validos]
+    if datas.size == 0:
+        return _sem_ocorrencias(retornar_indices)
+
+    inicio = np.datetime64(start_date, 'D')
+    fim = np.datetime64(end_date, 'D')
+
+    # Decompõe a data inicial em (mês desde 1970, dia do mês a partir de 0)
+    meses_iniciais = datas.astype('datetime64[M]').astype(np.int64)
+    dias_iniciais = (datas - datas.astype('datetime64[M]').astype('datetime64[D]')).astype(np.int64)
+
+    # Primeira ocorrência dentro do intervalo: salta direto para o mês de início
+    mes_inicio = inicio.astype('datetime64[M]').astype(np.int64)
+    n_primeira = np.maximum(0, -((meses_iniciais - mes_inicio) // passos))
+    antes_do_inicio = _ocorrencia(meses_iniciais, dias_iniciais, passos, n_primeira) < inicio
+    n_primeira = n_primeira + antes_do_inicio
+
+    # Última ocorrência dentro do intervalo
+    mes_fim = fim.astype('datetime64[M]').astype(np.int64)
+    n_ultima = (mes_fim - meses_iniciais) // passos
+    depois_do_fim = _ocorrencia(meses_iniciais, dias_iniciais, passos, n_ultima) > fim
+    n_ultima = n_ultima - depois_do_fim
+
+    quantidades = np.maximum(0, n_ultima - n_primeira + 1)
+    total = int(quantidades.sum())
+    if total == 0:
+        return _sem_ocorrencias(retornar_indices)
+
+    # Expande todas as ocorrências de uma vez (índice da despesa + número da ocorrência)
+    indices = np.repeat(np.arange(quantidades.size), quantidades)
+    deslocamentos = np.arange(total) - np.repeat(np.cumsum(quantidades) - quantidades, quantidades)
+    n = n_primeira[indices] + deslocamentos
+
+    datas_ocorrencias = _ocorrencia(meses_iniciais[indices], dias_iniciais[indices], passos[indices], n)
+    if retornar_indices:
+        return datas_ocorrencias, valores[indices], np.flatnonzero(validos)[indices]
+    return datas_ocorrencias, valores[indices]
+
+
+def _sem_ocorrencias(retornar_indices):
+    vazio = (np.array([], dtype='datetime64[D]'), np.array([], dtype=np.float64))
+    return vazio + (np.array([], dtype=np.int64),) if retornar_indices else vazio
+
+
+def montar_fluxo_diario(start_date, end_date, hoje, datas_receitas, valores_receitas,
+                        datas_despesas, valores_despesas, receita_padrao=500.00):
+    """
+    Monta a série diária de fluxo de caixa em arrays pré-alocados (um valor por dia).
+
+    Os valores são acumulados por deslocamento em dias a partir de start_date
+    (np.bincount), sem dicionários nem merges. Dias futuros (>= hoje) sem
+    receita registrada recebem a média diária das receitas informadas.
+
+    Args:
+        start_date (date): Primeiro dia da série.
+        end_date (date): Último dia da série (inclusivo).
+        hoje (date): Data de referência a partir da qual a receita é projetada.
+        datas_receitas, valores_receitas: Receitas (datetime64[D] e valores); pode haver vários lançamentos no mesmo dia.
+        datas_despesas, valores_despesas: Despesas (datetime64[D] e valores), já com as recorrências expandidas.
+        receita_padrao (float): Média usada quando não há nenhuma receita registrada.
+
+    Returns:
+        pd.DataFrame: Colunas 'ds' (datetime64[ns]), 'y', 'y_receita' e 'y_despesa'.
+    """
+    # pandas só é necessário aqui; importado sob demanda para não pesar na abertura do menu
+    import pandas as pd
+
+    inicio = np.datetime64(start_date, 'D')
+    n_dias = int((np.datetime64(end_date, 'D') - inicio).astype(np.int64)) + 1
+
+    # Receitas: soma por dia e marca os dias que possuem lançamento
+    y_receita, com_receita = _acumular_por_dia(inicio, n_dias, datas_receitas, valores_receitas)
+    y_despesa, _ = _acumular_por_dia(inicio, n_dias, datas_despesas, valores_despesas)
+
+    # Média diária das receitas registradas (apenas dias com lançamento)
+    if com_receita.any():
+        media_receita_diaria = y_receita[com_receita].mean()
+    else:
+        media_receita_diaria = receita_padrao # Valor padrão se não houver dados históricos
+
+    # Aplica a média nos dias futuros que não possuem receita registrada
+    deslocamento_hoje = int((np.datetime64(hoje, 'D') - inicio).astype(np.int64))
+    futuro_sem_receita = (np.arange(n_dias) >= deslocamento_hoje) & ~com_receita
+    y_receita[futuro_sem_receita] = media_receita_diaria
+
+    ds = (inicio + np.arange(n_dias)).astype('datetime64[ns]')
+    return pd.DataFrame({
+        'ds': ds,
+        'y': y_receita - y_despesa,
+        'y_receita': y_receita,
+        'y_despesa': y_despesa,
+    })
+
+
+def _acumular_por_dia(inicio, n_dias, datas, valores):
+    """Soma os valores por dia do intervalo; retorna (somas float64, máscara de dias com lançamento)."""
+    deslocamentos = (np.asarray(datas, dtype='datetime64[D]') - inicio).astype(np.int64)
+    valores = np.asarray(valores, dtype=np.float64)
+
+    # Descarta lançamentos fora do intervalo
+    dentro = (deslocamentos >= 0) & (deslocamentos < n_dias)
+    deslocamentos, valores = deslocamentos[dentro], valores[dentro]
+
+    somas = np.bincount(deslocamentos, weights=valores, minlength=n_dias)
+    com_lancamento = np.bincount(deslocamentos, minlength=n_dias) > 0
+    return somas, com_lancamento
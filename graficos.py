@@ -0,0 +1,167 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import plotly
+import plotly.graph_objects as go
+import plotly.offline as pyo
+
+import diagnostico
+
+# Arquivo HTML gerado para o gráfico comparativo
+ARQUIVO_GRAFICO = "forecast_comparison_plot.html"
+
+# Como o plotly.js é incluído no HTML:
+#   'local'  -> referencia uma cópia única do plotly.js salva ao lado do HTML (arquivos de poucos KB)
+#   'inline' -> embute o plotly.js no próprio HTML (arquivo autônomo de vários MB)
+#   'cdn'    -> carrega o plotly.js da internet
+PLOTLYJS_PADRAO = 'local'
+
+# Acima destes horizontes (em dias) as barras diárias são agrupadas por semana / por mês.
+# O diário cobre a previsão padrão da interface (180 dias).
+LIMITE_DIAS_DIARIO = 186
+LIMITE_DIAS_SEMANAL = 730
+
+# Opacidade das barras de períodos incompletos (semana/mês cortado pelo início ou fim da previsão)
+OPACIDADE_PERIODO_PARCIAL = 0.45
+
+# Agrupamentos aceitos e rótulo exibido no gráfico
+AGREGACOES = {
+    'D': 'Diário',
+    'W': 'Semanal', # Blocos de 7 dias a partir do primeiro dia previsto
+    'M': 'Mensal', # Meses do calendário
+}
+
+
+def _arquivo_plotlyjs(plot_file):
+    """
+    Garante uma cópia do plotly.js na pasta do HTML e retorna o nome do arquivo.
+
+    O nome inclui a versão do plotly, então uma atualização da biblioteca gera
+    uma cópia nova em vez de reaproveitar um bundle incompatível.
+    """
+    nome = f"plotly-{plotly.__version__}.min.js"
+    caminho = os.path.join(os.path.dirname(os.path.abspath(plot_file)), nome)
+    if not os.path.exists(caminho):
+        temporario = f"{caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            f.write(pyo.get_plotlyjs())
+        os.replace(temporario, caminho)
+    return nome
+
+
+def escolher_agregacao(n_dias):
+    """Escolhe o agrupamento ('D', 'W' ou 'M') conforme o horizonte exibido."""
+    if n_dias <= LIMITE_DIAS_DIARIO:
+        return 'D'
+    if n_dias <= LIMITE_DIAS_SEMANAL:
+        return 'W'
+    return 'M'
+
+
+def agregar_periodo(df_plot: pd.DataFrame, agregacao: str) -> pd.DataFrame:
+    """
+    Soma receitas e despesas por semana/mês.
+
+    As semanas começam no primeiro dia previsto; o 'ds' de cada período é o seu
+    primeiro dia dentro da previsão (nunca antes de hoje). A coluna 'parcial'
+    marca os períodos com menos dias que o completo (a última semana, ou os meses
+    cortados pelo início/fim da previsão), cujos totais não são comparáveis aos demais.
+    """
+    if agregacao not in AGREGACOES:
+        raise ValueError(f"Agrupamento desconhecido '{agregacao}'. Use: {', '.join(AGREGACOES)}.")
+    if agregacao == 'D':
+        return df_plot[['ds', 'y_receita', 'y_despesa']].assign(dias=1, parcial=False)
+
+    serie = df_plot[['ds', 'y_receita', 'y_despesa']].assign(dias=1)
+    if agregacao == 'W':
+        # Blocos de 7 dias contados a partir do primeiro dia previsto
+        periodo = (serie['ds'] - serie['ds'].min()).dt.days // 7
+        dias_completos = 7
+    else:
+        periodo = serie['ds'].dt.to_period('M')
+    df_agregado = serie.groupby(periodo.to_numpy(), sort=True).agg(
+        {'ds': 'min', 'y_receita': 'sum', 'y_despesa': 'sum', 'dias': 'sum'}
+    )
+    if agregacao == 'M':
+        dias_completos = df_agregado['ds'].dt.days_in_month
+    return df_agregado.assign(parcial=df_agregado['dias'] < dias_completos).reset_index(drop=True)
+
+
+def criar_figura_previsao(df_forecast_plot: pd.DataFrame, cor_receita: str, cor_despesa: str,
+                          agregacao: str = None):
+    """
+    Cria um gráfico de barras AGRUPADAS interativo comparando Receitas e Despesas.
+    Recebe o DataFrame com 'ds', 'y_receita', 'y_despesa'.
+
+    Args:
+        agregacao (str): 'D', 'W' ou 'M'. Se None, é escolhida pelo horizonte
+            (diário até LIMITE_DIAS_DIARIO, semanal até LIMITE_DIAS_SEMANAL, mensal acima).
+    """
+
+    # Filtra apenas o período previsto, a partir de hoje
+    today = pd.to_datetime(datetime.now().date())
+    df_plot_future = df_forecast_plot[df_forecast_plot['ds'] >= today]
+    n_dias = len(df_plot_future)
+
+    agregacao = agregacao or escolher_agregacao(n_dias)
+    df_plot = agregar_periodo(df_plot_future, agregacao)
+    rotulo = AGREGACOES[agregacao]
+
+    # NÃO precisamos de valores negativos aqui, apenas os valores absolutos para barras agrupadas
+
+    series = [
+        ('Receitas Previstas', 'y_receita', cor_receita), # Laranja
+        ('Despesas Previstas', 'y_despesa', cor_despesa), # Vermelho
+    ]
+    # Períodos incompletos ficam mais claros e indicam no hover quantos dias somam
+    opacidade = df_plot['parcial'].map({True: OPACIDADE_PERIODO_PARCIAL, False: 1.0}).tolist()
+    observacao = [f' (parcial: {dias} dias)' if parcial else ''
+                  for dias, parcial in zip(df_plot['dias'], df_plot['parcial'])]
+    data = [
+        go.Bar(name=nome, x=df_plot['ds'], y=df_plot[coluna], marker=dict(color=cor, opacity=opacidade),
+               customdata=observacao, hovertemplate='%{y:,.2f}%{customdata}')
+        for nome, coluna, cor in series
+    ]
+
+    fig = go.Figure(data=data)
+
+    fig.update_layout(
+        barmode='group', # MODO AGRUPADO: barras lado a lado
+        title_text=f'Comparação de Receitas vs. Despesas Previstas (Próximos {n_dias} Dias - {rotulo})',
+        xaxis_title="Data",
+        yaxis_title="Valor (R$)",
+        hovermode="x unified",
+        xaxis=dict(tickformat="%d/%m/%y"), # Formato de data no eixo X
+        yaxis=dict(rangemode='tozero') # Garante que o eixo Y comece em zero
+    )
+    return fig
+
+
+def salvar_grafico_previsao(df_forecast_plot: pd.DataFrame, cor_receita: str, cor_despesa: str,
+                            plot_file: str = ARQUIVO_GRAFICO, plotlyjs: str = PLOTLYJS_PADRAO,
+                            agregacao: str = None) -> str:
+    """
+    Gera o gráfico comparativo e o salva em HTML.
+
+    Args:
+        plotlyjs (str): 'local', 'inline' ou 'cdn' (ver PLOTLYJS_PADRAO).
+        agregacao (str): 'D', 'W', 'M' ou None (automático).
+
+    Returns:
+        str: Caminho absoluto do arquivo gerado.
+    """
+    if plotlyjs == 'local':
+        include_plotlyjs = _arquivo_plotlyjs(plot_file)
+    elif plotlyjs == 'inline':
+        include_plotlyjs = True
+    elif plotlyjs == 'cdn':
+        include_plotlyjs = 'cdn'
+    else:
+        raise ValueError(f"Opção de plotly.js desconhecida '{plotlyjs}'. Use 'local', 'inline' ou 'cdn'.")
+
+    with diagnostico.medir('grafico.figura', linhas=len(df_forecast_plot)):
+        fig = criar_figura_previsao(df_forecast_plot, cor_receita, cor_despesa, agregacao=agregacao)
+    with diagnostico.medir('grafico.html'):
+        pyo.plot(fig, filename=plot_file, auto_open=False, include_plotlyjs=include_plotlyjs)
+    return os.path.abspath(plot_file)
@@ -0,0 +1,422 @@
+import codecs
+import html
+import os
+import re
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+import diagnostico
+from fluxo_caixa import FREQUENCIA_MESES
+
+# Importação de extratos bancários (OFX) e planilhas (CSV) em fluxo: o arquivo é
+# lido em blocos, cada bloco é validado de forma vetorizada (pandas), comparado
+# com o que já está no banco e gravado em uma transação própria. A memória usada
+# não cresce com o tamanho do arquivo e, se a importação for interrompida, basta
+# repeti-la: as linhas já gravadas são reconhecidas como repetidas.
+#
+# Cada linha vira uma entrada (receita, 'hora_trabalhada') ou uma despesa, com as
+# mesmas regras dos formulários de cadastro:
+# - data DD/MM/AAAA (também aceitas AAAA-MM-DD e, no OFX, AAAAMMDD)
+# - entrada: valor >= 0 e máquina informada
+# - despesa: valor > 0, título não vazio e, se recorrente, uma frequência válida
+#
+# CSV: cabeçalho obrigatório, separador ';', ',' ou tabulação (detectado), UTF-8
+# ou Windows-1252. Colunas (sem diferenciar maiúsculas/acentos):
+# - data, e valor ou credito/debito (obrigatórias)
+# - descricao (ou historico/titulo/memo)
+# - lancamento ('entrada' ou 'despesa'), maquina, recorrente, frequencia (opcionais)
+# - data_primeira_saida (opcional; a do layout da exportação)
+# O layout gerado por exportacao.exportar_ledger é aceito. Em um arquivo com as
+# recorrências expandidas, a primeira ocorrência de cada contrato (data igual a
+# data_primeira_saida) é importada como a despesa recorrente e as seguintes são
+# rejeitadas como 'ocorrência expandida': a recorrência já as gera na previsão. Sem 'lancamento', valores
+# positivos são entradas e negativos, despesas.
+#
+# OFX: cada <STMTTRN> vira uma linha (DTPOSTED, TRNAMT, MEMO/NAME); créditos são
+# entradas da máquina 'maquina_padrao' e débitos, despesas.
+
+FORMATOS_IMPORTACAO = ['csv', 'ofx']
+
+# Linhas lidas, validadas e gravadas por vez
+TAMANHO_BLOCO = 20000
+
+# Formatos de data aceitos, na ordem em que são tentados
+FORMATOS_DATA_IMPORTACAO = ['%d/%m/%Y', '%Y-%m-%d', '%Y%m%d']
+
+# Máquina das entradas sem máquina informada (créditos de extrato OFX)
+MAQUINA_EXTRATO = 'Extrato bancário'
+
+# Linhas inválidas listadas no resumo (as demais são apenas contadas)
+MAX_LINHAS_INVALIDAS = 20
+
+# Bytes lidos do arquivo OFX por vez
+TAMANHO_LEITURA_OFX = 1024 * 1024
+
+# Nomes de coluna aceitos no CSV (já normalizados) -> coluna usada na importação
+SINONIMOS_COLUNAS = {
+    'data': 'data', 'date': 'data', 'data_lancamento': 'data', 'data_movimento': 'data', 'dt_lancamento': 'data',
+    'valor': 'valor', 'value': 'valor', 'amount': 'valor', 'valor_lancamento': 'valor',
+    'credito': 'credito', 'debito': 'debito',
+    'descricao': 'descricao', 'historico': 'descricao', 'titulo': 'descricao', 'memo': 'descricao',
+    'lancamento': 'lancamento',
+    'maquina': 'maquina',
+    'recorrente': 'recorrente',
+    'frequencia': 'frequencia',
+    'data_primeira_saida': 'data_primeira_saida',
+}
+
+_VALORES_SIM = ['1', 'sim', 's', 'true', 'verdadeiro', 'x']
+
+# Inteiro com pontos de milhar e sem decimais (ex: '1.500', '-2.000', '1.234.567')
+_RE_MILHAR = r'[-+]?[1-9]\d{0,2}(?:\.\d{3})+'
+
+# Motivo das linhas de exportação com recorrências expandidas (contadas à parte das inválidas)
+MOTIVO_OCORRENCIA_EXPANDIDA = 'ocorrência expandida'
+
+_RE_TRANSACAO_OFX = re.compile(rb'<STMTTRN>(.*?)</STMTTRN>', re.S | re.I)
+_RE_CAMPO_OFX = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+def _normalizar_nome_coluna(nome):
+    """'Data Lançamento', 'Crédito (R$)' -> 'data_lancamento', 'credito'."""
+    nome = unicodedata.normalize('NFKD', str(nome)).encode('ascii', 'ignore').decode('ascii')
+    nome = re.sub(r'\(.*?\)', '', nome.lower())
+    return re.sub(r'[^a-z0-9]+', '_', nome).strip('_')
+
+
+def _detectar_codificacao(amostra):
+    """UTF-8 (com ou sem BOM) se a amostra decodificar; senão Windows-1252 (comum em bancos)."""
+    try:
+        # Incremental: um caractere cortado no fim da amostra não é erro
+        codecs.getincrementaldecoder('utf-8')().decode(amostra, final=False)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'cp1252'
+
+
+def _detectar_separador(cabecalho):
+    """Separador mais frequente no cabeçalho (nos dados, a vírgula decimal confundiria a contagem)."""
+    return max([';', ',', '\t'], key=cabecalho.count)
+
+
+def _blocos_csv(caminho, tamanho_bloco):
+    """Lê o CSV em blocos de DataFrame (colunas de texto). Yields: (bloco, bytes lidos)."""
+    import pandas as pd
+
+    with open(caminho, 'rb') as f:
+        amostra = f.read(64 * 1024)
+        codificacao = _detectar_codificacao(amostra)
+        cabecalho = amostra.decode(codificacao, errors='replace').splitlines()[0] if amostra.strip() else ''
+        f.seek(0)
+        if not cabecalho:
+            return
+
+        leitor = pd.read_csv(
+            f, sep=_detectar_separador(cabecalho), dtype=str, keep_default_na=False,
+            encoding=codificacao, encoding_errors='replace', chunksize=tamanho_bloco,
+        )
+        colunas = None
+        for bloco in leitor:
+            if colunas is None:
+                colunas = _mapear_colunas(bloco.columns, caminho)
+            bloco = bloco[list(colunas)].rename(columns=colunas)
+            yield bloco, f.tell()
+
+
+def _mapear_colunas(colunas_arquivo, caminho):
+    """{coluna do arquivo: coluna da importação}; ValueError se faltar data ou valor."""
+    colunas = {}
+    for coluna in colunas_arquivo:
+        destino = SINONIMOS_COLUNAS.get(_normalizar_nome_coluna(coluna))
+        # Se houver duas colunas equivalentes (ex: 'titulo' e 'historico'), vale a primeira
+        if destino is not None and destino not in colunas.values():
+            colunas[coluna] = destino
+
+    encontradas = set(colunas.values())
+    if 'data' not in encontradas or not ({'valor', 'credito', 'debito'} & encontradas):
+        raise ValueError(
+            f"O arquivo '{caminho}' precisa das colunas 'data' e 'valor' (ou 'credito'/'debito'). "
+            f"Colunas encontradas: {', '.join(map(str, colunas_arquivo))}."
+        )
+    return colunas
+
+
+def _transacao_ofx(bloco):
+    """Campos de um <STMTTRN> (OFX 1.x em SGML, sem tags de fechamento, ou 2.x em XML)."""
+    try:
+        texto = bloco.decode('utf-8')
+    except UnicodeDecodeError:
+        texto = bloco.decode('cp1252', errors='replace')
+    campos = {tag.upper(): html.unescape(valor.strip()) for tag, valor in _RE_CAMPO_OFX.findall(texto)}
+    return {
+        'data': campos.get('DTPOSTED', '')[:8], # AAAAMMDD[HHMMSS[.XXX][fuso]]
+        'valor': campos.get('TRNAMT', ''),
+        'descricao': campos.get('MEMO') or campos.get('NAME', ''),
+    }
+
+
+def _blocos_ofx(caminho, tamanho_bloco, maquina_padrao):
+    """Lê as transações do OFX em blocos de DataFrame, sem carregar o arquivo inteiro. Yields: (bloco, bytes lidos)."""
+    import pandas as pd
+
+    with open(caminho, 'rb') as f:
+        pendente = b''
+        transacoes = []
+        while True:
+            dados = f.read(TAMANHO_LEITURA_OFX)
+            buffer = pendente + dados
+            fim = 0
+            for transacao in _RE_TRANSACAO_OFX.finditer(buffer):
+                transacoes.append(_transacao_ofx(transacao.group(1)))
+                fim = transacao.end()
+
+            # Guarda apenas a transação ainda incompleta (ou o fim do buffer, caso a tag de abertura tenha sido cortada)
+            pendente = buffer[fim:]
+            abertura = pendente.upper().find(b'<STMTTRN>')
+            pendente = pendente[abertura:] if abertura != -1 else pendente[-len(b'<STMTTRN>'):]
+
+            if transacoes and (len(transacoes) >= tamanho_bloco or not dados):
+                bloco = pd.DataFrame(transacoes, columns=['data', 'valor', 'descricao'])
+                bloco['maquina'] = maquina_padrao or MAQUINA_EXTRATO
+                yield bloco, f.tell()
+                transacoes = []
+            if not dados:
+                return
+
+
+def _converter_datas(serie):
+    """Texto -> datetime64 (NaT se inválida), tentando cada formato de FORMATOS_DATA_IMPORTACAO."""
+    import pandas as pd
+
+    datas = pd.to_datetime(serie, format=FORMATOS_DATA_IMPORTACAO[0], errors='coerce')
+    for formato in FORMATOS_DATA_IMPORTACAO[1:]:
+        faltando = datas.isna() & serie.ne('')
+        if not faltando.any():
+            break
+        datas[faltando] = pd.to_datetime(serie[faltando], format=formato, errors='coerce')
+    return datas
+
+
+def _formatar_datas(datas, formato):
+    """strftime só das datas distintas (em um extrato, poucas por bloco), distribuído às linhas."""
+    import pandas as pd
+
+    codigos, distintas = pd.factorize(datas)
+    textos = np.append(np.asarray(distintas.strftime(formato), dtype=object), None) # -1 (NaT) -> None
+    return pd.Series(textos[codigos], index=datas.index)
+
+
+def _converter_valores(serie):
+    """'R$ 1.234,56', '1.500', '-1234.56' -> float (NaN se inválido)."""
+    import pandas as pd
+
+    texto = serie.str.replace(r'R\$|\s', '', regex=True)
+    # Formato brasileiro: vírgula decimal, ou só pontos de milhar ('1.500', '1.234.567').
+    # '1.500' é R$ 1.500,00, não 1,5 (valores em reais não têm três casas decimais).
+    brasileiro = texto.str.contains(',', regex=False) | texto.str.fullmatch(_RE_MILHAR)
+    texto = texto.where(~brasileiro, texto.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    valores = pd.to_numeric(texto, errors='coerce').astype(np.float64)
+    return valores.where(np.isfinite(valores))
+
+
+def _texto(bloco, coluna):
+    """Coluna do bloco sem espaços nas pontas ('' se a coluna não existir)."""
+    import pandas as pd
+
+    if coluna not in bloco:
+        return pd.Series('', index=bloco.index, dtype=object)
+    return bloco[coluna].astype(str).str.strip()
+
+
+def _normalizar_bloco(bloco, maquina_padrao):
+    """
+    Valida e converte um bloco (vetorizado).
+
+    Returns:
+        tuple: (entradas, despesas, invalidas). 'entradas' e 'despesas' são
+        DataFrames com as colunas 'nome', 'valor', 'data' (DD/MM/AAAA),
+        'data_iso' e, nas despesas, 'recorrente' e 'frequencia'; 'invalidas' é
+        uma Series com o motivo, indexada pela posição da linha no arquivo.
+    """
+    import pandas as pd
+
+    datas = _converter_datas(_texto(bloco, 'data'))
+    if 'valor' in bloco:
+        valores = _converter_valores(_texto(bloco, 'valor'))
+    else:
+        # Colunas separadas de crédito e débito (vazio = 0); o débito pode vir com ou sem sinal
+        credito = _texto(bloco, 'credito')
+        debito = _texto(bloco, 'debito')
+        valores = (_converter_valores(credito.where(credito.ne(''), '0'))
+                   - _converter_valores(debito.where(debito.ne(''), '0')).abs())
+
+    descricao = _texto(bloco, 'descricao')
+    lancamento = _texto(bloco, 'lancamento')
+    explicito = lancamento.str.lower().isin(['entrada', 'despesa'])
+    # Em alguns extratos, 'Lançamento' é o histórico da linha, não o tipo
+    descricao = descricao.where(descricao.ne('') | explicito, lancamento)
+    lancamento = lancamento.str.lower()
+    despesa = lancamento.eq('despesa') | (~explicito & (valores < 0))
+
+    maquina = _texto(bloco, 'maquina')
+    if maquina_padrao:
+        maquina = maquina.where(maquina.ne(''), maquina_padrao)
+    # No layout da exportação, a máquina das entradas está em 'descricao'
+    maquina = maquina.where(maquina.ne(''), descricao)
+
+    recorrente = _texto(bloco, 'recorrente').str.lower().isin(_VALORES_SIM) & despesa
+    frequencia = _texto(bloco, 'frequencia').str.capitalize().where(recorrente, 'N/A')
+    # Exportação com recorrências expandidas: uma linha por ocorrência do contrato
+    datas_primeira_saida = _converter_datas(_texto(bloco, 'data_primeira_saida'))
+    expandida = despesa & datas_primeira_saida.notna() & datas.ne(datas_primeira_saida)
+
+    # Motivos em ordem de prioridade (o último aplicado prevalece)
+    motivo = pd.Series(None, index=bloco.index, dtype=object)
+    motivo[recorrente & ~frequencia.isin(list(FREQUENCIA_MESES))] = 'frequência inválida'
+    motivo[expandida] = MOTIVO_OCORRENCIA_EXPANDIDA
+    motivo[~despesa & maquina.eq('')] = 'máquina não informada'
+    motivo[despesa & descricao.eq('')] = 'descrição vazia'
+    motivo[despesa & valores.eq(0)] = 'despesa com valor zero'
+    motivo[~despesa & (valores < 0)] = 'valor negativo em entrada'
+    motivo[valores.isna()] = 'valor inválido'
+    motivo[datas.isna()] = 'data inválida'
+    validas = motivo.isna()
+
+    colunas = pd.DataFrame({
+        'nome': maquina.where(~despesa, descricao),
+        'valor': valores.abs(),
+        'data': _formatar_datas(datas, '%d/%m/%Y'),
+        'data_iso': _formatar_datas(datas, '%Y-%m-%d'),
+        'recorrente': recorrente,
+        'frequencia': frequencia,
+    })
+    entradas = colunas.loc[validas & ~despesa, ['nome', 'valor', 'data', 'data_iso']]
+    despesas = colunas.loc[validas & despesa]
+    return entradas, despesas, motivo[~validas]
+
+
+def _filtrar_repetidas(linhas, existentes, gravadas):
+    """
+    Separa as linhas novas das que já estão no banco.
+
+    Compara multiconjuntos de chaves (data_iso, nome, centavos): duas linhas
+    iguais no arquivo só são repetidas se o banco já tiver duas. 'gravadas'
+    desconta o que esta importação já gravou (em blocos anteriores).
+
+    Returns:
+        tuple[list[int], int]: Posições das linhas novas e quantidade de repetidas.
+    """
+    disponiveis = existentes - gravadas
+    novas = []
+    repetidas = 0
+    chaves = zip(linhas['data_iso'].tolist(), linhas['nome'].tolist(), np.round(linhas['valor'].to_numpy() * 100).astype(np.int64).tolist())
+    for posicao, chave in enumerate(chaves):
+        if disponiveis[chave] > 0:
+            disponiveis[chave] -= 1
+            repetidas += 1
+        else:
+            gravadas[chave] += 1
+            novas.append(posicao)
+    return novas, repetidas
+
+
+def importar_arquivo(db_manager, caminho, formato=None, maquina_padrao=None, tamanho_bloco=TAMANHO_BLOCO,
+                     progresso=None, cancelar=None):
+    """
+    Importa um extrato OFX ou uma planilha CSV, bloco a bloco.
+
+    Linhas inválidas são ignoradas (e contadas); linhas que já estão no banco
+    (mesma data, máquina/título e valor) não são gravadas de novo. As
+    ocorrências de uma exportação com recorrências expandidas são ignoradas e
+    contadas à parte (não são erros). Cada bloco (entradas e despesas) é
+    gravado em uma transação: se a importação parar no meio, os blocos já
+    gravados permanecem e importar o arquivo de novo completa o restante.
+
+    Args:
+        db_manager (DatabaseManager): Banco de destino.
+        caminho (str): Arquivo de entrada.
+        formato (str): 'csv' ou 'ofx' (padrão: extensão do arquivo).
+        maquina_padrao (str): Máquina das entradas sem máquina informada
+            (padrão no OFX: MAQUINA_EXTRATO).
+        tamanho_bloco (int): Linhas lidas e gravadas por vez.
+        progresso (callable): Chamada após cada bloco com (linhas lidas, bytes lidos, bytes totais).
+        cancelar (threading.Event): Se marcado, interrompe a importação entre dois blocos.
+
+    Returns:
+        dict: {'lidas', 'entradas', 'despesas', 'duplicadas', 'invalidas', 'ocorrencias_expandidas',
+        'linhas_invalidas': [(linha, motivo), ...] (até MAX_LINHAS_INVALIDAS), 'cancelada'}.
+
+    Raises:
+        ValueError: Formato desconhecido ou colunas obrigatórias ausentes no CSV.
+        RuntimeError: Falha ao gravar um bloco no banco.
+    """
+    formato = formato or os.path.splitext(caminho)[1].lstrip('.').lower()
+    if formato == 'csv':
+        blocos = _blocos_csv(caminho, tamanho_bloco)
+        # Linha 1 é o cabeçalho
+        primeira_linha = 2
+    elif formato == 'ofx':
+        blocos = _blocos_ofx(caminho, tamanho_bloco, maquina_padrao)
+        # Numeração das transações
+        primeira_linha = 1
+    else:
+        raise ValueError(f"Formato de importação desconhecido '{formato}'. Use: {', '.join(FORMATOS_IMPORTACAO)}.")
+
+    bytes_total = os.path.getsize(caminho)
+    resumo = {'lidas': 0, 'entradas': 0, 'despesas': 0, 'duplicadas': 0, 'invalidas': 0,
+              'ocorrencias_expandidas': 0, 'linhas_invalidas': [], 'cancelada': False}
+    # Chaves já gravadas por esta importação, para não confundi-las com repetições
+    entradas_gravadas, despesas_gravadas = Counter(), Counter()
+
+    for bloco, bytes_lidos in blocos:
+        if cancelar is not None and cancelar.is_set():
+            resumo['cancelada'] = True
+            break
+
+        bloco.index = range(resumo['lidas'] + primeira_linha, resumo['lidas'] + primeira_linha + len(bloco))
+        with diagnostico.medir('importacao.bloco', linhas=len(bloco)):
+            entradas, despesas, invalidas = _normalizar_bloco(bloco, maquina_padrao)
+            expandidas = invalidas.eq(MOTIVO_OCORRENCIA_EXPANDIDA)
+            resumo['ocorrencias_expandidas'] += int(expandidas.sum())
+            invalidas = invalidas[~expandidas]
+            resumo['invalidas'] += len(invalidas)
+            espaco = MAX_LINHAS_INVALIDAS - len(resumo['linhas_invalidas'])
+            resumo['linhas_invalidas'].extend(list(invalidas.items())[:max(espaco, 0)])
+
+            existentes_entradas, existentes_despesas = db_manager.contar_chaves_lancamentos(
+                set(entradas['data_iso']) | set(despesas['data_iso'])
+            )
+            novas, repetidas = _filtrar_repetidas(entradas, existentes_entradas, entradas_gravadas)
+            resumo['duplicadas'] += repetidas
+            entradas = entradas.iloc[novas]
+            novas, repetidas = _filtrar_repetidas(despesas, existentes_despesas, despesas_gravadas)
+            resumo['duplicadas'] += repetidas
+            despesas = despesas.iloc[novas]
+
+            # Entradas e despesas do bloco na mesma transação: uma falha desfaz as duas
+            with db_manager.transacao():
+                if len(entradas):
+                    registros = zip(entradas['nome'].tolist(), entradas['valor'].tolist(), entradas['data'].tolist())
+                    if db_manager.insert_entradas_many(registros) != len(entradas):
+                        raise RuntimeError(f"Falha ao gravar as entradas do bloco iniciado na linha {bloco.index[0]}.")
+                if len(despesas):
+                    registros = zip(despesas['nome'].tolist(), despesas['valor'].tolist(), despesas['data'].tolist(),
+                                    despesas['recorrente'].tolist(), despesas['frequencia'].tolist())
+                    if db_manager.insert_saidas_many(registros) != len(despesas):
+                        raise RuntimeError(f"Falha ao gravar as despesas do bloco iniciado na linha {bloco.index[0]}.")
+            resumo['entradas'] += len(entradas)
+            resumo['despesas'] += len(despesas)
+
+        resumo['lidas'] += len(bloco)
+        if progresso is not None:
+            progresso(resumo['lidas'], bytes_lidos, bytes_total)
+
+    if resumo['ocorrencias_expandidas']:
+        print(f"{resumo['ocorrencias_expandidas']} ocorrências de despesas recorrentes expandidas ignoradas "
+              f"em '{caminho}' (a despesa recorrente já as gera).")
+    if resumo['invalidas']:
+        exemplos = ', '.join(f"{linha} ({motivo})" for linha, motivo in resumo['linhas_invalidas'][:5])
+        print(f"Aviso: {resumo['invalidas']} linhas de '{caminho}' ignoradas por dados inválidos. Primeiras: {exemplos}.")
+    return resumo
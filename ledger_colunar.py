@@ -0,0 +1,222 @@
+import threading
+
+import numpy as np
+
+from fluxo_caixa import expandir_recorrencias, montar_fluxo_diario
+
+# Ledger em memória, em colunas NumPy: datas como número de dias desde
+# 01/01/1970 (int32), valores float64 e textos repetidos (máquina, tipo,
+# frequência) como códigos inteiros de categoria. Cada entrada ocupa ~17 bytes,
+# contra centenas de bytes de uma tupla Python com strings e objetos date.
+
+# Capacidade inicial das colunas (dobra quando enche)
+CAPACIDADE_INICIAL = 1024
+
+
+class _Categorias:
+    """Converte textos repetidos em códigos inteiros (e de volta)."""
+
+    def __init__(self):
+        self.valores = [] # código -> texto
+        self._codigos = {} # texto -> código
+
+    def codigo(self, valor):
+        codigo = self._codigos.get(valor)
+        if codigo is None:
+            codigo = self._codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+    def codigos(self, valores):
+        # Registra antes os valores novos; depois cada linha é só uma consulta ao dicionário (em C, via map)
+        for valor in set(valores) - self._codigos.keys():
+            self.codigo(valor)
+        return np.fromiter(map(self._codigos.__getitem__, valores), dtype=np.int32, count=len(valores))
+
+    def procurar(self, valor):
+        """Código de 'valor', ou -1 se ele nunca apareceu."""
+        return self._codigos.get(valor, -1)
+
+
+class _Colunas:
+    """Conjunto de colunas NumPy de mesmo tamanho, com anexação O(1) amortizada."""
+
+    def __init__(self, tipos):
+        self.n = 0
+        self._colunas = {nome: np.empty(CAPACIDADE_INICIAL, dtype=tipo) for nome, tipo in tipos.items()}
+
+    def anexar(self, **valores):
+        quantidade = len(next(iter(valores.values())))
+        necessario = self.n + quantidade
+        capacidade = len(next(iter(self._colunas.values())))
+        if necessario > capacidade:
+            while capacidade < necessario:
+                capacidade *= 2
+            for nome, coluna in self._colunas.items():
+                nova = np.empty(capacidade, dtype=coluna.dtype)
+                nova[:self.n] = coluna[:self.n]
+                self._colunas[nome] = nova
+        for nome, coluna in self._colunas.items():
+            coluna[self.n:necessario] = valores[nome]
+        self.n = necessario
+
+    def visoes(self):
+        """
+        Visões das linhas preenchidas.
+
+        Continuam válidas depois de novas anexações: elas só escrevem além de 'n'
+        ou em arrays novos (a realocação não altera os antigos).
+        """
+        return {nome: coluna[:self.n] for nome, coluna in self._colunas.items()}
+
+    def nbytes(self):
+        return sum(coluna[:self.n].nbytes for coluna in self._colunas.values())
+
+
+def _dias(datas_iso):
+    """Converte datas AAAA-MM-DD (None = inválida) em (dias int32, máscara de válidas)."""
+    datas = np.array(datas_iso, dtype='datetime64[D]')
+    validas = ~np.isnat(datas)
+    return datas[validas].astype(np.int32), validas
+
+
+class LedgerColunar:
+    """
+    Entradas e despesas em colunas NumPy, para consultas vetorizadas sem SQL.
+
+    'versao' guarda o contador de alterações do banco (tabela ledger_versao)
+    que o ledger reflete; o DatabaseManager recarrega o ledger quando ele difere.
+    """
+
+    def __init__(self):
+        self.versao = None
+        self.entradas = _Colunas({'dia': np.int32, 'valor': np.float64, 'maquina': np.int32, 'tipo': np.int32})
+        self.despesas = _Colunas({'dia': np.int32, 'valor': np.float64, 'recorrente': np.bool_, 'frequencia': np.int32})
+        self.maquinas = _Categorias()
+        self.tipos = _Categorias()
+        self.frequencias = _Categorias()
+        self._lock = threading.Lock()
+
+    def anexar_entradas(self, maquinas, tipos, valores, datas_iso):
+        """Anexa entradas (listas paralelas); as de data inválida são ignoradas, como no SQL."""
+        dias, validas = _dias(datas_iso)
+        if not validas.all():
+            indices = np.flatnonzero(validas)
+            maquinas = [maquinas[i] for i in indices]
+            tipos = [tipos[i] for i in indices]
+            valores = np.asarray(valores, dtype=np.float64)[validas]
+        with self._lock:
+            self.entradas.anexar(
+                dia=dias, valor=valores,
+                maquina=self.maquinas.codigos(maquinas), tipo=self.tipos.codigos(tipos),
+            )
+
+    def anexar_despesas(self, valores, datas_iso, recorrentes, frequencias):
+        """Anexa despesas (listas paralelas); as de data inválida são ignoradas, como no SQL."""
+        dias, validas = _dias(datas_iso)
+        if not validas.all():
+            indices = np.flatnonzero(validas)
+            recorrentes = [recorrentes[i] for i in indices]
+            frequencias = [frequencias[i] for i in indices]
+            valores = np.asarray(valores, dtype=np.float64)[validas]
+        with self._lock:
+            self.despesas.anexar(
+                dia=dias, valor=valores,
+                recorrente=np.asarray(recorrentes, dtype=np.bool_),
+                frequencia=self.frequencias.codigos(frequencias),
+            )
+
+    def anexar_ledger(self, outro):
+        """Anexa todas as linhas de outro ledger (ex: as de uma inserção em lote), recodificando as categorias."""
+        entradas, despesas, maquinas, frequencias = outro._visoes()
+        tipos = list(outro.tipos.valores)
+        with self._lock:
+            self.entradas.anexar(
+                dia=entradas['dia'], valor=entradas['valor'],
+                maquina=self._recodificar(self.maquinas, maquinas, entradas['maquina']),
+                tipo=self._recodificar(self.tipos, tipos, entradas['tipo']),
+            )
+            self.despesas.anexar(
+                dia=despesas['dia'], valor=despesas['valor'], recorrente=despesas['recorrente'],
+                frequencia=self._recodificar(self.frequencias, frequencias, despesas['frequencia']),
+            )
+
+    @staticmethod
+    def _recodificar(categorias, valores_outro, codigos_outro):
+        if not valores_outro:
+            return codigos_outro
+        return categorias.codigos(valores_outro)[codigos_outro]
+
+    def _visoes(self):
+        with self._lock:
+            return self.entradas.visoes(), self.despesas.visoes(), list(self.maquinas.valores), list(self.frequencias.valores)
+
+    def nbytes(self):
+        return self.entradas.nbytes() + self.despesas.nbytes()
+
+    def _receitas_no_intervalo(self, entradas, inicio, fim):
+        """Máscara das entradas 'hora_trabalhada' dentro de [inicio, fim] (em dias)."""
+        tipo = self.tipos.procurar('hora_trabalhada')
+        return (entradas['tipo'] == tipo) & (entradas['dia'] >= inicio) & (entradas['dia'] <= fim)
+
+    def fluxo_diario(self, start_date, end_date, hoje):
+        """Mesmo resultado de DatabaseManager.get_prophet_data, calculado sobre as colunas."""
+        entradas, despesas, _, frequencias = self._visoes()
+        inicio = np.datetime64(start_date, 'D').astype(np.int64)
+        fim = np.datetime64(end_date, 'D').astype(np.int64)
+
+        # Receitas do intervalo (montar_fluxo_diario soma por dia)
+        receitas = self._receitas_no_intervalo(entradas, inicio, fim)
+        datas_receitas = entradas['dia'][receitas].astype('datetime64[D]')
+        valores_receitas = entradas['valor'][receitas]
+
+        # Despesas pontuais do intervalo
+        pontuais = ~despesas['recorrente'] & (despesas['dia'] >= inicio) & (despesas['dia'] <= fim)
+
+        # Recorrentes iniciadas até o fim do intervalo, expandidas dentro dele
+        recorrentes = despesas['recorrente'] & (despesas['dia'] <= fim)
+        nomes_frequencias = np.array(frequencias + [None], dtype=object)
+        datas_ocorrencias, valores_ocorrencias = expandir_recorrencias(
+            despesas['dia'][recorrentes].astype('datetime64[D]'),
+            despesas['valor'][recorrentes],
+            nomes_frequencias[despesas['frequencia'][recorrentes]],
+            start_date, end_date,
+        )
+
+        return montar_fluxo_diario(
+            start_date, end_date, hoje,
+            datas_receitas, valores_receitas,
+            np.concatenate([despesas['dia'][pontuais].astype('datetime64[D]'), datas_ocorrencias]),
+            np.concatenate([despesas['valor'][pontuais], valores_ocorrencias]),
+        )
+
+    def receitas_por_maquina(self, start_date, end_date, hoje, filtro_maquinas=None):
+        """
+        Mesmo resultado de DatabaseManager.get_prophet_data_por_maquina, calculado sobre as colunas.
+        'filtro_maquinas' restringe às máquinas com esses nomes (None = todas).
+        """
+        entradas, _, maquinas, _ = self._visoes()
+        inicio = np.datetime64(start_date, 'D').astype(np.int64)
+        fim = np.datetime64(end_date, 'D').astype(np.int64)
+
+        receitas = self._receitas_no_intervalo(entradas, inicio, fim)
+        if filtro_maquinas is not None:
+            codigos_filtro = [self.maquinas.procurar(nome) for nome in filtro_maquinas]
+            receitas &= np.isin(entradas['maquina'], codigos_filtro)
+        codigos = entradas['maquina'][receitas]
+        dias = entradas['dia'][receitas]
+        valores = entradas['valor'][receitas]
+
+        # Agrupa por máquina ordenando pelos códigos (uma ordenação em vez de uma máscara por máquina)
+        ordem = np.argsort(codigos, kind='stable')
+        codigos, dias, valores = codigos[ordem], dias[ordem], valores[ordem]
+        codigos_presentes, inicios = np.unique(codigos, return_index=True)
+        fins = np.append(inicios[1:], codigos.size)
+
+        sem_despesas = (np.array([], dtype='datetime64[D]'), np.array([], dtype=np.float64))
+        series = {}
+        for codigo, i, j in sorted(zip(codigos_presentes, inicios, fins), key=lambda item: maquinas[item[0]]):
+            series[maquinas[codigo]] = montar_fluxo_diario(
+                start_date, end_date, hoje, dias[i:j].astype('datetime64[D]'), valores[i:j], *sem_despesas
+            )
+        return series
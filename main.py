@@ -1,15 +1,35 @@
+import time
+INICIO_PROCESSO = time.perf_counter() # Referência para medir o tempo até a primeira janela
+
 import customtkinter as ctk
 from datetime import datetime
+import tkinter.filedialog
 import tkinter.messagebox
 import sys 
-import pandas as pd 
 from database import DatabaseManager 
-from prophet_model import run_prophet_forecast 
+from importacao import MAQUINA_EXTRATO, importar_arquivo
+from feriados import UFS
+from motores_previsao import MOTORES, MOTOR_PADRAO
+from tabela_virtual import TabelaVirtual
+import diagnostico
 
-import plotly.graph_objects as go
-import plotly.offline as pyo
 import webbrowser
 import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Dependências pesadas (pandas, prophet/cmdstanpy, plotly) são importadas apenas
+# quando a previsão ou o gráfico precisam delas; após o menu aparecer, são
+# pré-carregadas em segundo plano (ver preload_dependencias).
+MODULOS_PESADOS = ['pandas', 'prophet_model', 'graficos']
+
+# Pré-carrega as dependências pesadas em segundo plano depois que o menu é exibido
+PRELOAD_DEPENDENCIAS = True
+
+# Variável de ambiente usada pelo benchmark de inicialização: exibe o menu,
+# imprime o tempo até a primeira janela e encerra.
+VAR_MEDIR_INICIALIZACAO = 'SGF_MEDIR_INICIALIZACAO'
 
 
 class Theme:
@@ -32,6 +52,7 @@ class Theme:
 # Inicializa o gerenciador de banco de dados
 try:
     db_manager = DatabaseManager()
+    db_manager.cadastrar_frota_padrao()
 except Exception as e:
     tkinter.messagebox.showerror("Erro de Inicialização", f"Falha ao conectar ou configurar o banco de dados: {e}. O programa será encerrado.")
     sys.exit(1)
@@ -41,6 +62,13 @@ except Exception as e:
 # --- OPÇÃO 1: CADASTRO DE ENTRADA (MÁQUINAS) ---
 # #######################################################################
 
+# Cartões de máquina exibidos por página (3 colunas); a frota vem do cadastro no banco
+MAQUINAS_POR_PAGINA = 6
+COLUNAS_MAQUINAS = 3
+
+# Espera após a última tecla digitada na busca antes de consultar o cadastro
+ATRASO_BUSCA_MS = 250
+
 def open_cadastro_entrada_window():
     """Cria a janela Toplevel para o cadastro de Entradas de Máquinas."""
     
@@ -50,7 +78,7 @@ def open_cadastro_entrada_window():
 
     entrada_window = ctk.CTkToplevel(app)
     entrada_window.title("Cadastrar Entrada de Frota - Horas Trabalhadas")
-    entrada_window.geometry("1000x550") 
+    entrada_window.geometry("1000x720") 
     entrada_window.resizable(False, False)
     
     app.entrada_window = entrada_window
@@ -62,7 +90,7 @@ def open_cadastro_entrada_window():
     entrada_window.protocol("WM_DELETE_WINDOW", on_close)
 
     # Configurar 3 colunas para as máquinas
-    entrada_window.grid_columnconfigure((0, 1, 2), weight=1)
+    entrada_window.grid_columnconfigure(tuple(range(COLUNAS_MAQUINAS)), weight=1)
 
     # Título da Seção
     label_secao_entrada = ctk.CTkLabel(
@@ -71,44 +99,136 @@ def open_cadastro_entrada_window():
         font=ctk.CTkFont(family="Arial", size=18, weight="bold"), 
         text_color=Theme.COR_PRIMARIA_ESCURA
     )
-    label_secao_entrada.grid(row=0, column=0, columnspan=3, padx=20, pady=(20, 15))
+    label_secao_entrada.grid(row=0, column=0, columnspan=COLUNAS_MAQUINAS, padx=20, pady=(20, 15))
 
     
     # --- NOVO CAMPO: DATA DO TRABALHO ---
-    ctk.CTkLabel(entrada_window, text='Data do Trabalho (DD/MM/AAAA):', anchor="w", font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO, weight="bold")).grid(row=1, column=0, columnspan=3, padx=20, pady=(10, 0), sticky='w')
+    ctk.CTkLabel(entrada_window, text='Data do Trabalho (DD/MM/AAAA):', anchor="w", font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO, weight="bold")).grid(row=1, column=0, columnspan=COLUNAS_MAQUINAS, padx=20, pady=(10, 0), sticky='w')
     entry_data_trabalho = ctk.CTkEntry(entrada_window, placeholder_text='Ex: 31/12/2025', width=Theme.LARGURA_ENTRY)
     entry_data_trabalho.insert(0, datetime.now().strftime('%d/%m/%Y'))
-    entry_data_trabalho.grid(row=2, column=0, columnspan=3, padx=20, pady=(0, 20), sticky='w')
-    
-    # Mapa para armazenar referências das Entries
-    entries_map = {}
-    
-    def criar_entradas_maquina(app_ref, nome_maquina, coluna_index):
-        """Cria e posiciona as Labels e Entries de Hora e Horas Trabalhadas no grid."""
-        
-        # Linha inicial deslocada devido ao novo campo de data
-        start_row = 3
-        
+    entry_data_trabalho.grid(row=2, column=0, columnspan=COLUNAS_MAQUINAS, padx=20, pady=(0, 10), sticky='w')
+
+    # --- BUSCA E CADASTRO DE MÁQUINAS ---
+    frame_busca = ctk.CTkFrame(entrada_window, fg_color="transparent")
+    frame_busca.grid(row=3, column=0, columnspan=COLUNAS_MAQUINAS, padx=20, pady=(0, 10), sticky='ew')
+    ctk.CTkLabel(frame_busca, text='Buscar máquina:', font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO)).pack(side="left", padx=(0, 5))
+    entry_busca = ctk.CTkEntry(frame_busca, placeholder_text='Nome ou parte do nome', width=220)
+    entry_busca.pack(side="left")
+    btn_nova_maquina = ctk.CTkButton(
+        frame_busca, text='Cadastrar Máquina', width=150,
+        fg_color=Theme.COR_PRIMARIA_ESCURA, hover_color=Theme.COR_SEGUNDARIA,
+    )
+    btn_nova_maquina.pack(side="right")
+    entry_nova_maquina = ctk.CTkEntry(frame_busca, placeholder_text='Nome da nova máquina', width=220)
+    entry_nova_maquina.pack(side="right", padx=5)
+
+    # --- CARTÕES DAS MÁQUINAS (um conjunto fixo, reaproveitado a cada página) ---
+    linha_cartoes = 4
+    cartoes = []
+    for i in range(MAQUINAS_POR_PAGINA):
+        cartao = ctk.CTkFrame(entrada_window)
+        cartao.grid(row=linha_cartoes + i // COLUNAS_MAQUINAS, column=i % COLUNAS_MAQUINAS, padx=10, pady=5, sticky='nsew')
+
         label_maquina = ctk.CTkLabel(
-            app_ref, 
-            text=nome_maquina, 
+            cartao, 
+            text='', 
             font=ctk.CTkFont(*Theme.FONTE_LABEL_MAQUINA), 
             text_color=Theme.COR_PRIMARIA_ESCURA
         )
-        label_maquina.grid(row=start_row, column=coluna_index, padx=20, pady=(5, 5))
+        label_maquina.pack(padx=10, pady=(5, 0))
 
         # Valor por Hora
-        ctk.CTkLabel(app_ref, text='Valor por hora (R$):', anchor="w", font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO)).grid(row=start_row + 1, column=coluna_index, padx=20, pady=(5, 0), sticky='w')
-        entry_hora = ctk.CTkEntry(app_ref, placeholder_text='R$ / hora', width=Theme.LARGURA_ENTRY)
-        entry_hora.grid(row=start_row + 2, column=coluna_index, padx=20, pady=(0, 15))
+        ctk.CTkLabel(cartao, text='Valor por hora (R$):', anchor="w", font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO)).pack(padx=10, fill="x")
+        entry_hora = ctk.CTkEntry(cartao, placeholder_text='R$ / hora', width=Theme.LARGURA_ENTRY)
+        entry_hora.pack(padx=10, pady=(0, 5))
         
         # Horas Trabalhadas
-        ctk.CTkLabel(app_ref, text='Horas trabalhadas:', anchor="w", font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO)).grid(row=start_row + 3, column=coluna_index, padx=20, pady=(5, 0), sticky='w')
-        entry_horas_trabalhadas = ctk.CTkEntry(app_ref, placeholder_text='Ex: 8.5', width=Theme.LARGURA_ENTRY)
-        entry_horas_trabalhadas.grid(row=start_row + 4, column=coluna_index, padx=20, pady=(0, 15))
-        
-        # Armazena as referências
-        entries_map[nome_maquina] = {'valor_hora': entry_hora, 'horas_trabalhadas': entry_horas_trabalhadas}
+        ctk.CTkLabel(cartao, text='Horas trabalhadas:', anchor="w", font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO)).pack(padx=10, fill="x")
+        entry_horas_trabalhadas = ctk.CTkEntry(cartao, placeholder_text='Ex: 8.5', width=Theme.LARGURA_ENTRY)
+        entry_horas_trabalhadas.pack(padx=10, pady=(0, 10))
+
+        cartoes.append({'frame': cartao, 'nome': label_maquina, 'valor_hora': entry_hora, 'horas_trabalhadas': entry_horas_trabalhadas})
+
+    # --- PAGINAÇÃO ---
+    linha_paginacao = linha_cartoes + (MAQUINAS_POR_PAGINA + COLUNAS_MAQUINAS - 1) // COLUNAS_MAQUINAS
+    frame_paginacao = ctk.CTkFrame(entrada_window, fg_color="transparent")
+    frame_paginacao.grid(row=linha_paginacao, column=0, columnspan=COLUNAS_MAQUINAS, padx=20, pady=(5, 0))
+    btn_anterior = ctk.CTkButton(frame_paginacao, text='◀ Anterior', width=110)
+    btn_anterior.pack(side="left")
+    label_pagina = ctk.CTkLabel(frame_paginacao, text='', font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO), width=260)
+    label_pagina.pack(side="left", padx=10)
+    btn_proxima = ctk.CTkButton(frame_paginacao, text='Próxima ▶', width=110)
+    btn_proxima.pack(side="left")
+
+    # Valores digitados, por máquina, preservados ao trocar de página ou de busca
+    valores_digitados = {}
+    estado = {'pagina': 0, 'maquinas': [], 'busca_agendada': None}
+
+    def guardar_pagina():
+        """Copia os campos da página atual para valores_digitados."""
+        for cartao, (_, nome) in zip(cartoes, estado['maquinas']):
+            valor_hora_str = cartao['valor_hora'].get().strip()
+            horas_trabalhadas_str = cartao['horas_trabalhadas'].get().strip()
+            if valor_hora_str or horas_trabalhadas_str:
+                valores_digitados[nome] = (valor_hora_str, horas_trabalhadas_str)
+            else:
+                valores_digitados.pop(nome, None)
+
+    def exibir_pagina(pagina):
+        """Consulta uma página do cadastro (com o filtro da busca) e preenche os cartões."""
+        guardar_pagina()
+        busca = entry_busca.get()
+        total = db_manager.contar_maquinas(busca)
+        n_paginas = max(1, -(-total // MAQUINAS_POR_PAGINA))
+        pagina = min(max(0, pagina), n_paginas - 1)
+        estado['pagina'] = pagina
+        estado['maquinas'] = db_manager.listar_maquinas(busca, MAQUINAS_POR_PAGINA, pagina * MAQUINAS_POR_PAGINA)
+
+        for i, cartao in enumerate(cartoes):
+            if i >= len(estado['maquinas']):
+                cartao['frame'].grid_remove()
+                continue
+            nome = estado['maquinas'][i][1]
+            valor_hora_str, horas_trabalhadas_str = valores_digitados.get(nome, ('', ''))
+            cartao['nome'].configure(text=nome)
+            for campo, texto in (('valor_hora', valor_hora_str), ('horas_trabalhadas', horas_trabalhadas_str)):
+                cartao[campo].delete(0, 'end')
+                if texto:
+                    cartao[campo].insert(0, texto)
+            cartao['frame'].grid()
+
+        if total == 0:
+            label_pagina.configure(text='Nenhuma máquina encontrada.')
+        else:
+            label_pagina.configure(text=f'Página {pagina + 1} de {n_paginas} ({total} máquinas)')
+        btn_anterior.configure(state="normal" if pagina > 0 else "disabled")
+        btn_proxima.configure(state="normal" if pagina < n_paginas - 1 else "disabled")
+
+    def agendar_busca(event=None):
+        # Consulta só depois que o usuário para de digitar
+        if estado['busca_agendada'] is not None:
+            entrada_window.after_cancel(estado['busca_agendada'])
+        estado['busca_agendada'] = entrada_window.after(ATRASO_BUSCA_MS, lambda: exibir_pagina(0))
+
+    def cadastrar_maquina():
+        nome = entry_nova_maquina.get().strip()
+        if not nome:
+            tkinter.messagebox.showerror("Erro de Validação", "Informe o nome da nova máquina.")
+            entry_nova_maquina.focus()
+            return
+        if db_manager.cadastrar_maquina(nome) is None:
+            tkinter.messagebox.showerror("Erro", f"Não foi possível cadastrar a máquina '{nome}'.")
+            return
+        entry_nova_maquina.delete(0, 'end')
+        # Mostra a máquina cadastrada
+        entry_busca.delete(0, 'end')
+        entry_busca.insert(0, nome)
+        exibir_pagina(0)
+
+    entry_busca.bind("<KeyRelease>", agendar_busca)
+    btn_nova_maquina.configure(command=cadastrar_maquina)
+    btn_anterior.configure(command=lambda: exibir_pagina(estado['pagina'] - 1))
+    btn_proxima.configure(command=lambda: exibir_pagina(estado['pagina'] + 1))
 
 
     def cadastrar_entrada():
@@ -125,22 +245,19 @@ def open_cadastro_entrada_window():
             entry_data_trabalho.focus()
             return
         
-        dados_salvos = 0
+        # Inclui os campos da página atual; as demais páginas já estão em valores_digitados
+        guardar_pagina()
+        registros = []
         
-        for maquina, entries in entries_map.items():
-            valor_hora_str = entries['valor_hora'].get().strip().replace(',', '.')
-            horas_trabalhadas_str = entries['horas_trabalhadas'].get().strip().replace(',', '.')
-            
-            # Se a linha de entrada da máquina estiver vazia, ignora
-            if not valor_hora_str and not horas_trabalhadas_str:
-                continue
+        for maquina, (valor_hora_str, horas_trabalhadas_str) in sorted(valores_digitados.items()):
+            valor_hora_str = valor_hora_str.replace(',', '.')
+            horas_trabalhadas_str = horas_trabalhadas_str.replace(',', '.')
                 
             # 2. Validação Numérica e Cálculo
             try:
                 # Se um campo está preenchido, o outro é obrigatório para o cálculo.
                 if not valor_hora_str or not horas_trabalhadas_str:
                      tkinter.messagebox.showerror("Erro de Validação", f"Para a '{maquina}', os campos 'Valor por hora' e 'Horas trabalhadas' são obrigatórios.")
-                     (entries['valor_hora'] if not valor_hora_str else entries['horas_trabalhadas']).focus()
                      return
                      
                 valor_hora = float(valor_hora_str)
@@ -153,12 +270,12 @@ def open_cadastro_entrada_window():
 
             except ValueError:
                 tkinter.messagebox.showerror("Erro de Validação", f"Os valores de 'Valor por hora' e 'Horas trabalhadas' da '{maquina}' devem ser números positivos válidos.")
-                entries['valor_hora'].focus()
                 return
 
-            # --- Lógica de Negócio: Salvar no Banco de Dados ---
-            if db_manager.insert_entrada(maquina, valor_total, data_str):
-                dados_salvos += 1
+            registros.append((maquina, valor_total, data_str))
+
+        # --- Lógica de Negócio: Salvar no Banco de Dados (uma única transação) ---
+        dados_salvos = db_manager.insert_entradas_many(registros) if registros else 0
 
         if dados_salvos > 0:
             tkinter.messagebox.showinfo("Sucesso", f"{dados_salvos} novos registros de receita por horas trabalhadas foram salvos para a data {data_str}!")
@@ -167,10 +284,8 @@ def open_cadastro_entrada_window():
             tkinter.messagebox.showwarning("Aviso", "Nenhum novo registro de receita foi inserido. Preencha pelo menos uma entrada de máquina completa.")
 
 
-    # Criação dos campos no Toplevel
-    criar_entradas_maquina(entrada_window, 'Escavadeira', 0)
-    criar_entradas_maquina(entrada_window, 'Caminhão', 1)
-    criar_entradas_maquina(entrada_window, 'Retro-Escavadeira', 2)
+    # Primeira página do cadastro
+    exibir_pagina(0)
 
     # Botão de Cadastro
     btn_cadastrar = ctk.CTkButton(
@@ -182,8 +297,7 @@ def open_cadastro_entrada_window():
         font=ctk.CTkFont(*Theme.FONTE_BOTAO),
         height=Theme.ALTURA_BOTAO
     )
-    # Aumentei a linha do grid para acomodar os novos campos
-    btn_cadastrar.grid(row=8, column=0, columnspan=3, padx=20, pady=(20, 20), sticky="ew")
+    btn_cadastrar.grid(row=linha_paginacao + 1, column=0, columnspan=COLUNAS_MAQUINAS, padx=20, pady=(15, 20), sticky="ew")
 
     entrada_window.focus()
 
@@ -340,53 +454,25 @@ def open_cadastro_saida_window():
 # #######################################################################
 # --- FUNÇÃO PARA CRIAR O GRÁFICO (NOVA) ---
 # #######################################################################
-def create_forecast_plot(df_forecast_plot: pd.DataFrame):
+def create_forecast_plot(df_forecast_plot):
     """
-    Cria um gráfico de barras AGRUPADAS interativo comparando Receitas e Despesas.
+    Gera o gráfico de barras agrupadas (Receitas x Despesas) e o abre no navegador.
     Recebe o DataFrame com 'ds', 'y_receita', 'y_despesa'.
     """
-    
-    # Filtra apenas os próximos 180 dias a partir de hoje
-    today = pd.to_datetime(datetime.now().date())
-    df_plot_future = df_forecast_plot[df_forecast_plot['ds'] >= today].copy()
-    
-    # NÃO precisamos de valores negativos aqui, apenas os valores absolutos para barras agrupadas
-    
-    fig = go.Figure(
-        data=[
-            go.Bar(
-                name='Receitas Previstas',
-                x=df_plot_future['ds'],
-                y=df_plot_future['y_receita'],
-                marker_color=Theme.COR_PRIMARIA_ESCURA # Laranja
-            ),
-            go.Bar(
-                name='Despesas Previstas',
-                x=df_plot_future['ds'],
-                y=df_plot_future['y_despesa'],
-                marker_color=Theme.COR_SEGUNDARIA # Vermelho
-            )
-        ]
-    )
-
-    fig.update_layout(
-        barmode='group', # MODO AGRUPADO: barras lado a lado
-        title_text='Comparação de Receitas vs. Despesas Previstas (Próximos 180 Dias)',
-        xaxis_title="Data",
-        yaxis_title="Valor (R$)",
-        hovermode="x unified",
-        xaxis=dict(tickformat="%d/%m/%y"), # Formato de data no eixo X
-        yaxis=dict(rangemode='tozero') # Garante que o eixo Y comece em zero
-    )
-    
-    # Salva o gráfico em um arquivo HTML temporário e o abre
-    plot_file = "forecast_comparison_plot.html"
     try:
-        pyo.plot(fig, filename=plot_file, auto_open=False)
+        # Plotly só é carregado na primeira vez que um gráfico é gerado
+        import graficos
+
+        # Salva o gráfico em um arquivo HTML temporário e o abre
+        plot_file = graficos.salvar_grafico_previsao(
+            df_forecast_plot,
+            cor_receita=Theme.COR_PRIMARIA_ESCURA, # Laranja
+            cor_despesa=Theme.COR_SEGUNDARIA, # Vermelho
+        )
         
         # Abre o arquivo no navegador padrão
-        webbrowser.open_new_tab(os.path.abspath(plot_file))
-        print(f"Gráfico comparativo salvo e aberto em: {os.path.abspath(plot_file)}")
+        webbrowser.open_new_tab(plot_file)
+        print(f"Gráfico comparativo salvo e aberto em: {plot_file}")
         tkinter.messagebox.showinfo("Gráfico Gerado", "O gráfico de previsão comparativo foi gerado e aberto em seu navegador padrão.")
         
     except Exception as e:
@@ -398,6 +484,82 @@ def create_forecast_plot(df_forecast_plot: pd.DataFrame):
 # --- OPÇÃO 3: VISUALIZAR E PROPHET ---
 # #######################################################################
 
+# Executor de segundo plano da previsão (um único worker: uma previsão por vez)
+executor_previsao = ThreadPoolExecutor(max_workers=1, thread_name_prefix="previsao")
+
+# Intervalo (ms) entre as verificações de status da previsão na thread da interface
+INTERVALO_POLLING_MS = 100
+
+# Opção da lista de regiões que usa apenas os feriados nacionais
+REGIAO_NACIONAL = "Nacional"
+
+
+def formatar_reais(valores):
+    """Formata uma coluna (pd.Series) inteira como 'R$ 0.00' de uma vez (sem iterrows)."""
+    import numpy as np
+    return np.char.mod('R$ %.2f', valores.to_numpy(dtype=float))
+
+
+class PrevisaoCancelada(Exception):
+    """Sinaliza que o usuário cancelou a previsão em andamento."""
+
+
+def pipeline_previsao(horizonte_dias, fila_status, cancelar, usar_feriados=True, regiao_feriados=None, motor='prophet'):
+    """
+    Executa a busca de dados e o modelo de previsão FORA da thread da interface.
+
+    Não toca em nenhum widget: o progresso é enviado por 'fila_status' e lido
+    pela interface via polling (app.after). 'cancelar' (threading.Event) é
+    verificado entre as etapas; o ajuste do Stan não pode ser interrompido no
+    meio, então um cancelamento durante o ajuste descarta o resultado ao final.
+    'motor', 'usar_feriados' e 'regiao_feriados' vão para motores_previsao.prever.
+
+    Returns:
+        tuple: ('ok', df_result), ('aviso', mensagem) se não houver dados suficientes
+        ou ('erro', mensagem) se o modelo falhar.
+    """
+    with diagnostico.medir('previsao.total', horizonte_dias=horizonte_dias, motor=motor), diagnostico.perfilar('previsao'):
+        return _executar_previsao(horizonte_dias, fila_status, cancelar, usar_feriados, regiao_feriados, motor)
+
+
+def _executar_previsao(horizonte_dias, fila_status, cancelar, usar_feriados, regiao_feriados, motor):
+    """Etapas da previsão (ver pipeline_previsao)."""
+    # Importações pesadas (já pré-carregadas em segundo plano na maioria dos casos)
+    import pandas as pd
+    from motores_previsao import prever
+
+    fila_status.put('Buscando e formatando dados no SQLite...')
+    
+    # 1. Obter dados no formato Prophet (ds, y, y_receita, y_despesa)
+    df_prophet_data = db_manager.get_prophet_data(horizonte_dias=horizonte_dias)
+    if cancelar.is_set():
+        raise PrevisaoCancelada()
+    
+    # Conta quantos dias no passado têm dados
+    historico_count = (df_prophet_data['ds'].dt.date < datetime.now().date()).sum()
+    
+    if df_prophet_data.empty or historico_count < 2:
+        return ('aviso', "O modelo de previsão precisa de dados históricos (mínimo 2 datas) para gerar uma previsão confiável.")
+
+    fila_status.put(f'Treinando o modelo ({MOTORES[motor][0]}) e gerando previsão...')
+    
+    # 2. Rodar o motor de previsão escolhido
+    df_forecast_y = df_prophet_data[['ds', 'y']].copy()
+    df_forecast = prever(df_forecast_y, periods=horizonte_dias, motor=motor,
+                         usar_feriados=usar_feriados, regiao_feriados=regiao_feriados)
+    if cancelar.is_set():
+        raise PrevisaoCancelada()
+    
+    if df_forecast.empty:
+        return ('erro', "ERRO: Falha ao rodar o modelo de previsão. Verifique o console.")
+
+    # 3. Combinar previsão do modelo (yhat) com as receitas e despesas (y_receita, y_despesa)
+    # Pegamos as receitas e despesas que calculamos no DB
+    df_base_future = df_prophet_data[['ds', 'y_receita', 'y_despesa']].copy()
+    df_result = pd.merge(df_forecast, df_base_future, on='ds', how='left')
+    return ('ok', df_result)
+
+
 def visualizar_prophet_action():
     """Busca dados, roda o modelo Prophet e exibe a previsão, e gera o gráfico."""
     
@@ -406,13 +568,16 @@ def visualizar_prophet_action():
         return
 
     prophet_window = ctk.CTkToplevel(app)
-    prophet_window.title("Previsão Orçamentária - Modelo Prophet")
+    prophet_window.title("Previsão Orçamentária")
     prophet_window.geometry("800x600")
     
     app.prophet_window = prophet_window
     prophet_window.grid_columnconfigure(0, weight=1)
     
     def on_close():
+        # Uma previsão em andamento é cancelada (o resultado será descartado)
+        if previsao_em_andamento():
+            execucao['cancelar'].set()
         app.prophet_window = None
         prophet_window.destroy()
         
@@ -436,13 +601,23 @@ def visualizar_prophet_action():
     status_label.grid(row=1, column=0, padx=20, pady=(5, 10))
     
     # Frame para exibir os resultados (Tabela/Texto)
-    results_frame = ctk.CTkScrollableFrame(prophet_window, label_text="Previsão (Próximos 180 Dias)", width=750, height=400)
+    # Tabela virtualizada: só as linhas visíveis existem como widgets
+    results_frame = TabelaVirtual(
+        prophet_window,
+        colunas=[("Data", "w"), ("Previsão (yhat)", "e"), ("Min (90%)", "e"), ("Max (90%)", "e")],
+        titulo="Previsão (Próximos 180 Dias)",
+        linhas_visiveis=14,
+        fonte_cabecalho=ctk.CTkFont(*Theme.FONTE_LABEL_MAQUINA),
+        fonte_linha=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO),
+        fonte_destaque=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO, weight="bold"),
+        cor_destaque="red", # Cor para previsão negativa
+        width=750,
+    )
     results_frame.grid(row=3, column=0, padx=20, pady=(10, 5), sticky="nsew")
-    results_frame.grid_columnconfigure(0, weight=1)
     
     # Variável para armazenar o DataFrame completo para o gráfico
-    # Inicializa como um DataFrame vazio do Pandas
-    df_data_for_plot = pd.DataFrame() 
+    # (preenchida quando a previsão termina)
+    df_data_for_plot = None
 
     # Botão para gerar o gráfico
     btn_plot = ctk.CTkButton(
@@ -457,105 +632,494 @@ def visualizar_prophet_action():
     btn_plot.grid(row=4, column=0, padx=20, pady=(5, 15))
 
 
-    def rodar_prophet_e_exibir():
-        nonlocal df_data_for_plot # Permite modificar a variável externa df_data_for_plot
-        
-        status_label.configure(text='Buscando e formatando dados no SQLite...', text_color="#00695C")
-        btn_plot.configure(state="disabled")
-        prophet_window.update()
-        
-        try:
-            # 1. Obter dados no formato Prophet (ds, y, y_receita, y_despesa)
-            df_prophet_data = db_manager.get_prophet_data(horizonte_dias=180)
-            
-            # Conta quantos dias no passado têm dados
-            historico_count = (df_prophet_data['ds'].dt.date < datetime.now().date()).sum()
-            
-            if df_prophet_data.empty or historico_count < 2:
-                status_label.configure(text="AVISO: Insira mais dados de Entradas e Saídas antes de rodar a previsão.", text_color=Theme.COR_SEGUNDARIA)
-                tkinter.messagebox.showwarning("Dados Insuficientes", "O modelo Prophet precisa de dados históricos (mínimo 2 datas) para gerar uma previsão confiável.")
-                return
+    # Estado da execução em segundo plano desta janela
+    execucao = {'future': None, 'fila': None, 'cancelar': None}
 
-            status_label.configure(text='Treinando o modelo Prophet e gerando previsão...', text_color="#00695C")
-            prophet_window.update()
-            
-            # 2. Rodar o Prophet
-            df_forecast_y = df_prophet_data[['ds', 'y']].copy()
-            df_forecast = run_prophet_forecast(df_forecast_y, periods=180)
-            
-            if df_forecast.empty:
-                status_label.configure(text="ERRO: Falha ao rodar o modelo Prophet. Verifique o console.", text_color=Theme.COR_SEGUNDARIA)
-                return
+    def previsao_em_andamento():
+        return execucao['future'] is not None and not execucao['future'].done()
 
-            # 3. Combinar previsão do Prophet (yhat) com as receitas e despesas (y_receita, y_despesa)
-            # Pegamos as receitas e despesas que calculamos no DB
-            df_base_future = df_prophet_data[['ds', 'y_receita', 'y_despesa']].copy()
-            df_result = pd.merge(df_forecast, df_base_future, on='ds', how='left')
-            
-            # Armazena o resultado combinado para o botão de gráfico
-            df_data_for_plot = df_result.copy()
-            
-            status_label.configure(text='Previsão concluída! Exibindo resultados.', text_color=Theme.COR_PRIMARIA_ESCURA)
+    def exibir_resultados(df_result):
+        """Exibe a previsão na tabela (executado na thread da interface)."""
+        with diagnostico.medir('interface.tabela', linhas=len(df_result)):
+            # 4. Exibir Resultados na Tabela (formatação vetorizada de todas as linhas)
+            datas_str = df_result['ds'].dt.strftime('%d/%m/%Y').to_numpy()
+            yhat_str = formatar_reais(df_result['yhat'])
+            y_lower_str = formatar_reais(df_result['yhat_lower'])
+            y_upper_str = formatar_reais(df_result['yhat_upper'])
 
-            # 4. Exibir Resultados na Tabela
-            for widget in results_frame.winfo_children():
-                widget.destroy()
+            # Destaque para Fluxo de Caixa Negativo (Previsão) na coluna yhat
+            negativos = (df_result['yhat'] < 0).to_numpy()
 
-            # Configurar cabeçalho da tabela
-            headers = ["Data", "Previsão (yhat)", "Min (90%)", "Max (90%)"]
-            
-            for i, header in enumerate(headers):
-                label = ctk.CTkLabel(results_frame, text=header, font=ctk.CTkFont(*Theme.FONTE_LABEL_MAQUINA))
-                label.grid(row=0, column=i, padx=10, pady=5, sticky="ew")
-                results_frame.grid_columnconfigure(i, weight=1)
-
-            # Popula as linhas
-            for i, row in df_result.iterrows():
-                row_index = i - df_result.index[0] + 1
-                
-                # Formatar Data
-                data_str = row['ds'].strftime('%d/%m/%Y')
-                
-                # Formatar Valores (R$)
-                yhat_str = f"R$ {row['yhat']:.2f}"
-                y_lower_str = f"R$ {row['yhat_lower']:.2f}"
-                y_upper_str = f"R$ {row['yhat_upper']:.2f}"
+            results_frame.definir_dados(
+                [datas_str, yhat_str, y_lower_str, y_upper_str],
+                destaques=negativos,
+                coluna_destaque=1,
+            )
 
-                ctk.CTkLabel(results_frame, text=data_str, font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO)).grid(row=row_index, column=0, padx=10, pady=2, sticky="w")
-                
-                # Destaque para Fluxo de Caixa Negativo (Previsão)
-                yhat_label = ctk.CTkLabel(results_frame, text=yhat_str, font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO, weight="bold"))
-                yhat_label.grid(row=row_index, column=1, padx=10, pady=2, sticky="e")
-                if row['yhat'] < 0:
-                     yhat_label.configure(text_color="red") # Cor para previsão negativa
-                
-                ctk.CTkLabel(results_frame, text=y_lower_str, font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO)).grid(row=row_index, column=2, padx=10, pady=2, sticky="e")
-                ctk.CTkLabel(results_frame, text=y_upper_str, font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO)).grid(row=row_index, column=3, padx=10, pady=2, sticky="e")
-                
-            # Habilita o botão de gráfico
-            btn_plot.configure(state="normal")
+    def finalizar_execucao():
+        """Restaura os botões ao fim (ou cancelamento) da execução."""
+        btn_rodar.configure(state="normal")
+        btn_cancelar.configure(state="disabled")
 
+    def verificar_previsao():
+        """Polling (app.after): aplica as mensagens de status e trata o resultado final."""
+        nonlocal df_data_for_plot # Permite modificar a variável externa df_data_for_plot
+        
+        # A janela pode ter sido fechada durante a execução
+        if app.prophet_window is not prophet_window:
+            return
 
+        try:
+            while True:
+                status_label.configure(text=execucao['fila'].get_nowait(), text_color="#00695C")
+        except queue.Empty:
+            pass
+
+        future = execucao['future']
+        if not future.done():
+            prophet_window.after(INTERVALO_POLLING_MS, verificar_previsao)
+            return
+
+        finalizar_execucao()
+        
+        try:
+            resultado, conteudo = future.result()
+        except PrevisaoCancelada:
+            status_label.configure(text='Previsão cancelada.', text_color="gray")
+            return
         except Exception as e:
             status_label.configure(text=f"ERRO CRÍTICO na execução: {e}", text_color=Theme.COR_SEGUNDARIA)
             print(f"Erro Crítico: {e}")
             tkinter.messagebox.showerror("Erro Crítico", f"Ocorreu um erro crítico ao processar o modelo: {e}")
+            return
 
+        if resultado == 'erro':
+            status_label.configure(text=conteudo, text_color=Theme.COR_SEGUNDARIA)
+            return
 
-    ctk.CTkButton(
-        prophet_window, 
-        text='Rodar Previsão Prophet (180 Dias)', 
+        if resultado == 'aviso':
+            status_label.configure(text="AVISO: Insira mais dados de Entradas e Saídas antes de rodar a previsão.", text_color=Theme.COR_SEGUNDARIA)
+            tkinter.messagebox.showwarning("Dados Insuficientes", conteudo)
+            return
+
+        # Armazena o resultado combinado para o botão de gráfico
+        df_data_for_plot = conteudo.copy()
+        
+        status_label.configure(text='Previsão concluída! Exibindo resultados.', text_color=Theme.COR_PRIMARIA_ESCURA)
+        exibir_resultados(conteudo)
+            
+        # Habilita o botão de gráfico
+        btn_plot.configure(state="normal")
+
+    def rodar_prophet_e_exibir():
+        # Impede execuções simultâneas (ex: duplo clique)
+        if previsao_em_andamento():
+            return
+
+        status_label.configure(text='Iniciando previsão em segundo plano...', text_color="#00695C")
+        btn_plot.configure(state="disabled")
+        btn_rodar.configure(state="disabled")
+        btn_cancelar.configure(state="normal")
+
+        execucao['fila'] = queue.Queue()
+        execucao['cancelar'] = threading.Event()
+        regiao = combobox_regiao.get().strip()
+        execucao['future'] = executor_previsao.submit(
+            pipeline_previsao, 180, execucao['fila'], execucao['cancelar'],
+            usar_feriados=feriados_var.get(),
+            regiao_feriados=None if regiao in ('', REGIAO_NACIONAL) else regiao,
+            motor=motores_por_descricao[motor_var.get()],
+        )
+        prophet_window.after(INTERVALO_POLLING_MS, verificar_previsao)
+
+    def cancelar_previsao():
+        if previsao_em_andamento():
+            execucao['cancelar'].set()
+            status_label.configure(text='Cancelando... (aguardando o fim da etapa atual)', text_color="gray")
+            btn_cancelar.configure(state="disabled")
+
+
+    # Botões de execução e cancelamento
+    frame_botoes = ctk.CTkFrame(prophet_window, fg_color="transparent")
+    frame_botoes.grid(row=2, column=0, padx=20, pady=15)
+
+    btn_rodar = ctk.CTkButton(
+        frame_botoes, 
+        text='Rodar Previsão (180 Dias)', 
         command=rodar_prophet_e_exibir,
         fg_color="#00695C", 
         hover_color="#00897B",
         font=ctk.CTkFont(*Theme.FONTE_BOTAO),
         height=Theme.ALTURA_BOTAO,
         width=350
-    ).grid(row=2, column=0, padx=20, pady=15)
+    )
+    btn_rodar.grid(row=0, column=0, padx=(0, 10))
+
+    btn_cancelar = ctk.CTkButton(
+        frame_botoes, 
+        text='Cancelar', 
+        command=cancelar_previsao,
+        fg_color=Theme.COR_SEGUNDARIA, 
+        hover_color=Theme.COR_SEGUNDARIA_HOVER,
+        font=ctk.CTkFont(*Theme.FONTE_BOTAO),
+        height=Theme.ALTURA_BOTAO,
+        width=150,
+        state="disabled" # Habilitado apenas durante a execução
+    )
+    btn_cancelar.grid(row=0, column=1)
+
+    # Feriados no modelo: nacionais e, opcionalmente, de uma UF (ou município do pacote 'holidays', digitado)
+    frame_feriados = ctk.CTkFrame(frame_botoes, fg_color="transparent")
+    frame_feriados.grid(row=1, column=0, columnspan=2, pady=(10, 0))
+
+    feriados_var = ctk.BooleanVar(value=True)
+
+    def toggle_regiao():
+        combobox_regiao.configure(state="normal" if feriados_var.get() else "disabled")
+
+    ctk.CTkSwitch(
+        frame_feriados, text="Considerar feriados", variable=feriados_var, command=toggle_regiao,
+        font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO),
+    ).grid(row=0, column=0, padx=(0, 15))
+    combobox_regiao = ctk.CTkComboBox(frame_feriados, values=[REGIAO_NACIONAL] + UFS, width=200)
+    combobox_regiao.set(REGIAO_NACIONAL)
+    combobox_regiao.grid(row=0, column=1)
+
+    # Motor de previsão: Prophet (completo, segundos) ou rápido (NumPy, milissegundos)
+    motores_por_descricao = {descricao: nome for nome, (descricao, _) in MOTORES.items()}
+    motor_var = ctk.StringVar(value=MOTORES[MOTOR_PADRAO][0])
+    ctk.CTkSegmentedButton(
+        frame_botoes, values=list(motores_por_descricao), variable=motor_var,
+        font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO),
+    ).grid(row=2, column=0, columnspan=2, pady=(10, 0))
     
     prophet_window.focus()
 
 
+# #######################################################################
+# --- OPÇÃO 4: DIAGNÓSTICO (TEMPOS DOS CAMINHOS CRÍTICOS) ---
+# #######################################################################
+
+# Intervalo de atualização automática da janela de diagnóstico
+INTERVALO_DIAGNOSTICO_MS = 1000
+
+# Arquivo gerado pelo botão "Exportar JSON"
+ARQUIVO_DIAGNOSTICO = "diagnostico_resumo.json"
+
+
+def open_diagnostico_window():
+    """Janela com os tempos e contagens medidos pelo módulo 'diagnostico'."""
+
+    if hasattr(app, "diagnostico_window") and app.diagnostico_window is not None:
+        app.diagnostico_window.focus()
+        return
+
+    diagnostico_window = ctk.CTkToplevel(app)
+    diagnostico_window.title("Diagnóstico - Tempos de Execução")
+    diagnostico_window.geometry("850x560")
+
+    app.diagnostico_window = diagnostico_window
+    diagnostico_window.grid_columnconfigure(0, weight=1)
+
+    def on_close():
+        app.diagnostico_window = None
+        diagnostico_window.destroy()
+
+    diagnostico_window.protocol("WM_DELETE_WINDOW", on_close)
+
+    ctk.CTkLabel(
+        diagnostico_window,
+        text='DIAGNÓSTICO',
+        font=ctk.CTkFont(family="Arial", size=20, weight="bold"),
+        text_color=Theme.COR_PRIMARIA_ESCURA
+    ).grid(row=0, column=0, padx=20, pady=(15, 5))
+
+    # Opções (ligam/desligam a instrumentação em tempo de execução)
+    frame_opcoes = ctk.CTkFrame(diagnostico_window, fg_color="transparent")
+    frame_opcoes.grid(row=1, column=0, padx=20, pady=5)
+
+    ativo_var = ctk.BooleanVar(value=diagnostico.esta_ativo())
+    perfil_var = ctk.BooleanVar(value=diagnostico.perfil_ativo())
+
+    def aplicar_opcoes():
+        diagnostico.ativar(ativo_var.get(), perfil=perfil_var.get())
+
+    ctk.CTkSwitch(
+        frame_opcoes, text="Medir tempos", variable=ativo_var, command=aplicar_opcoes,
+        font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO),
+    ).grid(row=0, column=0, padx=(0, 20))
+    ctk.CTkCheckBox(
+        frame_opcoes, text=f"Capturar cProfile (pasta '{diagnostico.PASTA_PERFIS}')", variable=perfil_var,
+        command=aplicar_opcoes, font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO),
+    ).grid(row=0, column=1)
+
+    tabela = TabelaVirtual(
+        diagnostico_window,
+        colunas=[("Etapa", "w"), ("Chamadas", "e"), ("Total (ms)", "e"), ("Média (ms)", "e"), ("Máx (ms)", "e"), ("Última (ms)", "e")],
+        linhas_visiveis=12,
+        fonte_cabecalho=ctk.CTkFont(*Theme.FONTE_LABEL_MAQUINA),
+        fonte_linha=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO),
+        width=800,
+    )
+    tabela.grid(row=2, column=0, padx=20, pady=(10, 5), sticky="nsew")
+
+    contadores_label = ctk.CTkLabel(
+        diagnostico_window, text="", font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO), text_color="gray"
+    )
+    contadores_label.grid(row=3, column=0, padx=20, pady=5)
+
+    def atualizar():
+        dados = diagnostico.resumo()
+        metricas = dados['metricas']
+        tabela.definir_dados([
+            [m['nome'] for m in metricas],
+            [str(m['chamadas']) for m in metricas],
+            [f"{m['total_ms']:.1f}" for m in metricas],
+            [f"{m['media_ms']:.1f}" for m in metricas],
+            [f"{m['max_ms']:.1f}" for m in metricas],
+            [f"{m['ultimo_ms']:.1f}" for m in metricas],
+        ])
+        contadores = ', '.join(f"{nome}: {valor}" for nome, valor in sorted(dados['contadores'].items()))
+        if not ativo_var.get():
+            contadores_label.configure(text="Medição desligada.")
+        else:
+            contadores_label.configure(text=contadores or "Nenhum contador registrado.")
+
+    def atualizar_periodicamente():
+        # A janela pode ter sido fechada
+        if app.diagnostico_window is not diagnostico_window:
+            return
+        atualizar()
+        diagnostico_window.after(INTERVALO_DIAGNOSTICO_MS, atualizar_periodicamente)
+
+    def zerar():
+        diagnostico.limpar()
+        atualizar()
+
+    def exportar():
+        try:
+            caminho = diagnostico.exportar_json(ARQUIVO_DIAGNOSTICO)
+        except OSError as e:
+            tkinter.messagebox.showerror("Erro", f"Não foi possível exportar o diagnóstico: {e}")
+            return
+        tkinter.messagebox.showinfo("Diagnóstico Exportado", f"Resumo salvo em:\n{caminho}")
+
+    frame_botoes = ctk.CTkFrame(diagnostico_window, fg_color="transparent")
+    frame_botoes.grid(row=4, column=0, padx=20, pady=(5, 15))
+
+    for coluna, (texto, comando, cor, cor_hover) in enumerate([
+        ("Zerar", zerar, Theme.COR_SEGUNDARIA, Theme.COR_SEGUNDARIA_HOVER),
+        ("Exportar JSON", exportar, "#00695C", "#00897B"),
+    ]):
+        ctk.CTkButton(
+            frame_botoes, text=texto, command=comando, fg_color=cor, hover_color=cor_hover,
+            font=ctk.CTkFont(*Theme.FONTE_BOTAO), height=Theme.ALTURA_BOTAO, width=180,
+        ).grid(row=0, column=coluna, padx=10)
+
+    atualizar_periodicamente()
+    diagnostico_window.focus()
+
+
+# #######################################################################
+# --- OPÇÃO 5: IMPORTAÇÃO DE EXTRATOS (OFX) E PLANILHAS (CSV) ---
+# #######################################################################
+
+# Importações rodam em segundo plano, uma por vez
+executor_importacao = ThreadPoolExecutor(max_workers=1, thread_name_prefix="importacao")
+
+# Marcado para interromper a importação em andamento (fechar a janela ou o aplicativo)
+cancelar_importacao = threading.Event()
+
+
+def open_importacao_window():
+    """Janela para importar um extrato OFX ou uma planilha CSV, com barra de progresso."""
+
+    if hasattr(app, "importacao_window") and app.importacao_window is not None:
+        app.importacao_window.focus()
+        return
+
+    importacao_window = ctk.CTkToplevel(app)
+    importacao_window.title("Importar Extrato / Planilha")
+    importacao_window.geometry("650x430")
+
+    app.importacao_window = importacao_window
+    importacao_window.grid_columnconfigure(0, weight=1)
+
+    # Estado da execução em segundo plano desta janela
+    execucao = {'future': None, 'fila': None}
+
+    def importacao_em_andamento():
+        return execucao['future'] is not None and not execucao['future'].done()
+
+    def on_close():
+        # Os blocos já gravados permanecem; importar de novo completa o restante
+        if importacao_em_andamento():
+            cancelar_importacao.set()
+        app.importacao_window = None
+        importacao_window.destroy()
+
+    importacao_window.protocol("WM_DELETE_WINDOW", on_close)
+
+    ctk.CTkLabel(
+        importacao_window,
+        text='IMPORTAR EXTRATO / PLANILHA',
+        font=ctk.CTkFont(family="Arial", size=20, weight="bold"),
+        text_color=Theme.COR_PRIMARIA_ESCURA
+    ).grid(row=0, column=0, padx=20, pady=(15, 10))
+
+    # Arquivo
+    frame_arquivo = ctk.CTkFrame(importacao_window, fg_color="transparent")
+    frame_arquivo.grid(row=1, column=0, padx=20, pady=5)
+
+    entry_arquivo = ctk.CTkEntry(frame_arquivo, width=430, placeholder_text="Arquivo .ofx ou .csv")
+    entry_arquivo.grid(row=0, column=0, padx=(0, 10))
+
+    def escolher_arquivo():
+        caminho = tkinter.filedialog.askopenfilename(
+            parent=importacao_window,
+            title="Selecionar extrato ou planilha",
+            filetypes=[("Extratos e planilhas", "*.ofx *.csv"), ("OFX", "*.ofx"), ("CSV", "*.csv"), ("Todos", "*.*")],
+        )
+        if caminho:
+            entry_arquivo.delete(0, "end")
+            entry_arquivo.insert(0, caminho)
+
+    ctk.CTkButton(
+        frame_arquivo, text="Escolher...", command=escolher_arquivo,
+        fg_color="gray40", hover_color="gray30", width=120,
+    ).grid(row=0, column=1)
+
+    # Máquina das receitas sem máquina informada (créditos do extrato)
+    ctk.CTkLabel(
+        importacao_window, text="Máquina das receitas sem máquina informada (opcional):",
+        font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO)
+    ).grid(row=2, column=0, padx=20, pady=(10, 0))
+    entry_maquina = ctk.CTkEntry(importacao_window, width=Theme.LARGURA_ENTRY, placeholder_text=MAQUINA_EXTRATO)
+    entry_maquina.grid(row=3, column=0, padx=20, pady=5)
+
+    barra_progresso = ctk.CTkProgressBar(importacao_window, width=560, progress_color="#00695C")
+    barra_progresso.set(0)
+    barra_progresso.grid(row=5, column=0, padx=20, pady=(10, 5))
+
+    status_label = ctk.CTkLabel(
+        importacao_window, text='Selecione um arquivo para importar.',
+        font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO, weight="bold"), text_color="gray"
+    )
+    status_label.grid(row=6, column=0, padx=20, pady=5)
+
+    resumo_label = ctk.CTkLabel(
+        importacao_window, text='', font=ctk.CTkFont(*Theme.FONTE_LABEL_CAMPO), text_color="gray", justify="left"
+    )
+    resumo_label.grid(row=7, column=0, padx=20, pady=(0, 10))
+
+    def finalizar_execucao():
+        btn_importar.configure(state="normal")
+        btn_cancelar.configure(state="disabled")
+
+    def verificar_importacao():
+        """Polling (app.after): atualiza a barra de progresso e trata o resultado final."""
+        # A janela pode ter sido fechada durante a importação
+        if app.importacao_window is not importacao_window:
+            return
+
+        try:
+            while True:
+                fracao, texto = execucao['fila'].get_nowait()
+                barra_progresso.set(fracao)
+                status_label.configure(text=texto, text_color="#00695C")
+        except queue.Empty:
+            pass
+
+        future = execucao['future']
+        if not future.done():
+            importacao_window.after(INTERVALO_POLLING_MS, verificar_importacao)
+            return
+
+        finalizar_execucao()
+
+        try:
+            resumo = future.result()
+        except Exception as e:
+            status_label.configure(text=f"ERRO na importação: {e}", text_color=Theme.COR_SEGUNDARIA)
+            print(f"Erro ao importar arquivo: {e}")
+            tkinter.messagebox.showerror("Erro na Importação", f"Falha ao importar o arquivo: {e}")
+            return
+
+        if resumo['cancelada']:
+            status_label.configure(text='Importação cancelada (os blocos já gravados foram mantidos).', text_color="gray")
+        else:
+            barra_progresso.set(1)
+            status_label.configure(text='Importação concluída!', text_color=Theme.COR_PRIMARIA_ESCURA)
+
+        linhas = [
+            f"{resumo['lidas']} linhas lidas: {resumo['entradas']} entradas e {resumo['despesas']} despesas gravadas, "
+            f"{resumo['duplicadas']} já existentes e {resumo['invalidas']} inválidas ignoradas."
+        ]
+        if resumo['ocorrencias_expandidas']:
+            linhas.append(f"{resumo['ocorrencias_expandidas']} ocorrências de despesas recorrentes expandidas "
+                          f"ignoradas (a recorrência já as gera).")
+        linhas += [f"Linha {linha}: {motivo}" for linha, motivo in resumo['linhas_invalidas'][:5]]
+        resumo_label.configure(text="\n".join(linhas))
+
+    def iniciar_importacao():
+        # Impede execuções simultâneas (ex: duplo clique)
+        if importacao_em_andamento():
+            return
+
+        caminho = entry_arquivo.get().strip()
+        if not caminho or not os.path.isfile(caminho):
+            tkinter.messagebox.showerror("Erro de Validação", "Selecione um arquivo .ofx ou .csv existente.")
+            return
+        if os.path.splitext(caminho)[1].lower() not in ('.ofx', '.csv'):
+            tkinter.messagebox.showerror("Erro de Validação", "Formato não suportado. Use um arquivo .ofx ou .csv.")
+            return
+
+        fila = execucao['fila'] = queue.Queue()
+
+        def informar_progresso(linhas, bytes_lidos, bytes_total):
+            fila.put((bytes_lidos / max(bytes_total, 1), f"Importando... {linhas} linhas processadas"))
+
+        cancelar_importacao.clear()
+        barra_progresso.set(0)
+        resumo_label.configure(text='')
+        status_label.configure(text='Lendo o arquivo...', text_color="#00695C")
+        btn_importar.configure(state="disabled")
+        btn_cancelar.configure(state="normal")
+
+        execucao['future'] = executor_importacao.submit(
+            importar_arquivo, db_manager, caminho,
+            maquina_padrao=entry_maquina.get().strip() or None,
+            progresso=informar_progresso, cancelar=cancelar_importacao,
+        )
+        importacao_window.after(INTERVALO_POLLING_MS, verificar_importacao)
+
+    def cancelar():
+        if importacao_em_andamento():
+            cancelar_importacao.set()
+            status_label.configure(text='Cancelando... (aguardando o fim do bloco atual)', text_color="gray")
+            btn_cancelar.configure(state="disabled")
+
+    frame_botoes = ctk.CTkFrame(importacao_window, fg_color="transparent")
+    frame_botoes.grid(row=4, column=0, padx=20, pady=10)
+
+    btn_importar = ctk.CTkButton(
+        frame_botoes, text='Importar', command=iniciar_importacao,
+        fg_color="#00695C", hover_color="#00897B",
+        font=ctk.CTkFont(*Theme.FONTE_BOTAO), height=Theme.ALTURA_BOTAO, width=250,
+    )
+    btn_importar.grid(row=0, column=0, padx=(0, 10))
+
+    btn_cancelar = ctk.CTkButton(
+        frame_botoes, text='Cancelar', command=cancelar,
+        fg_color=Theme.COR_SEGUNDARIA, hover_color=Theme.COR_SEGUNDARIA_HOVER,
+        font=ctk.CTkFont(*Theme.FONTE_BOTAO), height=Theme.ALTURA_BOTAO, width=150,
+        state="disabled" # Habilitado apenas durante a importação
+    )
+    btn_cancelar.grid(row=0, column=1)
+
+    importacao_window.focus()
+
+
 # #######################################################################
 # --- CÓDIGO DA JANELA PRINCIPAL (MENU) ---
 # #######################################################################
@@ -564,7 +1128,7 @@ def visualizar_prophet_action():
 ctk.set_appearance_mode('light') 
 app = ctk.CTk()
 app.title('Sistema de Gestão - Menu Principal')
-app.geometry('550x450') 
+app.geometry('550x570') 
 app.resizable(False, False)
 
 # Configurar o grid: 1 coluna expansível para centralizar
@@ -609,7 +1173,7 @@ btn_saida.grid(row=2, column=0, padx=20, pady=10)
 # Opção 3: Visualizar e Gerar Prophet
 btn_prophet = ctk.CTkButton(
     app, 
-    text='3. Previsão Orçamentária (Prophet)', 
+    text='3. Previsão Orçamentária', 
     command=visualizar_prophet_action,
     fg_color="#00695C", # Verde Escuro
     hover_color="#00897B",
@@ -619,13 +1183,78 @@ btn_prophet = ctk.CTkButton(
 )
 btn_prophet.grid(row=3, column=0, padx=20, pady=10)
 
+# Opção 4: Diagnóstico
+btn_diagnostico = ctk.CTkButton(
+    app, 
+    text='4. Diagnóstico', 
+    command=open_diagnostico_window,
+    fg_color="gray40", 
+    hover_color="gray30",
+    font=ctk.CTkFont(*Theme.FONTE_MENU),
+    height=Theme.ALTURA_BOTAO,
+    width=Theme.LARGURA_BOTAO_MENU
+)
+btn_diagnostico.grid(row=4, column=0, padx=20, pady=10)
+
+# Opção 5: Importar Extrato/Planilha
+btn_importacao = ctk.CTkButton(
+    app, 
+    text='5. Importar Extrato/Planilha', 
+    command=open_importacao_window,
+    fg_color="#37474F", 
+    hover_color="#263238",
+    font=ctk.CTkFont(*Theme.FONTE_MENU),
+    height=Theme.ALTURA_BOTAO,
+    width=Theme.LARGURA_BOTAO_MENU
+)
+btn_importacao.grid(row=5, column=0, padx=20, pady=10)
+
 # --- 4. Loop Principal e Limpeza ---
 
 def on_app_close():
     """Fecha a conexão com o DB antes de encerrar a aplicação."""
+    # Descarta previsões pendentes antes de fechar a conexão
+    executor_previsao.shutdown(wait=False, cancel_futures=True)
+    # A importação para no fim do bloco atual (a transação dele termina antes do close)
+    cancelar_importacao.set()
+    executor_importacao.shutdown(wait=True, cancel_futures=True)
     print("Fechando conexão com o banco de dados...")
     db_manager.close()
     app.destroy()
 
 app.protocol("WM_DELETE_WINDOW", on_app_close)
+
+
+def preload_dependencias():
+    """
+    Importa as dependências pesadas e carrega o ledger em memória em uma thread
+    de segundo plano (sem travar o menu).
+    """
+    def importar():
+        import importlib
+        for modulo in MODULOS_PESADOS:
+            try:
+                importlib.import_module(modulo)
+            except Exception as e:
+                print(f"Aviso: Falha ao pré-carregar '{modulo}': {e}")
+        try:
+            db_manager.carregar_ledger()
+        except Exception as e:
+            print(f"Aviso: Falha ao carregar o ledger em memória: {e}")
+
+    threading.Thread(target=importar, name="preload", daemon=True).start()
+
+
+def medir_inicializacao():
+    """Imprime o tempo até a primeira janela (menu desenhado) e encerra o aplicativo."""
+    app.update_idletasks()
+    print(f"TEMPO_PRIMEIRA_JANELA_S={time.perf_counter() - INICIO_PROCESSO:.4f}")
+    on_app_close()
+
+
+if os.environ.get(VAR_MEDIR_INICIALIZACAO):
+    app.after(0, medir_inicializacao)
+elif PRELOAD_DEPENDENCIAS:
+    app.after(500, preload_dependencias)
+
 app.mainloop()
\ No newline at end of file
@@ -0,0 +1,118 @@
+# Motores de previsão intercambiáveis. Todos recebem o histórico ('ds', 'y') e
+# devolvem o mesmo formato ('ds', 'yhat', 'yhat_lower', 'yhat_upper', a partir
+# de hoje), então a janela de previsão, a CLI e o gráfico não dependem do motor.
+#
+# Cada motor é carregado só quando usado: o 'rapido' não importa o Prophet/Stan,
+# e importar este módulo (ex: na CLI, para listar os motores) não importa o pandas.
+# Novos motores entram com registrar_motor().
+
+# Nome usado para a série agregada (soma de todas as máquinas) no resultado por máquina
+SERIE_FROTA_TOTAL = 'Frota (total)'
+
+
+def _carregar_prophet():
+    from prophet_model import run_prophet_forecast
+    return run_prophet_forecast
+
+
+def _carregar_rapido():
+    from previsao_rapida import run_previsao_rapida
+    return run_previsao_rapida
+
+
+# nome -> (descrição exibida na interface, função que importa e retorna o motor)
+MOTORES = {
+    'prophet': ('Prophet (completo)', _carregar_prophet),
+    'rapido': ('Rápido (Holt-Winters)', _carregar_rapido),
+}
+
+MOTOR_PADRAO = 'prophet'
+
+
+def registrar_motor(nome, descricao, carregar):
+    """
+    Registra um motor de previsão.
+
+    Args:
+        nome (str): Identificador (ex: usado em --motor na CLI).
+        descricao (str): Texto exibido na interface.
+        carregar (callable): Sem argumentos; retorna a função do motor, com a
+            assinatura (df, periods, data_referencia=None, usar_feriados=True,
+            regiao_feriados=None) -> DataFrame ('ds', 'yhat', 'yhat_lower', 'yhat_upper').
+    """
+    MOTORES[nome] = (descricao, carregar)
+
+
+def _motor(nome):
+    if nome not in MOTORES:
+        raise ValueError(f"Motor de previsão desconhecido '{nome}'. Use: {', '.join(MOTORES)}.")
+    return MOTORES[nome][1]()
+
+
+def prever(df, periods: int = 180, motor: str = MOTOR_PADRAO, data_referencia=None,
+           usar_feriados: bool = True, regiao_feriados: str = None, **opcoes):
+    """
+    Roda a previsão de fluxo de caixa com o motor escolhido.
+
+    Args:
+        df (pd.DataFrame): DataFrame com colunas 'ds' (datetime) e 'y' (float).
+        periods (int): Número de dias para prever no futuro.
+        motor (str): Chave de MOTORES ('prophet' ou 'rapido').
+        data_referencia (date): "Hoje" da previsão (padrão: data atual).
+        usar_feriados (bool): Modela os feriados (ver feriados.tabela_feriados).
+        regiao_feriados (str): UF ou município dos feriados regionais (None = apenas nacionais).
+        **opcoes: Parâmetros específicos do motor (ex: usar_cache, warm_start e serie no Prophet).
+
+    Returns:
+        pd.DataFrame: Previsão ('ds', 'yhat', 'yhat_lower', 'yhat_upper'); vazio em caso de falha.
+    """
+    return _motor(motor)(df, periods=periods, data_referencia=data_referencia, usar_feriados=usar_feriados,
+                         regiao_feriados=regiao_feriados, **opcoes)
+
+
+def combinar_previsoes_maquinas(previsoes: list):
+    """
+    Junta as previsões das máquinas (cada uma com a coluna 'maquina') no formato
+    longo e acrescenta a soma da frota (maquina = SERIE_FROTA_TOTAL). Os limites
+    da frota são a soma dos limites das máquinas (intervalo conservador).
+    """
+    import pandas as pd
+
+    colunas = ['maquina', 'ds', 'yhat', 'yhat_lower', 'yhat_upper']
+    if not previsoes:
+        return pd.DataFrame(columns=colunas)
+
+    df_maquinas = pd.concat(previsoes, ignore_index=True)
+    df_frota = (
+        df_maquinas.groupby('ds', as_index=False)[['yhat', 'yhat_lower', 'yhat_upper']].sum()
+        .assign(maquina=SERIE_FROTA_TOTAL)
+    )
+    return (
+        pd.concat([df_maquinas, df_frota], ignore_index=True)[colunas]
+        .sort_values(['maquina', 'ds'], ignore_index=True)
+    )
+
+
+def prever_por_maquina(series_por_maquina: dict, periods: int = 180, motor: str = MOTOR_PADRAO, data_referencia=None,
+                       usar_feriados: bool = True, regiao_feriados: str = None):
+    """
+    Previsão de cada máquina e da frota, no formato longo de combinar_previsoes_maquinas.
+
+    O Prophet ajusta as máquinas em paralelo (run_prophet_forecast_por_maquina,
+    em processos); os demais motores são rápidos o bastante para rodar em sequência.
+    """
+    if motor == 'prophet':
+        from prophet_model import run_prophet_forecast_por_maquina
+        return run_prophet_forecast_por_maquina(series_por_maquina, periods=periods, data_referencia=data_referencia,
+                                                usar_feriados=usar_feriados, regiao_feriados=regiao_feriados)
+
+    funcao = _motor(motor)
+    previsoes = []
+    for maquina, df in series_por_maquina.items():
+        forecast = funcao(df[['ds', 'y']], periods=periods, data_referencia=data_referencia,
+                          usar_feriados=usar_feriados, regiao_feriados=regiao_feriados)
+        if forecast.empty:
+            print(f"Aviso: Sem previsão para a máquina '{maquina}'.")
+            continue
+        previsoes.append(forecast.assign(maquina=maquina))
+    return combinar_previsoes_maquinas(previsoes)
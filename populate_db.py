@@ -1,40 +1,70 @@
 import sys
+import argparse
 from datetime import datetime, timedelta
 import random
 import time
 
+import numpy as np
+
 # Tenta importar o DatabaseManager. Certifique-se de que database.py está no mesmo diretório.
 try:
-    from database import DatabaseManager
+    from database import DatabaseManager, MAQUINAS_PADRAO
 except ImportError:
     print("ERRO: Não foi possível importar 'DatabaseManager' do arquivo 'database.py'.")
     print("Certifique-se de que 'database.py' está no mesmo diretório.")
     sys.exit(1)
 
-def generate_historical_entradas(db_manager, days_history=90):
-    """Gera dados históricos de Entradas (Receitas) para 90 dias."""
+# Frequências possíveis dos contratos recorrentes sintéticos
+FREQUENCIAS = ['Mensal', 'Trimestral', 'Semestral', 'Anual']
+
+
+def frota_cadastrada(db_manager, n_maquinas=None):
+    """
+    Nomes das máquinas do cadastro (as 'n_maquinas' primeiras, em ordem alfabética).
+
+    Com o cadastro vazio, parte de MAQUINAS_PADRAO. Se ainda faltarem máquinas,
+    completa com 'Máquina NNN' (cadastradas junto com as entradas geradas).
+    """
+    nomes = [nome for _, nome in db_manager.listar_maquinas(limite=n_maquinas)]
+    if not nomes:
+        nomes = sorted(MAQUINAS_PADRAO)[:n_maquinas]
+    existentes = set(nomes)
+    numero = 0
+    while n_maquinas is not None and len(nomes) < n_maquinas:
+        numero += 1
+        nome = f"Máquina {numero:03d}"
+        if nome not in existentes:
+            nomes.append(nome)
+    return nomes
+
+
+def generate_historical_entradas(db_manager, days_history=90, seed=None):
+    """Gera dados históricos de Entradas (Receitas) para 'days_history' dias (padrão: 90)."""
     
     print("\n--- 1. INSERINDO ENTRADAS (RECEITAS) HISTÓRICAS ---")
     
+    random_gen = random.Random(seed) # Mesma seed = mesmos dados
     start_date = datetime.now() - timedelta(days=days_history)
-    maquinas = ['Escavadeira', 'Caminhão', 'Retro-Escavadeira']
-    total_entries = 0
+    maquinas = frota_cadastrada(db_manager)
+    registros = []
     
     # Simula 90 dias (cerca de 3 meses)
     for i in range(days_history):
         current_date = start_date + timedelta(days=i)
         
         # Simula dias de trabalho (70% de chance de trabalhar)
-        if random.random() < 0.7:
+        if random_gen.random() < 0.7:
             # Simula valores totais de receita para cada máquina no dia
-            for maquina in random.sample(maquinas, k=random.randint(1, len(maquinas))):
+            for maquina in random_gen.sample(maquinas, k=random_gen.randint(1, len(maquinas))):
                 
                 # Simula uma variação de receita entre R$ 800 e R$ 2500 por máquina por dia
-                valor_total = round(random.uniform(800.00, 2500.00), 2)
+                valor_total = round(random_gen.uniform(800.00, 2500.00), 2)
                 data_str = current_date.strftime('%d/%m/%Y')
                 
-                if db_manager.insert_entrada(maquina, valor_total, data_str):
-                    total_entries += 1
+                registros.append((maquina, valor_total, data_str))
+    
+    # Grava todos os registros em uma única transação
+    total_entries = db_manager.insert_entradas_many(registros)
                 
     print(f"✅ {total_entries} registros de Receita/Entrada histórica inseridos com sucesso.")
 
@@ -89,10 +119,10 @@ def generate_despesas(db_manager):
         },
     ]
     
-    total_despesas = 0
-    for d in despesas_a_inserir:
-        if db_manager.insert_saida(d['titulo'], d['valor'], d['data_saida'], d['recorrente'], d['frequencia']):
-            total_despesas += 1
+    total_despesas = db_manager.insert_saidas_many(
+        (d['titulo'], d['valor'], d['data_saida'], d['recorrente'], d['frequencia'])
+        for d in despesas_a_inserir
+    )
             
     print(f"✅ {total_despesas} registros de Despesa/Saída inseridos com sucesso.")
     print("\n" + "=" * 50)
@@ -101,15 +131,95 @@ def generate_despesas(db_manager):
     print("=" * 50 + "\n")
 
 
+def gerar_ledger_sintetico(db_manager, anos=1, n_maquinas=3, n_contratos=5, seed=42,
+                           prob_trabalho=0.7, data_fim=None):
+    """
+    Gera um histórico sintético escalável (vetorizado com NumPy) e grava pelo caminho em lote.
+
+    Args:
+        db_manager (DatabaseManager): Banco de destino (use um arquivo descartável para benchmarks).
+        anos (float): Anos de histórico até 'data_fim'.
+        n_maquinas (int): Quantidade de máquinas (as do cadastro, completadas com 'Máquina NNN').
+        n_contratos (int): Quantidade de despesas recorrentes.
+        seed (int): Semente do gerador (mesma seed = mesmo ledger).
+        prob_trabalho (float): Chance de cada máquina trabalhar em cada dia.
+        data_fim (date): Último dia do histórico (padrão: ontem).
+
+    Returns:
+        dict: Quantidade de entradas e despesas inseridas.
+    """
+    rng = np.random.default_rng(seed)
+    if data_fim is None:
+        data_fim = datetime.now().date() - timedelta(days=1)
+    n_dias = max(1, int(round(anos * 365)))
+    inicio = np.datetime64(data_fim, 'D') - (n_dias - 1)
+
+    # 1. Entradas: uma linha por (dia, máquina) trabalhado
+    maquinas = frota_cadastrada(db_manager, n_maquinas)
+    trabalhou = rng.random((n_dias, n_maquinas)) < prob_trabalho
+    dias_idx, maquinas_idx = np.nonzero(trabalhou)
+    valores = np.round(rng.uniform(800.00, 2500.00, size=dias_idx.size), 2)
+    datas_str = _formatar_datas(inicio + dias_idx)
+    nomes = np.array(maquinas, dtype=object)[maquinas_idx]
+    total_entradas = db_manager.insert_entradas_many(zip(nomes.tolist(), valores.tolist(), datas_str))
+
+    # 2. Despesas recorrentes (contratos) começando em datas aleatórias do histórico
+    inicio_contratos = inicio + rng.integers(0, n_dias, size=n_contratos)
+    valores_contratos = np.round(rng.uniform(200.00, 9000.00, size=n_contratos), 2)
+    frequencias = rng.choice(FREQUENCIAS, size=n_contratos)
+    despesas = [
+        (f"Contrato {i + 1:04d}", valor, data, True, frequencia)
+        for i, (valor, data, frequencia) in enumerate(zip(
+            valores_contratos.tolist(), _formatar_datas(inicio_contratos), frequencias.tolist()
+        ))
+    ]
+
+    # 3. Despesas pontuais (manutenções): cerca de uma a cada 10 dias
+    n_pontuais = max(1, n_dias // 10)
+    datas_pontuais = inicio + rng.integers(0, n_dias, size=n_pontuais)
+    valores_pontuais = np.round(rng.uniform(300.00, 6000.00, size=n_pontuais), 2)
+    despesas += [
+        (f"Manutenção #{i + 1:05d}", valor, data, False, 'N/A')
+        for i, (valor, data) in enumerate(zip(valores_pontuais.tolist(), _formatar_datas(datas_pontuais)))
+    ]
+    total_despesas = db_manager.insert_saidas_many(despesas)
+
+    return {'entradas': total_entradas, 'despesas': total_despesas}
+
+
+def _formatar_datas(datas):
+    """Converte um array datetime64[D] em strings DD/MM/AAAA (formato das tabelas)."""
+    iso = np.datetime_as_string(np.asarray(datas, dtype='datetime64[D]'), unit='D')
+    return [f"{d[8:10]}/{d[5:7]}/{d[0:4]}" for d in iso.tolist()]
+
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Popula o banco de dados com dados de teste.')
+    parser.add_argument('--db', default=None, help='Arquivo do banco (padrão: gestao_frota.db).')
+    parser.add_argument('--seed', type=int, default=None, help='Semente para gerar sempre os mesmos dados.')
+    parser.add_argument('--sintetico', action='store_true',
+                        help='Gera um ledger sintético parametrizado (anos, máquinas, contratos) em vez do exemplo de 90 dias.')
+    parser.add_argument('--anos', type=float, default=1, help='Anos de histórico (modo --sintetico).')
+    parser.add_argument('--maquinas', type=int, default=3, help='Quantidade de máquinas (modo --sintetico).')
+    parser.add_argument('--contratos', type=int, default=5, help='Quantidade de despesas recorrentes (modo --sintetico).')
+    args = parser.parse_args()
+
     # Inicializa o gerenciador de banco de dados
     try:
-        db_manager = DatabaseManager()
+        db_manager = DatabaseManager(args.db) if args.db else DatabaseManager()
     except Exception as e:
         print(f"ERRO: Falha ao conectar ou configurar o banco de dados. {e}")
         sys.exit(1)
         
-    generate_historical_entradas(db_manager)
-    generate_despesas(db_manager)
+    if args.sintetico:
+        inicio = time.perf_counter()
+        totais = gerar_ledger_sintetico(
+            db_manager, anos=args.anos, n_maquinas=args.maquinas, n_contratos=args.contratos,
+            seed=args.seed if args.seed is not None else 42,
+        )
+        print(f"✅ {totais['entradas']} entradas e {totais['despesas']} despesas sintéticas inseridas em {time.perf_counter() - inicio:.2f}s.")
+    else:
+        generate_historical_entradas(db_manager, seed=args.seed)
+        generate_despesas(db_manager)
     
     db_manager.close()
\ No newline at end of file
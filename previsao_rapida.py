@@ -0,0 +1,238 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import diagnostico
+import feriados
+
+# Motor de previsão leve, só com NumPy (sem Stan): responde em milissegundos,
+# para simulações interativas; o Prophet continua sendo a previsão completa.
+#
+# O fluxo diário é decomposto em:
+# 1. Sazonalidade anual (termos de Fourier) e efeito médio dos feriados,
+#    estimados por mínimos quadrados sobre todo o histórico;
+# 2. Nível, tendência amortecida e sazonalidade semanal por Holt-Winters aditivo
+#    sobre o restante. Os parâmetros são escolhidos em uma grade, com todas as
+#    combinações calculadas ao mesmo tempo (vetorizado);
+# 3. Intervalos empíricos: quantis dos erros de um passo do ajuste, alargados
+#    com o horizonte pela fórmula de variância do Holt-Winters.
+# Com pouco histórico, o Holt-Winters dá lugar ao sazonal ingênuo (repete a última semana).
+
+# Mesmo nível de prophet_model.MODEL_CONFIG['interval_width']
+INTERVALO_PREVISAO = 0.90
+
+PERIODO_SEMANAL = 7
+PERIODO_ANUAL = 365.25
+ORDEM_FOURIER_ANUAL = 6
+
+# Histórico mínimo para estimar a sazonalidade anual (dois ciclos completos)
+DIAS_MINIMOS_ANUAL = 2 * 365
+# Histórico mínimo para o Holt-Winters (abaixo disso, sazonal ingênuo)
+DIAS_MINIMOS_HW = 4 * PERIODO_SEMANAL
+# Feriados mínimos no histórico para estimar o efeito deles
+FERIADOS_MINIMOS = 3
+
+# O Holt-Winters é ajustado apenas nos dias mais recentes (o nível se adapta rápido)
+DIAS_AJUSTE_HW = 3 * 365
+
+# Grade de parâmetros (alfa: nível, beta: tendência, gama: sazonalidade, phi: amortecimento)
+GRADE_ALFA = (0.02, 0.05, 0.1, 0.2, 0.4)
+GRADE_BETA = (0.0, 0.005, 0.02)
+GRADE_GAMA = (0.01, 0.05, 0.1, 0.3)
+GRADE_PHI = (0.9, 0.98)
+
+
+def _dias(datas):
+    """Datas -> número de dias desde 01/01/1970 (int64)."""
+    return datas.to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+
+def _fourier(dias, periodo, ordem):
+    angulos = 2 * np.pi * dias[:, None] * np.arange(1, ordem + 1)[None, :] / periodo
+    return np.hstack([np.cos(angulos), np.sin(angulos)])
+
+
+def _componentes_fixos(dias_hist, y, dias_futuros, indicador_hist, indicador_futuro):
+    """
+    Estima sazonalidade anual e efeito dos feriados por mínimos quadrados (junto
+    com intercepto, tendência linear e dia da semana, para não confundi-los).
+
+    Returns:
+        tuple: (componente no histórico, componente no futuro) em arrays.
+    """
+    usar_anual = len(dias_hist) >= DIAS_MINIMOS_ANUAL
+    usar_feriados = indicador_hist.sum() >= FERIADOS_MINIMOS
+    if not usar_anual and not usar_feriados:
+        return np.zeros(len(dias_hist)), np.zeros(len(dias_futuros))
+
+    def colunas(dias, indicador):
+        partes = []
+        if usar_anual:
+            partes.append(_fourier(dias, PERIODO_ANUAL, ORDEM_FOURIER_ANUAL))
+        if usar_feriados:
+            partes.append(indicador[:, None].astype(float))
+        return np.hstack(partes)
+
+    fixos_hist = colunas(dias_hist, indicador_hist)
+    escala = max(len(dias_hist), 1)
+    controles = np.column_stack([
+        np.ones(len(dias_hist)),
+        (dias_hist - dias_hist[0]) / escala,
+        (dias_hist[:, None] % PERIODO_SEMANAL == np.arange(1, PERIODO_SEMANAL)[None, :]).astype(float),
+    ])
+    coeficientes = np.linalg.lstsq(np.hstack([fixos_hist, controles]), y, rcond=None)[0][:fixos_hist.shape[1]]
+    return fixos_hist @ coeficientes, colunas(dias_futuros, indicador_futuro) @ coeficientes
+
+
+def _grade():
+    alfa, beta, gama, phi = (g.ravel() for g in np.meshgrid(GRADE_ALFA, GRADE_BETA, GRADE_GAMA, GRADE_PHI, indexing='ij'))
+    # Restrições usuais da forma de correção de erro: beta <= alfa e gama <= 1 - alfa
+    validas = (beta <= alfa) & (gama <= 1 - alfa)
+    return alfa[validas], beta[validas], gama[validas], phi[validas]
+
+
+def _holt_winters(z, indices_semana):
+    """
+    Ajusta o Holt-Winters aditivo amortecido (forma de correção de erro) para
+    todas as combinações da grade de uma vez e devolve o estado da melhor.
+
+    Returns:
+        dict: 'nivel', 'tendencia', 'sazonal' (por dia da semana), 'alfa',
+        'beta', 'gama', 'phi' e 'residuos' (erros de um passo após o aquecimento).
+    """
+    alfa, beta, gama, phi = _grade()
+    m = PERIODO_SEMANAL
+    primeira, segunda = z[:m].mean(), z[m:2 * m].mean()
+
+    nivel = np.full(alfa.size, primeira)
+    tendencia = np.full(alfa.size, (segunda - primeira) / m)
+    sazonal = np.zeros((alfa.size, m))
+    sazonal[:, indices_semana[:m]] = z[:m] - primeira
+
+    residuos = np.empty((len(z), alfa.size))
+    for t, (valor, i) in enumerate(zip(z, indices_semana)):
+        erro = valor - (nivel + phi * tendencia + sazonal[:, i])
+        residuos[t] = erro
+        nivel = nivel + phi * tendencia + alfa * erro
+        tendencia = phi * tendencia + beta * erro
+        sazonal[:, i] += gama * erro
+
+    # Escolha pelo erro quadrático de um passo, ignorando o aquecimento das duas primeiras semanas
+    aquecimento = min(2 * m, len(z) - 1)
+    melhor = int(np.argmin((residuos[aquecimento:] ** 2).sum(axis=0)))
+    return {
+        'nivel': nivel[melhor], 'tendencia': tendencia[melhor], 'sazonal': sazonal[melhor],
+        'alfa': alfa[melhor], 'beta': beta[melhor], 'gama': gama[melhor], 'phi': phi[melhor],
+        'residuos': residuos[aquecimento:, melhor],
+    }
+
+
+def _prever_holt_winters(z, dias_hist, dias_futuros):
+    """(yhat, escala do intervalo por horizonte, resíduos) do Holt-Winters."""
+    indices_hist = dias_hist % PERIODO_SEMANAL
+    ajuste = _holt_winters(z, indices_hist)
+
+    passos = dias_futuros - dias_hist[-1] # h = 1, 2, ...
+    potencias = ajuste['phi'] ** np.arange(1, passos.max() + 1)
+    soma_phi = np.cumsum(potencias) # phi + phi^2 + ... + phi^h
+    yhat = (ajuste['nivel'] + soma_phi[passos - 1] * ajuste['tendencia']
+            + ajuste['sazonal'][dias_futuros % PERIODO_SEMANAL])
+
+    # Variância do erro h passos à frente: 1 + soma_{j<h} (alfa + beta*soma_phi_j + gama*[j múltiplo de m])^2
+    j = np.arange(1, passos.max() + 1)
+    c = ajuste['alfa'] + ajuste['beta'] * soma_phi + ajuste['gama'] * (j % PERIODO_SEMANAL == 0)
+    variancia = 1 + np.concatenate([[0.0], np.cumsum(c ** 2)[:-1]])
+    return yhat, np.sqrt(variancia[passos - 1]), ajuste['residuos']
+
+
+def _prever_sazonal_ingenuo(z, dias_hist, dias_futuros):
+    """(yhat, escala, resíduos): repete o último valor de cada dia da semana (ou a média, com menos de uma semana)."""
+    if len(z) < PERIODO_SEMANAL:
+        media = z.mean()
+        return np.full(len(dias_futuros), media), np.ones(len(dias_futuros)), z - media
+
+    ultimos = np.empty(PERIODO_SEMANAL)
+    ultimos[dias_hist[-PERIODO_SEMANAL:] % PERIODO_SEMANAL] = z[-PERIODO_SEMANAL:]
+    passos = dias_futuros - dias_hist[-1]
+    # O erro acumula a cada semana repetida
+    escala = np.sqrt(np.ceil(passos / PERIODO_SEMANAL))
+    return ultimos[dias_futuros % PERIODO_SEMANAL], escala, z[PERIODO_SEMANAL:] - z[:-PERIODO_SEMANAL]
+
+
+def _indicador_feriados(dias, usar_feriados, regiao_feriados, ano_inicio, ano_fim):
+    """Máscara dos dias que são feriado (todos False se desligado ou indisponível)."""
+    if not usar_feriados:
+        return np.zeros(len(dias), dtype=bool)
+    try:
+        tabela, _ = feriados.tabela_feriados(ano_inicio, ano_fim, regiao_feriados)
+    except Exception as e:
+        print(f"Aviso: Não foi possível montar a tabela de feriados ({e}). Prevendo sem feriados.")
+        return np.zeros(len(dias), dtype=bool)
+    return np.isin(dias, _dias(tabela['ds']))
+
+
+def run_previsao_rapida(df: pd.DataFrame, periods: int = 180, data_referencia=None, usar_feriados: bool = True,
+                        regiao_feriados: str = None):
+    """
+    Previsão de fluxo de caixa ('y') sem Prophet, em milissegundos.
+
+    Mesma entrada e mesma saída de prophet_model.run_prophet_forecast.
+
+    Args:
+        df (pd.DataFrame): DataFrame com colunas 'ds' (datetime) e 'y' (float), um dia por linha.
+        periods (int): Número de dias para prever no futuro.
+        data_referencia (date): "Hoje" da previsão (padrão: data atual); usa os dias anteriores.
+        usar_feriados (bool): Estima e projeta o efeito médio dos feriados.
+        regiao_feriados (str): UF ou município dos feriados regionais (None = apenas nacionais).
+
+    Returns:
+        pd.DataFrame: Previsão a partir de hoje ('ds', 'yhat', 'yhat_lower', 'yhat_upper').
+    """
+    if df.empty or 'ds' not in df.columns or 'y' not in df.columns or periods < 1:
+        print("Erro: DataFrame de entrada inválido ou vazio para a previsão rápida.")
+        return pd.DataFrame()
+
+    data_base = data_referencia or datetime.now().date()
+    today_dt = pd.to_datetime(data_base)
+
+    with diagnostico.medir('previsao_rapida', dias=len(df), periodos=periods):
+        # Histórico diário contínuo (dias sem lançamento valem 0, como em get_prophet_data)
+        df_hist = df.loc[df['ds'] < today_dt, ['ds', 'y']].groupby('ds')['y'].sum()
+        if df_hist.empty:
+            print("Aviso: Dados históricos insuficientes. Gerando previsão fictícia.")
+            df_hist = pd.Series([0.0], index=[today_dt - pd.Timedelta(days=1)])
+        datas_hist = pd.date_range(df_hist.index.min(), df_hist.index.max(), freq='D')
+        y = df_hist.reindex(datas_hist, fill_value=0.0).to_numpy(dtype=np.float64)
+
+        dias_hist = _dias(datas_hist)
+        # Como no Prophet: 'periods' dias após o último dia do histórico, depois filtrados a partir de hoje
+        dias_futuros = dias_hist[-1] + np.arange(1, periods + 1)
+
+        ano_inicio = datas_hist[0].year
+        ano_fim = pd.Timestamp(dias_futuros[-1], unit='D').year
+        indicador = _indicador_feriados(np.concatenate([dias_hist, dias_futuros]), usar_feriados, regiao_feriados,
+                                        ano_inicio, ano_fim)
+        fixos_hist, fixos_futuros = _componentes_fixos(
+            dias_hist, y, dias_futuros, indicador[:len(dias_hist)], indicador[len(dias_hist):]
+        )
+
+        # Nível, tendência e semana sobre o que os componentes fixos não explicam
+        z = (y - fixos_hist)[-DIAS_AJUSTE_HW:]
+        dias_ajuste = dias_hist[-DIAS_AJUSTE_HW:]
+        if len(z) >= DIAS_MINIMOS_HW:
+            yhat, escala, residuos = _prever_holt_winters(z, dias_ajuste, dias_futuros)
+        else:
+            yhat, escala, residuos = _prever_sazonal_ingenuo(z, dias_ajuste, dias_futuros)
+        yhat = yhat + fixos_futuros
+
+        cauda = (1 - INTERVALO_PREVISAO) / 2
+        quantil_inferior, quantil_superior = np.quantile(residuos, [cauda, 1 - cauda]) if len(residuos) else (0.0, 0.0)
+
+        forecast = pd.DataFrame({
+            'ds': dias_futuros.astype('datetime64[D]').astype('datetime64[ns]'),
+            'yhat': yhat,
+            'yhat_lower': yhat + quantil_inferior * escala,
+            'yhat_upper': yhat + quantil_superior * escala,
+        })
+        return forecast[forecast['ds'] >= today_dt].reset_index(drop=True)
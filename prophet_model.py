@@ -1,15 +1,247 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
+import prophet
 from prophet import Prophet
+from prophet.serialize import model_to_json, model_from_json
 import numpy as np
 from datetime import datetime
 
-def run_prophet_forecast(df: pd.DataFrame, periods: int = 180):
+import diagnostico
+import feriados
+from motores_previsao import combinar_previsoes_maquinas
+
+# Configuração do Prophet para extrair o máximo: sazonalidade anual e semanal (feriados: ver USAR_FERIADOS)
+# (também faz parte da chave do cache de modelos)
+MODEL_CONFIG = {
+    'yearly_seasonality': True,
+    'weekly_seasonality': True,
+    'daily_seasonality': False,
+    # Configurações extras de modelo para maior precisão (ex: incerteza)
+    'interval_width': 0.90, # Intervalo de confiança de 90%
+}
+
+# Feriados como efeitos do modelo (parâmetro 'holidays' do Prophet): nos feriados
+# a frota costuma ficar parada, o que sem eles distorceria a sazonalidade semanal
+USAR_FERIADOS = True
+REGIAO_FERIADOS = None # UF (ex: 'SP') ou município do pacote 'holidays'; None = apenas nacionais
+
+# Cache em disco dos modelos treinados (JSON do próprio Prophet)
+MODEL_CACHE_DIR = '.prophet_cache'
+MODEL_CACHE_MAX_ARQUIVOS = 20 # Mantém apenas os modelos usados mais recentemente
+MODEL_CACHE_MAX_IDADE_DIAS = 30 # Descarta modelos não usados há mais tempo que isso
+
+# Arquivos do cache que não entram no limite de quantidade (só expiram por idade):
+# parâmetros do último ajuste (warm start), resultados de backtest e tabelas de feriados
+PREFIXOS_CACHE_SO_IDADE = ('ultimo_', 'backtest_', feriados.PREFIXO_CACHE)
+
+
+def silenciar_logs_stan():
+    """Mostra apenas avisos e erros do cmdstanpy (útil em execuções sem interface e benchmarks)."""
+    # O cmdstanpy configura o próprio logger na primeira chamada de get_logger();
+    # chamá-lo antes garante que o nível definido aqui não seja sobrescrito.
+    from cmdstanpy.utils import get_logger
+    get_logger().setLevel(logging.WARNING)
+
+
+def _chave_cache(df_hist: pd.DataFrame, config: dict) -> str:
+    """Hash do DataFrame de treino + configuração do modelo (+ versão do Prophet)."""
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(df_hist[['ds', 'y']], index=False).values.tobytes())
+    h.update(_chave_config(config).encode('utf-8'))
+    return h.hexdigest()
+
+
+def _chave_config(config: dict) -> str:
+    """Hash apenas da configuração do modelo (+ versão do Prophet)."""
+    h = hashlib.sha256()
+    h.update(json.dumps(config, sort_keys=True, default=str).encode('utf-8'))
+    h.update(prophet.__version__.encode('utf-8'))
+    return h.hexdigest()
+
+
+def _caminho_cache(chave: str) -> str:
+    return os.path.join(MODEL_CACHE_DIR, f"{chave}.json")
+
+
+def _carregar_modelo_cache(chave: str):
+    """Retorna o modelo treinado salvo para esta chave, ou None se não houver."""
+    caminho = _caminho_cache(chave)
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            model = model_from_json(f.read())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Aviso: Cache de modelo inválido '{caminho}'. Será descartado. ({e})")
+        _remover_arquivo(caminho)
+        return None
+
+    # Atualiza a data de modificação: a limpeza descarta os menos usados
+    os.utime(caminho)
+    return model
+
+
+def _salvar_modelo_cache(chave: str, model):
+    """Serializa o modelo treinado no cache e aplica a política de limpeza."""
+    try:
+        os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+        caminho = _caminho_cache(chave)
+        # Grava em arquivo temporário e renomeia, para nunca deixar um JSON pela metade
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            f.write(model_to_json(model))
+        os.replace(temporario, caminho)
+        _limpar_cache()
+    except Exception as e:
+        print(f"Aviso: Não foi possível salvar o modelo no cache: {e}")
+
+
+def _limpar_cache():
+    """Remove modelos antigos (idade) e os excedentes menos usados (quantidade)."""
+    limite_idade = time.time() - MODEL_CACHE_MAX_IDADE_DIAS * 86400
+    arquivos = []
+    for nome in os.listdir(MODEL_CACHE_DIR):
+        if not nome.endswith('.json'):
+            continue
+        caminho = os.path.join(MODEL_CACHE_DIR, nome)
+        mtime = os.path.getmtime(caminho)
+        if mtime < limite_idade:
+            _remover_arquivo(caminho)
+        elif not nome.startswith(PREFIXOS_CACHE_SO_IDADE):
+            arquivos.append((mtime, caminho))
+
+    arquivos.sort(reverse=True)
+    for _, caminho in arquivos[MODEL_CACHE_MAX_ARQUIVOS:]:
+        _remover_arquivo(caminho)
+
+
+def _parametros_warm_start(model) -> dict:
+    """Extrai os parâmetros ajustados (k, m, sigma_obs, delta, beta) para inicializar um novo ajuste."""
+    params = {}
+    for nome in ['k', 'm', 'sigma_obs']:
+        params[nome] = float(model.params[nome][0][0])
+    for nome in ['delta', 'beta']:
+        params[nome] = np.asarray(model.params[nome][0], dtype=float)
+    return params
+
+
+def _caminho_ultimo_ajuste(config: dict, serie: str) -> str:
+    chave_serie = hashlib.sha256(serie.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(MODEL_CACHE_DIR, f"ultimo_{_chave_config(config)}_{chave_serie}.json")
+
+
+def _salvar_ultimo_ajuste(df_hist: pd.DataFrame, model, config: dict, serie: str):
+    """
+    Guarda os parâmetros do último ajuste e o hash de cada linha do histórico,
+    para que o próximo ajuste possa partir deles (warm start).
+    """
+    params = _parametros_warm_start(model)
+    registro = {
+        'params': {nome: (valor.tolist() if isinstance(valor, np.ndarray) else valor) for nome, valor in params.items()},
+        'ds': df_hist['ds'].dt.strftime('%Y-%m-%d').tolist(),
+        'hash_linhas': [str(h) for h in pd.util.hash_pandas_object(df_hist[['ds', 'y']], index=False)],
+    }
+    try:
+        os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+        caminho = _caminho_ultimo_ajuste(config, serie)
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(registro, f)
+        os.replace(temporario, caminho)
+    except Exception as e:
+        print(f"Aviso: Não foi possível salvar os parâmetros do último ajuste: {e}")
+
+
+def _carregar_warm_start(df_hist: pd.DataFrame, config: dict, serie: str):
+    """
+    Retorna os parâmetros do último ajuste se ele puder ser reaproveitado, ou None.
+
+    O ajuste anterior só é reaproveitado quando foi feito com a mesma
+    configuração e para a mesma série (o arquivo é específico de ambas) e quando todos os
+    dias que ele tem em comum com o histórico atual continuam com o mesmo
+    valor, ou seja, apenas dias novos foram acrescentados. Dados alterados
+    retroativamente forçam um ajuste do zero.
+    """
+    try:
+        with open(_caminho_ultimo_ajuste(config, serie), 'r', encoding='utf-8') as f:
+            registro = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    anteriores = dict(zip(registro['ds'], registro['hash_linhas']))
+    atuais = zip(
+        df_hist['ds'].dt.strftime('%Y-%m-%d'),
+        (str(h) for h in pd.util.hash_pandas_object(df_hist[['ds', 'y']], index=False)),
+    )
+    em_comum = 0
+    for ds, hash_linha in atuais:
+        if ds in anteriores:
+            if anteriores[ds] != hash_linha:
+                print("Aviso: Histórico alterado retroativamente. Ajustando o modelo do zero.")
+                return None
+            em_comum += 1
+
+    # Sem sobreposição, o ajuste anterior não diz nada sobre o histórico atual
+    if em_comum == 0:
+        return None
+
+    params = registro['params']
+    for nome in ['delta', 'beta']:
+        params[nome] = np.asarray(params[nome], dtype=float)
+    return params
+
+
+def _config_feriados(df_hist: pd.DataFrame, data_fim, usar_feriados: bool, regiao: str):
+    """
+    Tabela de feriados do primeiro ano do histórico ao ano de 'data_fim' e a
+    configuração usada nas chaves de cache (inclui a assinatura dos feriados).
+
+    Returns:
+        tuple: (config, tabela), com tabela None se os feriados estiverem
+        desligados ou não puderem ser calculados (a previsão segue sem eles).
+    """
+    if not usar_feriados:
+        return MODEL_CONFIG, None
+    try:
+        tabela, assinatura = feriados.tabela_feriados(df_hist['ds'].min().year, pd.Timestamp(data_fim).year, regiao)
+    except Exception as e:
+        print(f"Aviso: Não foi possível montar a tabela de feriados ({e}). Prevendo sem feriados.")
+        return MODEL_CONFIG, None
+    return dict(MODEL_CONFIG, feriados=assinatura), tabela
+
+
+def _remover_arquivo(caminho: str):
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+def run_prophet_forecast(df: pd.DataFrame, periods: int = 180, usar_cache: bool = True, warm_start: bool = True,
+                         serie: str = 'frota', data_referencia=None, usar_feriados: bool = USAR_FERIADOS,
+                         regiao_feriados: str = REGIAO_FERIADOS):
     """
     Roda o modelo Prophet para previsão de fluxo de caixa (coluna 'y').
 
+    Se um modelo já foi treinado com exatamente o mesmo histórico e a mesma
+    configuração, ele é carregado do cache em disco e apenas o 'predict' é executado.
+    Caso contrário, o ajuste parte dos parâmetros do ajuste anterior (warm start)
+    quando o histórico apenas ganhou dias novos, o que reduz as iterações do otimizador.
+
     Args:
         df (pd.DataFrame): DataFrame com colunas 'ds' (datetime) e 'y' (float).
         periods (int): Número de dias para prever no futuro.
+        usar_cache (bool): Reutiliza/salva modelos treinados em MODEL_CACHE_DIR.
+        warm_start (bool): Inicializa o ajuste com os parâmetros do ajuste anterior, quando válido.
+        serie (str): Identifica a série (ex: frota inteira ou uma máquina) para o warm start.
+        data_referencia (date): "Hoje" da previsão (padrão: data atual); treina com os dias anteriores.
+        usar_feriados (bool): Modela os feriados (ver feriados.tabela_feriados).
+        regiao_feriados (str): UF ou município dos feriados regionais (None = apenas nacionais).
 
     Returns:
         pd.DataFrame: DataFrame contendo a previsão ('ds', 'yhat', 'yhat_lower', 'yhat_upper').
@@ -21,7 +253,8 @@ def run_prophet_forecast(df: pd.DataFrame, periods: int = 180):
     
     # CORREÇÃO: Converte a data atual (Python date) para Pandas Timestamp (datetime64[ns])
     # Isso garante que a comparação com a coluna df['ds'] seja válida.
-    today_dt = pd.to_datetime(datetime.now().date()) 
+    data_base = data_referencia or datetime.now().date()
+    today_dt = pd.to_datetime(data_base) 
 
     # 1. Ajustar o DataFrame (Prophet precisa de dados históricos)
     # Utiliza today_dt corrigido para a comparação
@@ -30,33 +263,45 @@ def run_prophet_forecast(df: pd.DataFrame, periods: int = 180):
     if df_hist.empty:
         print("Aviso: Dados históricos insuficientes. Gerando previsão fictícia.")
         # Se não houver dados passados, cria uma linha base fictícia para que o Prophet não falhe
-        base_date = datetime.now().date() - pd.Timedelta(days=1)
+        base_date = data_base - pd.Timedelta(days=1)
         df_hist = pd.DataFrame({'ds': [pd.to_datetime(base_date)], 'y': [0.0]})
 
 
     # 2. Configuração e Treinamento do Modelo
     try:
-        # Configuração do Prophet para extrair o máximo: sazonalidade anual, semanal e feriados (para feriados BR)
-        model = Prophet(
-            yearly_seasonality=True,
-            weekly_seasonality=True,
-            daily_seasonality=False,
-            # Configurações extras de modelo para maior precisão (ex: incerteza)
-            interval_width=0.90 # Intervalo de confiança de 90%
+        # Feriados do histórico e do período previsto (a tabela vem do cache de feriados)
+        config, tabela_feriados = _config_feriados(
+            df_hist, today_dt + pd.Timedelta(days=periods), usar_feriados, regiao_feriados
         )
-        
-        # Adicionar feriados brasileiros como regressores (opcional, mas recomendado para BR)
-        # from prophet.make_holidays import make_holidays_df
-        # holidays = make_holidays_df(year_list=list(range(datetime.now().year, datetime.now().year + 2)), country='BR')
-        # model.add_country_holidays(country_name='BR')
-        
-        model.fit(df_hist)
+        chave = _chave_cache(df_hist, config) if usar_cache else None
+        model = _carregar_modelo_cache(chave) if usar_cache else None
+
+        if model is None:
+            model = Prophet(holidays=tabela_feriados, **MODEL_CONFIG)
+            
+            init = _carregar_warm_start(df_hist, config, serie) if warm_start else None
+            with diagnostico.medir('prophet.fit', dias=len(df_hist), warm_start=init is not None), \
+                    diagnostico.perfilar('prophet_fit'):
+                if init is not None:
+                    print("Ajuste incremental: partindo dos parâmetros do último modelo (warm start).")
+                    model.fit(df_hist, init=init)
+                else:
+                    model.fit(df_hist)
+
+            if warm_start:
+                _salvar_ultimo_ajuste(df_hist, model, config, serie)
+            if usar_cache:
+                _salvar_modelo_cache(chave, model)
+        else:
+            print("Modelo Prophet carregado do cache (histórico inalterado).")
+            diagnostico.contar('cache_modelos.acerto')
 
         # 3. Gerar Datas Futuras
         future = model.make_future_dataframe(periods=periods)
 
         # 4. Previsão
-        forecast = model.predict(future)
+        with diagnostico.medir('prophet.predict', dias=len(future)):
+            forecast = model.predict(future)
         
         # Filtra apenas o futuro para visualização
         # Utiliza today_dt corrigido para a comparação
@@ -67,4 +312,177 @@ def run_prophet_forecast(df: pd.DataFrame, periods: int = 180):
     except Exception as e:
         print(f"Erro ao rodar o modelo Prophet: {e}")
         # Retorna um DataFrame vazio em caso de falha
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
+
+
+def _prever_maquina(maquina: str, df: pd.DataFrame, periods: int, data_referencia, usar_feriados: bool,
+                    regiao_feriados: str):
+    """Executado em um processo do pool: roda a previsão de uma única máquina."""
+    return maquina, run_prophet_forecast(df[['ds', 'y']], periods=periods, serie=f"maquina:{maquina}",
+                                         data_referencia=data_referencia, usar_feriados=usar_feriados,
+                                         regiao_feriados=regiao_feriados)
+
+
+def run_prophet_forecast_por_maquina(series_por_maquina: dict, periods: int = 180, max_workers: int = None,
+                                     data_referencia=None, usar_feriados: bool = USAR_FERIADOS,
+                                     regiao_feriados: str = REGIAO_FERIADOS):
+    """
+    Ajusta um modelo Prophet por máquina, em paralelo (um processo por núcleo).
+
+    Como usa processos, o chamador deve estar protegido por
+    "if __name__ == '__main__':" (exigência do multiprocessing no Windows).
+
+    Args:
+        series_por_maquina (dict): {maquina: DataFrame com 'ds' e 'y'} (ver DatabaseManager.get_prophet_data_por_maquina).
+        periods (int): Número de dias para prever no futuro.
+        max_workers (int): Quantidade de processos (padrão: núcleos disponíveis).
+        data_referencia (date): "Hoje" da previsão (padrão: data atual).
+        usar_feriados, regiao_feriados: Ver run_prophet_forecast.
+
+    Returns:
+        pd.DataFrame: Formato longo com colunas 'maquina', 'ds', 'yhat', 'yhat_lower', 'yhat_upper',
+        incluindo as linhas da soma da frota (maquina = motores_previsao.SERIE_FROTA_TOTAL). Os limites da frota
+        são a soma dos limites das máquinas (intervalo conservador).
+    """
+    if not series_por_maquina:
+        return combinar_previsoes_maquinas([])
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(series_por_maquina)))
+
+    previsoes = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_prever_maquina, maquina, df, periods, data_referencia, usar_feriados, regiao_feriados)
+            for maquina, df in series_por_maquina.items()
+        ]
+        for future in as_completed(futures):
+            try:
+                maquina, forecast = future.result()
+            except Exception as e:
+                print(f"Erro ao rodar o modelo Prophet de uma máquina: {e}")
+                continue
+            if forecast.empty:
+                print(f"Aviso: Sem previsão para a máquina '{maquina}'.")
+                continue
+            previsoes.append(forecast.assign(maquina=maquina))
+
+    return combinar_previsoes_maquinas(previsoes)
+
+
+def _metricas_por_horizonte(df_cv: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calcula MAE, WAPE e cobertura do intervalo para cada horizonte (em dias) do cross_validation.
+
+    WAPE = soma(|erro|) / soma(|y|): o erro relativo ao volume movimentado. No
+    fluxo de caixa diário, y passa perto de zero em muitos dias, e a média dos
+    erros percentuais diários (MAPE) seria dominada por esses dias.
+    'media_abs_y' (média de |y| no horizonte) permite recalcular o WAPE de
+    vários horizontes juntos: soma(mae * n) / soma(media_abs_y * n).
+    """
+    horizonte = (df_cv['ds'] - df_cv['cutoff']).dt.days
+    erro_abs = (df_cv['y'] - df_cv['yhat']).abs()
+    dentro = (df_cv['y'] >= df_cv['yhat_lower']) & (df_cv['y'] <= df_cv['yhat_upper'])
+
+    metricas = pd.DataFrame({
+        'horizonte_dias': horizonte,
+        'mae': erro_abs,
+        'media_abs_y': df_cv['y'].abs(),
+        'cobertura': dentro.astype(float),
+    }).groupby('horizonte_dias', as_index=False).mean()
+    metricas['wape'] = (metricas['mae'] / metricas['media_abs_y']).where(metricas['media_abs_y'] > 0)
+    metricas['n'] = horizonte.value_counts().sort_index().to_numpy()
+    return metricas[['horizonte_dias', 'mae', 'wape', 'cobertura', 'n', 'media_abs_y']]
+
+
+def run_backtest(df: pd.DataFrame, horizonte_dias: int = 180, inicial_dias: int = None, periodo_dias: int = None,
+                 data_referencia=None, usar_cache: bool = True, paralelo: str = 'processes', max_workers: int = None,
+                 usar_feriados: bool = USAR_FERIADOS, regiao_feriados: str = REGIAO_FERIADOS):
+    """
+    Avalia a previsão com origem móvel (cross_validation do Prophet) sobre o histórico.
+
+    O modelo é reajustado em cada data de corte e comparado com o que de fato
+    aconteceu nos 'horizonte_dias' seguintes. Os ajustes dos cortes rodam em
+    paralelo (um processo por núcleo, com paralelo='processes'). O resultado
+    fica em cache para o mesmo histórico e os mesmos parâmetros.
+
+    Como usa processos, o chamador deve estar protegido por
+    "if __name__ == '__main__':" (exigência do multiprocessing no Windows).
+
+    Args:
+        df (pd.DataFrame): DataFrame com 'ds' e 'y' (apenas os dias anteriores à data de referência são usados).
+        horizonte_dias (int): Dias previstos a partir de cada corte.
+        inicial_dias (int): Histórico mínimo antes do primeiro corte (padrão: 3x o horizonte, como no Prophet).
+        periodo_dias (int): Espaçamento entre cortes (padrão: metade do horizonte).
+        data_referencia (date): "Hoje" (padrão: data atual).
+        usar_cache (bool): Reutiliza/salva os resultados em MODEL_CACHE_DIR.
+        paralelo (str): 'processes', 'threads' ou None (sequencial).
+        max_workers (int): Quantidade de processos com paralelo='processes' (padrão: núcleos disponíveis).
+        usar_feriados, regiao_feriados: Ver run_prophet_forecast.
+
+    Returns:
+        pd.DataFrame: Por horizonte, 'horizonte_dias', 'mae', 'wape', 'cobertura', 'n' (previsões
+        avaliadas) e 'media_abs_y' (ver _metricas_por_horizonte).
+    """
+    from prophet.diagnostics import cross_validation
+
+    inicial_dias = inicial_dias or 3 * horizonte_dias
+    periodo_dias = periodo_dias or max(1, horizonte_dias // 2)
+
+    today_dt = pd.to_datetime(data_referencia or datetime.now().date())
+    df_hist = df.loc[df['ds'] < today_dt, ['ds', 'y']].reset_index(drop=True)
+
+    dias_historico = len(df_hist)
+    if dias_historico < inicial_dias + horizonte_dias:
+        print(f"Erro: Histórico insuficiente para o backtest ({dias_historico} dias; "
+              f"são necessários {inicial_dias + horizonte_dias}). Reduza o horizonte ou o período inicial.")
+        return pd.DataFrame()
+
+    # 'metricas' versiona as colunas do resultado: um cache com as colunas antigas não é reaproveitado
+    parametros = {'horizonte_dias': horizonte_dias, 'inicial_dias': inicial_dias, 'periodo_dias': periodo_dias,
+                  'metricas': 'wape'}
+    config, tabela_feriados = _config_feriados(df_hist, df_hist['ds'].max(), usar_feriados, regiao_feriados)
+    chave = _chave_cache(df_hist, dict(config, backtest=parametros))
+    caminho = os.path.join(MODEL_CACHE_DIR, f"backtest_{chave}.json")
+    if usar_cache:
+        try:
+            metricas = pd.read_json(caminho, orient='records')
+            print("Resultado do backtest carregado do cache (histórico inalterado).")
+            return metricas
+        except (OSError, ValueError):
+            pass
+
+    # Com processos, usa um pool próprio para silenciar o cmdstanpy também nos processos filhos
+    pool = ProcessPoolExecutor(max_workers=max_workers, initializer=silenciar_logs_stan) if paralelo == 'processes' else None
+    try:
+        with diagnostico.medir('prophet.backtest', dias=dias_historico, horizonte_dias=horizonte_dias):
+            model = Prophet(holidays=tabela_feriados, **MODEL_CONFIG).fit(df_hist)
+            df_cv = cross_validation(
+                model,
+                horizon=f'{horizonte_dias} days',
+                period=f'{periodo_dias} days',
+                initial=f'{inicial_dias} days',
+                parallel=pool or paralelo,
+                disable_tqdm=True,
+            )
+    except Exception as e:
+        print(f"Erro ao rodar o backtest do Prophet: {e}")
+        return pd.DataFrame()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    metricas = _metricas_por_horizonte(df_cv)
+
+    if usar_cache:
+        try:
+            os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+            temporario = f"{caminho}.{os.getpid()}.tmp"
+            metricas.to_json(temporario, orient='records')
+            os.replace(temporario, caminho)
+            _limpar_cache()
+        except Exception as e:
+            print(f"Aviso: Não foi possível salvar o backtest no cache: {e}")
+
+    return metricas
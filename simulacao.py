@@ -0,0 +1,132 @@
+from datetime import datetime
+
+import numpy as np
+
+# Simulação de Monte Carlo do saldo de caixa: sorteia milhares de trajetórias
+# de receita diária a partir do histórico (bootstrap por dia da semana), subtrai
+# as despesas previstas (determinísticas, já com as recorrências) e acumula o
+# saldo de todas as trajetórias de uma vez em uma matriz (dias x caminhos).
+# Cada dia é uma linha contígua na memória: o sorteio, o cumsum e os percentis
+# por dia percorrem a memória em sequência.
+
+N_CAMINHOS_PADRAO = 10000
+
+# Percentis do saldo reportados por dia
+PERCENTIS_PADRAO = (5, 25, 50, 75, 95)
+
+# Mínimo de dias históricos de um dia da semana para sortear apenas entre eles;
+# abaixo disso o sorteio usa todos os dias do histórico
+MIN_AMOSTRAS_DIA_SEMANA = 8
+
+
+def _historico_receitas(ds, y_receita, hoje):
+    """
+    Receitas diárias do histórico (antes de 'hoje'), a partir do primeiro dia com receita.
+
+    Dias sem lançamento contam como receita zero (dias parados), mas o período
+    anterior ao primeiro lançamento não é amostrado.
+    """
+    passado = ds < hoje
+    ds_hist, receitas_hist = ds[passado], y_receita[passado]
+    com_receita = np.flatnonzero(receitas_hist > 0)
+    if com_receita.size == 0:
+        return ds_hist[:0], receitas_hist[:0]
+    return ds_hist[com_receita[0]:], receitas_hist[com_receita[0]:]
+
+
+def _dia_semana(datas):
+    """Dia da semana (0 = segunda) de datas datetime64[D]."""
+    # 01/01/1970 foi uma quinta-feira (3)
+    return (datas.astype(np.int64) + 3) % 7
+
+
+def simular_receitas(ds_hist, receitas_hist, ds_futuro, n_caminhos, rng, por_dia_semana=True):
+    """
+    Sorteia (com reposição) uma receita histórica para cada dia futuro de cada caminho.
+
+    Returns:
+        np.ndarray: Matriz float64 (dias futuros x n_caminhos).
+    """
+    receitas = np.empty((ds_futuro.size, n_caminhos), dtype=np.float64)
+    if not por_dia_semana:
+        receitas[:] = receitas_hist[rng.integers(0, receitas_hist.size, size=receitas.shape, dtype=np.int32)]
+        return receitas
+
+    semana_hist = _dia_semana(ds_hist)
+    semana_futuro = _dia_semana(ds_futuro)
+    for dia in range(7):
+        linhas = np.flatnonzero(semana_futuro == dia)
+        if linhas.size == 0:
+            continue
+        amostras = receitas_hist[semana_hist == dia]
+        if amostras.size < MIN_AMOSTRAS_DIA_SEMANA:
+            amostras = receitas_hist
+        sorteados = rng.integers(0, amostras.size, size=(linhas.size, n_caminhos), dtype=np.int32)
+        receitas[linhas] = amostras[sorteados]
+    return receitas
+
+
+def simular_saldo(df_fluxo, hoje=None, saldo_inicial=0.0, n_caminhos=N_CAMINHOS_PADRAO,
+                  percentis=PERCENTIS_PADRAO, seed=None, por_dia_semana=True):
+    """
+    Simula o saldo de caixa diário a partir de 'hoje'.
+
+    Args:
+        df_fluxo (pd.DataFrame): Série de get_prophet_data ('ds', 'y_receita', 'y_despesa').
+        hoje (date): Primeiro dia simulado (padrão: data atual).
+        saldo_inicial (float): Saldo em caixa no início de 'hoje'.
+        n_caminhos (int): Quantidade de trajetórias sorteadas.
+        percentis (Sequence[int]): Percentis do saldo reportados por dia.
+        seed (int): Semente do gerador aleatório (resultado reproduzível).
+        por_dia_semana (bool): Sorteia cada dia apenas entre os mesmos dias da
+            semana do histórico (ex: sábados entre sábados).
+
+    Returns:
+        tuple[pd.DataFrame, dict]: Por dia, 'ds', 'saldo_p<N>' de cada percentil,
+        'saldo_medio' e 'prob_saldo_negativo'; e um resumo do período.
+    """
+    # pandas só é necessário para montar o resultado
+    import pandas as pd
+
+    hoje = np.datetime64(hoje or datetime.now().date(), 'D')
+    ds = df_fluxo['ds'].to_numpy().astype('datetime64[D]')
+    y_receita = df_fluxo['y_receita'].to_numpy(dtype=np.float64)
+    y_despesa = df_fluxo['y_despesa'].to_numpy(dtype=np.float64)
+
+    futuro = ds >= hoje
+    ds_futuro = ds[futuro]
+    despesas_futuras = y_despesa[futuro]
+
+    rng = np.random.default_rng(seed)
+    ds_hist, receitas_hist = _historico_receitas(ds, y_receita, hoje)
+    if receitas_hist.size > 0:
+        fluxo = simular_receitas(ds_hist, receitas_hist, ds_futuro, n_caminhos, rng, por_dia_semana)
+    else:
+        # Sem histórico para sortear: usa a receita projetada (média/padrão) em todos os caminhos
+        print("Aviso: Sem receitas históricas; a simulação usa a receita média projetada (sem variação).")
+        fluxo = np.repeat(y_receita[futuro][:, None], n_caminhos, axis=1)
+
+    # Saldo = saldo inicial + soma acumulada (ao longo dos dias) de (receita - despesa),
+    # in-place na mesma matriz
+    fluxo -= despesas_futuras[:, None]
+    saldos = np.cumsum(fluxo, axis=0, out=fluxo)
+    saldos += saldo_inicial
+
+    negativo = saldos < 0
+    valores_percentis = np.percentile(saldos, percentis, axis=1)
+
+    df_saldo = pd.DataFrame({'ds': ds_futuro.astype('datetime64[ns]')})
+    for p, valores in zip(percentis, valores_percentis):
+        df_saldo[f'saldo_p{p}'] = valores
+    df_saldo['saldo_medio'] = saldos.mean(axis=1)
+    df_saldo['prob_saldo_negativo'] = negativo.mean(axis=1)
+
+    resumo = {
+        'n_caminhos': n_caminhos,
+        'dias': int(ds_futuro.size),
+        'saldo_inicial': float(saldo_inicial),
+        # Chance de o saldo ficar negativo em pelo menos um dia do período
+        'prob_negativo_no_periodo': float(negativo.any(axis=0).mean()) if ds_futuro.size else 0.0,
+        'saldo_final': {f'p{p}': float(valores[-1]) for p, valores in zip(percentis, valores_percentis)} if ds_futuro.size else {},
+    }
+    return df_saldo, resumo
@@ -0,0 +1,147 @@
+import customtkinter as ctk
+
+
+class TabelaVirtual(ctk.CTkFrame):
+    """
+    Tabela virtualizada: cria apenas um conjunto fixo de linhas de widgets
+    (as visíveis) e troca o texto delas conforme a rolagem.
+
+    O custo de exibição e de rolagem não depende da quantidade de linhas,
+    então horizontes de milhares de dias continuam leves.
+    """
+
+    def __init__(self, master, colunas, titulo=None, linhas_visiveis=15,
+                 fonte_cabecalho=None, fonte_linha=None, fonte_destaque=None,
+                 cor_destaque="red", **kwargs):
+        """
+        Args:
+            master: Widget pai.
+            colunas (list[tuple[str, str]]): (título, alinhamento 'w'/'e') de cada coluna.
+            titulo (str): Texto exibido acima da tabela (opcional).
+            linhas_visiveis (int): Quantidade de linhas de widgets criadas.
+            fonte_cabecalho, fonte_linha: Fontes do cabeçalho e das linhas.
+            fonte_destaque: Fonte da coluna de destaque (opcional).
+            cor_destaque (str): Cor usada nas células destacadas.
+        """
+        super().__init__(master, **kwargs)
+
+        self.colunas = colunas
+        self.linhas_visiveis = linhas_visiveis
+        self.cor_destaque = cor_destaque
+
+        # Dados atuais: uma sequência de textos por coluna + máscara de destaque
+        self._textos = [[] for _ in colunas]
+        self._destaques = []
+        self._coluna_destaque = None
+        self._total = 0
+        self._inicio = 0 # Índice da primeira linha visível
+
+        linha_grid = 0
+        if titulo:
+            ctk.CTkLabel(self, text=titulo, **self._opcoes_fonte(fonte_cabecalho)).grid(
+                row=linha_grid, column=0, columnspan=len(colunas) + 1, padx=10, pady=(5, 0)
+            )
+            linha_grid += 1
+
+        # Cabeçalho
+        for i, (texto, _) in enumerate(colunas):
+            ctk.CTkLabel(self, text=texto, **self._opcoes_fonte(fonte_cabecalho)).grid(
+                row=linha_grid, column=i, padx=10, pady=5, sticky="ew"
+            )
+            self.grid_columnconfigure(i, weight=1)
+        linha_grid += 1
+
+        # Conjunto fixo de células reaproveitadas durante a rolagem
+        self._celulas = []
+        for r in range(linhas_visiveis):
+            linha = []
+            for i, (_, alinhamento) in enumerate(colunas):
+                celula = ctk.CTkLabel(self, text="", anchor=alinhamento, **self._opcoes_fonte(fonte_linha))
+                celula.grid(row=linha_grid + r, column=i, padx=10, pady=2, sticky="ew")
+                linha.append(celula)
+            self._celulas.append(linha)
+
+        self._fonte_destaque = fonte_destaque or fonte_linha
+        self._cor_padrao = self._celulas[0][0].cget("text_color") if self._celulas else None
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._ao_rolar)
+        self.scrollbar.grid(row=linha_grid, column=len(colunas), rowspan=linhas_visiveis, sticky="ns", pady=2)
+
+        # Rolagem pela roda do mouse (Windows/macOS: <MouseWheel>; Linux: Button-4/5)
+        for widget in [self] + [c for linha in self._celulas for c in linha]:
+            widget.bind("<MouseWheel>", self._ao_rolar_roda, add="+")
+            widget.bind("<Button-4>", lambda e: self.rolar(-3), add="+")
+            widget.bind("<Button-5>", lambda e: self.rolar(3), add="+")
+
+        self._atualizar_scrollbar()
+
+    @staticmethod
+    def _opcoes_fonte(fonte):
+        """Repassa a fonte apenas se informada (mantém a fonte padrão do tema)."""
+        return {'font': fonte} if fonte is not None else {}
+
+    def definir_dados(self, textos_colunas, destaques=None, coluna_destaque=None):
+        """
+        Substitui os dados exibidos.
+
+        Args:
+            textos_colunas (list[Sequence[str]]): Textos já formatados, um array/lista por coluna.
+            destaques (Sequence[bool]): Linhas cuja 'coluna_destaque' recebe a cor de destaque.
+            coluna_destaque (int): Índice da coluna destacada.
+        """
+        self._textos = list(textos_colunas)
+        self._total = len(self._textos[0]) if self._textos else 0
+        self._destaques = destaques if destaques is not None else []
+        self._coluna_destaque = coluna_destaque
+        self._inicio = 0
+        self._renderizar()
+
+    def limpar(self):
+        self.definir_dados([[] for _ in self.colunas])
+
+    def rolar(self, linhas):
+        """Rola a tabela 'linhas' linhas (negativo = para cima)."""
+        self._ir_para(self._inicio + linhas)
+
+    def _ir_para(self, inicio):
+        maximo = max(0, self._total - self.linhas_visiveis)
+        inicio = min(max(0, int(inicio)), maximo)
+        if inicio != self._inicio:
+            self._inicio = inicio
+            self._renderizar()
+
+    def _ao_rolar(self, acao, valor, unidade=None):
+        """Comando da scrollbar (mesmo protocolo do yview do Tk)."""
+        if acao == "moveto":
+            self._ir_para(round(float(valor) * self._total))
+        elif acao == "scroll":
+            passo = self.linhas_visiveis if unidade == "pages" else 1
+            self.rolar(int(valor) * passo)
+
+    def _ao_rolar_roda(self, event):
+        # No Windows delta vem em múltiplos de 120; no macOS em unidades pequenas
+        passo = -int(event.delta / 120) if abs(event.delta) >= 120 else -int(event.delta)
+        self.rolar(passo * 3)
+
+    def _renderizar(self):
+        """Atualiza apenas as células visíveis."""
+        for r, linha in enumerate(self._celulas):
+            indice = self._inicio + r
+            visivel = indice < self._total
+            destacar = visivel and len(self._destaques) > indice and bool(self._destaques[indice])
+            for i, celula in enumerate(linha):
+                texto = self._textos[i][indice] if visivel else ""
+                if i == self._coluna_destaque:
+                    opcoes = {'text_color': self.cor_destaque if destacar else self._cor_padrao}
+                    if self._fonte_destaque is not None:
+                        opcoes['font'] = self._fonte_destaque
+                    celula.configure(text=texto, **opcoes)
+                else:
+                    celula.configure(text=texto)
+        self._atualizar_scrollbar()
+
+    def _atualizar_scrollbar(self):
+        if self._total <= self.linhas_visiveis:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self._inicio / self._total, (self._inicio + self.linhas_visiveis) / self._total)
@@ -0,0 +1,210 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+from database import (COLUNAS_FLUXO_ENTRADAS, COLUNAS_LEDGER_ENTRADAS, MAQUINAS_PADRAO, SCHEMA_VERSION,
+                      DatabaseManager)
+
+
+def _fluxo_diario(db_manager):
+    """daily_cashflow sem os dias zerados (os triggers mantêm a linha; a reconstrução não)."""
+    linhas = db_manager.conn.execute(
+        'SELECT dia, receita, n_receitas, despesa FROM daily_cashflow ORDER BY dia'
+    ).fetchall()
+    return [(dia, round(receita, 6), n_receitas, round(despesa, 6))
+            for dia, receita, n_receitas, despesa in linhas
+            if n_receitas != 0 or abs(receita) > 1e-9 or abs(despesa) > 1e-9]
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    db_manager = DatabaseManager(str(tmp_path / 'teste.db'), ledger_em_memoria=False)
+    yield db_manager
+    db_manager.close()
+
+
+def test_fluxo_diario_acompanha_update_e_delete(db_manager):
+    db_manager.insert_entradas_many([
+        ('Escavadeira', 1000.0, '01/03/2024'),
+        ('Escavadeira', 250.0, '01/03/2024'),
+        ('Caminhão', 400.0, '02/03/2024'),
+        ('Caminhão', 90.0, '05/03/2024'),
+    ])
+    db_manager.insert_saidas_many([
+        ('Pneus', 300.0, '01/03/2024', 0, 'N/A'),
+        ('Óleo', 80.0, '03/03/2024', 0, 'N/A'),
+        ('Aluguel', 2000.0, '01/03/2024', 1, 'Mensal'),
+    ])
+
+    with db_manager.transacao() as cursor:
+        # Entradas: valor, data, tipo, coluna fora do fluxo (maquina_id) e remoção
+        cursor.execute("UPDATE entradas SET valor = 1100.0 WHERE valor = 1000.0")
+        cursor.execute("UPDATE entradas SET data_registro_iso = '2024-03-04' WHERE valor = 400.0")
+        cursor.execute("UPDATE entradas SET tipo = 'ajuste' WHERE valor = 90.0")
+        cursor.execute("UPDATE entradas SET maquina_id = maquina_id")
+        cursor.execute("DELETE FROM entradas WHERE valor = 250.0")
+        # Despesas: valor, data, vira recorrente, deixa de ser recorrente e remoção
+        cursor.execute("UPDATE despesas SET valor = 350.0, data_saida_iso = '2024-03-02' WHERE titulo = 'Pneus'")
+        cursor.execute("UPDATE despesas SET recorrente = 1, frequencia = 'Mensal' WHERE titulo = 'Óleo'")
+        cursor.execute("UPDATE despesas SET recorrente = 0, frequencia = 'N/A' WHERE titulo = 'Aluguel'")
+        cursor.execute("DELETE FROM despesas WHERE titulo = 'Óleo'")
+
+    mantido_por_triggers = _fluxo_diario(db_manager)
+    db_manager.rebuild_daily_cashflow()
+    assert mantido_por_triggers == _fluxo_diario(db_manager)
+    assert mantido_por_triggers == [
+        ('2024-03-01', 1100.0, 1, 2000.0),
+        ('2024-03-02', 0.0, 0, 350.0),
+        ('2024-03-04', 400.0, 1, 0.0),
+    ]
+
+
+@pytest.fixture
+def contador_calculos(db_manager, monkeypatch):
+    """Conta quantas vezes get_prophet_data recalcula (em vez de responder do cache)."""
+    chamadas = []
+    montar = db_manager._montar_prophet_data
+
+    def montar_contando(*args, **kwargs):
+        chamadas.append(args)
+        return montar(*args, **kwargs)
+
+    monkeypatch.setattr(db_manager, '_montar_prophet_data', montar_contando)
+    return chamadas
+
+
+def _prophet_data(db_manager):
+    return db_manager.get_prophet_data(horizonte_dias=30, data_referencia=date(2024, 3, 15))
+
+
+def test_cache_de_consultas_reaproveita_resultado(db_manager, contador_calculos):
+    db_manager.insert_entrada('Escavadeira', 500.0, '01/03/2024')
+    primeira = _prophet_data(db_manager)
+    primeira['y'] = 0.0 # O chamador recebe uma cópia: alterar não afeta o cache
+    segunda = _prophet_data(db_manager)
+
+    assert len(contador_calculos) == 1
+    assert segunda['y_receita'].sum() > 0 and segunda['y'].ne(0).any()
+
+
+def test_cache_invalidado_por_gravacao_do_proprio_objeto(db_manager, contador_calculos):
+    antes = _prophet_data(db_manager)
+    db_manager.insert_entrada('Escavadeira', 500.0, '01/03/2024')
+    depois = _prophet_data(db_manager)
+
+    dia = depois['ds'] == '2024-03-01'
+    assert len(contador_calculos) == 2
+    assert antes.loc[dia, 'y_receita'].item() == 0.0
+    assert depois.loc[dia, 'y_receita'].item() == 500.0
+
+
+def test_cache_invalidado_por_gravacao_de_outra_conexao(db_manager, contador_calculos):
+    antes = _prophet_data(db_manager)
+    _prophet_data(db_manager)
+    assert len(contador_calculos) == 1
+
+    externa = sqlite3.connect(db_manager.db_name)
+    try:
+        externa.execute(
+            "INSERT INTO entradas (maquina, tipo, valor, data_registro, data_registro_iso) "
+            "VALUES ('Caminhão', 'hora_trabalhada', 700.0, '02/03/2024', '2024-03-02')"
+        )
+        externa.commit()
+    finally:
+        externa.close()
+
+    depois = _prophet_data(db_manager)
+    assert len(contador_calculos) == 2
+    dia = depois['ds'] == '2024-03-02'
+    assert antes.loc[dia, 'y_receita'].item() == 0.0
+    assert depois.loc[dia, 'y_receita'].item() == 700.0
+
+
+def _criar_banco_v3(caminho):
+    """Banco no esquema 3: sem 'maquinas'/maquina_id e com os triggers de UPDATE em todas as colunas."""
+    conn = sqlite3.connect(caminho)
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE entradas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, maquina TEXT NOT NULL, tipo TEXT NOT NULL,
+            valor REAL NOT NULL, data_registro TEXT NOT NULL, data_registro_iso TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE despesas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, titulo TEXT NOT NULL, valor REAL NOT NULL,
+            data_saida TEXT NOT NULL, recorrente INTEGER NOT NULL, frequencia TEXT, data_saida_iso TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE daily_cashflow (
+            dia TEXT PRIMARY KEY, receita REAL NOT NULL DEFAULT 0,
+            n_receitas INTEGER NOT NULL DEFAULT 0, despesa REAL NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE TABLE ledger_versao (id INTEGER PRIMARY KEY CHECK (id = 1), versao INTEGER NOT NULL)')
+    cursor.execute('INSERT INTO ledger_versao (id, versao) VALUES (1, 0)')
+    DatabaseManager._criar_triggers_fluxo_diario(cursor)
+    DatabaseManager._criar_triggers_versao_ledger(cursor)
+    # Na versão 3, os triggers de UPDATE de entradas disparavam em qualquer coluna
+    for nome, sql in cursor.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_entradas_%update%'"
+    ).fetchall():
+        cursor.execute(f'DROP TRIGGER {nome}')
+        cursor.execute(sql.replace(f'UPDATE OF {COLUNAS_FLUXO_ENTRADAS} ON', 'UPDATE ON')
+                       .replace(f'UPDATE OF {COLUNAS_LEDGER_ENTRADAS} ON', 'UPDATE ON'))
+
+    cursor.executemany(
+        "INSERT INTO entradas (maquina, tipo, valor, data_registro, data_registro_iso) VALUES (?, 'hora_trabalhada', ?, ?, ?)",
+        [('Escavadeira', 1000.0, '01/03/2024', '2024-03-01'), ('Caminhão', 400.0, '01/03/2024', '2024-03-01'),
+         ('Escavadeira', 250.0, '02/03/2024', '2024-03-02'), ('Guindaste', 900.0, '03/03/2024', '2024-03-03')],
+    )
+    cursor.execute("INSERT INTO despesas (titulo, valor, data_saida, recorrente, frequencia, data_saida_iso) "
+                   "VALUES ('Pneus', 300.0, '02/03/2024', 0, 'N/A', '2024-03-02')")
+    cursor.execute('PRAGMA user_version = 3')
+    conn.commit()
+    conn.close()
+
+
+def test_migracao_v4_preenche_maquina_id_sem_alterar_agregados(tmp_path):
+    caminho = str(tmp_path / 'v3.db')
+    _criar_banco_v3(caminho)
+    conn = sqlite3.connect(caminho)
+    fluxo_antes = conn.execute('SELECT * FROM daily_cashflow ORDER BY dia').fetchall()
+    versao_antes = conn.execute('SELECT versao FROM ledger_versao').fetchone()[0]
+    conn.close()
+
+    db_manager = DatabaseManager(caminho, ledger_em_memoria=False)
+    try:
+        conn = db_manager.conn
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+        vinculos = conn.execute('''
+            SELECT entradas.maquina, maquinas.nome FROM entradas
+            LEFT JOIN maquinas ON maquinas.id = entradas.maquina_id
+        ''').fetchall()
+        assert all(maquina == nome for maquina, nome in vinculos)
+        # Apenas as máquinas usadas nas entradas (sem a frota padrão)
+        assert [nome for _, nome in db_manager.listar_maquinas()] == ['Caminhão', 'Escavadeira', 'Guindaste']
+        assert conn.execute('SELECT * FROM daily_cashflow ORDER BY dia').fetchall() == fluxo_antes
+        assert conn.execute('SELECT versao FROM ledger_versao').fetchone()[0] == versao_antes
+
+        # Os triggers recriados ignoram maquina_id, mas continuam acompanhando o valor
+        conn.execute('UPDATE entradas SET maquina_id = maquina_id')
+        assert conn.execute('SELECT versao FROM ledger_versao').fetchone()[0] == versao_antes
+        conn.execute("UPDATE entradas SET valor = 1100.0 WHERE valor = 1000.0")
+        assert conn.execute('SELECT versao FROM ledger_versao').fetchone()[0] == versao_antes + 1
+        assert _fluxo_diario(db_manager)[0] == ('2024-03-01', 1500.0, 2, 0.0)
+    finally:
+        db_manager.close()
+
+
+def test_banco_novo_sem_frota_padrao(tmp_path):
+    db_manager = DatabaseManager(str(tmp_path / 'novo.db'), ledger_em_memoria=False)
+    try:
+        assert db_manager.listar_maquinas() == []
+        db_manager.cadastrar_frota_padrao()
+        db_manager.cadastrar_frota_padrao() # Só cadastra com o cadastro vazio
+        assert sorted(nome for _, nome in db_manager.listar_maquinas()) == sorted(MAQUINAS_PADRAO)
+    finally:
+        db_manager.close()
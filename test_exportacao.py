@@ -0,0 +1,88 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from database import DatabaseManager
+from exportacao import exportar_ledger
+from importacao import importar_arquivo
+
+INICIO = date(2024, 1, 1)
+FIM = date(2024, 12, 31)
+
+
+@pytest.fixture
+def db_origem(tmp_path):
+    db_manager = DatabaseManager(str(tmp_path / 'origem.db'), ledger_em_memoria=False)
+    db_manager.insert_entradas_many([
+        ('Escavadeira', 1200.0, '15/11/2023'),
+        ('Escavadeira', 800.0, '10/02/2024'),
+        ('Caminhão', 450.0, '29/02/2024'),
+        ('Caminhão', 450.0, '29/02/2024'), # Repetida de propósito
+        ('Caminhão', 300.0, '20/12/2024'),
+    ])
+    db_manager.insert_saidas_many([
+        ('Aluguel', 3000.0, '31/01/2022', 1, 'Mensal'), # Antes do intervalo, com fim de mês ajustado
+        ('Seguro', 5000.0, '29/02/2020', 1, 'Anual'), # Antes do intervalo, bissexto
+        ('Licença', 150.0, '30/11/2023', 1, 'Trimestral'), # Antes do intervalo
+        ('Revisão', 700.0, '31/03/2024', 1, 'Semestral'), # Dentro do intervalo
+        ('Leasing', 900.0, '05/01/2025', 1, 'Mensal'), # Depois do intervalo
+        ('Pneus', 2500.0, '10/01/2024', 0, 'N/A'),
+        ('Óleo', 80.0, '20/12/2023', 0, 'N/A'),
+    ])
+    yield db_manager
+    db_manager.close()
+
+
+def _exportar_e_importar(db_origem, tmp_path, formato, data_inicio):
+    caminho = str(tmp_path / f'ledger.{formato}')
+    exportar_ledger(db_origem, caminho, data_inicio=data_inicio, data_fim=FIM,
+                    expandir_recorrentes=True, tamanho_lote=2)
+    if formato == 'parquet':
+        # A importação lê CSV: converte o Parquet exportado sem alterar os valores
+        csv_convertido = str(tmp_path / 'ledger_parquet.csv')
+        pd.read_parquet(caminho).to_csv(csv_convertido, index=False)
+        caminho = csv_convertido
+
+    db_destino = DatabaseManager(str(tmp_path / 'destino.db'), ledger_em_memoria=False)
+    resumo = importar_arquivo(db_destino, caminho)
+    return db_destino, resumo
+
+
+def _contratos(db_manager):
+    return sorted(db_manager.conn.execute(
+        'SELECT titulo, valor, data_saida_iso, frequencia FROM despesas WHERE recorrente = 1'
+    ).fetchall())
+
+
+def _fluxo(db_manager):
+    df = db_manager.get_prophet_data(horizonte_dias=1, data_referencia=date(2025, 1, 1), anos_historico=2,
+                                     usar_cache=False)
+    periodo = df[(df['ds'] >= pd.Timestamp(INICIO)) & (df['ds'] <= pd.Timestamp(FIM))]
+    return periodo[['ds', 'y_receita', 'y_despesa']].reset_index(drop=True)
+
+
+@pytest.mark.parametrize('formato', ['csv', 'parquet'])
+def test_ida_e_volta_sem_filtro(db_origem, tmp_path, formato):
+    db_destino, resumo = _exportar_e_importar(db_origem, tmp_path, formato, None)
+    try:
+        assert resumo['entradas'] == 5 and resumo['despesas'] == 6 # O Leasing começa depois de FIM
+        assert _contratos(db_destino) == [c for c in _contratos(db_origem) if c[0] != 'Leasing']
+        pd.testing.assert_frame_equal(_fluxo(db_destino), _fluxo(db_origem))
+    finally:
+        db_destino.close()
+
+
+@pytest.mark.parametrize('formato', ['csv', 'parquet'])
+def test_ida_e_volta_com_filtro_de_datas(db_origem, tmp_path, formato):
+    db_destino, resumo = _exportar_e_importar(db_origem, tmp_path, formato, INICIO)
+    try:
+        # Os contratos iniciados antes de INICIO voltam com a data original
+        assert _contratos(db_destino) == [c for c in _contratos(db_origem) if c[0] != 'Leasing']
+        nao_recorrentes = db_destino.conn.execute(
+            'SELECT titulo FROM despesas WHERE recorrente = 0').fetchall()
+        assert nao_recorrentes == [('Pneus',)]
+        assert resumo['entradas'] == 4
+        pd.testing.assert_frame_equal(_fluxo(db_destino), _fluxo(db_origem))
+    finally:
+        db_destino.close()
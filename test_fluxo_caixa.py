@@ -0,0 +1,101 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+from dateutil.relativedelta import relativedelta
+
+from database import DatabaseManager
+from fluxo_caixa import FREQUENCIA_MESES, expandir_recorrencias
+
+
+def _ocorrencias_referencia(data_inicial, valor, frequencia, start_date, end_date):
+    """Implementação antiga (laço com relativedelta), usada como referência."""
+    ocorrencias = []
+    n = 0
+    while True:
+        data = data_inicial + relativedelta(months=n * FREQUENCIA_MESES[frequencia])
+        if data > end_date:
+            return ocorrencias
+        if data >= start_date:
+            ocorrencias.append((data, valor))
+        n += 1
+
+
+def _expandir(datas, valores, frequencias, start_date, end_date):
+    datas_ocorrencias, valores_ocorrencias = expandir_recorrencias(datas, valores, frequencias, start_date, end_date)
+    return sorted(zip(datas_ocorrencias.astype(object), valores_ocorrencias.tolist()))
+
+
+@pytest.mark.parametrize('data_inicial, frequencia, start_date, end_date', [
+    (date(2023, 1, 31), 'Mensal', date(2023, 1, 1), date(2024, 12, 31)), # 31 -> fev (28 e 29 dias)
+    (date(2024, 2, 29), 'Anual', date(2024, 1, 1), date(2032, 12, 31)), # bissexto
+    (date(2023, 8, 31), 'Semestral', date(2023, 1, 1), date(2026, 12, 31)), # 31/08 -> 28/02, 29/02
+    (date(2023, 11, 30), 'Trimestral', date(2024, 2, 29), date(2025, 3, 1)), # limites no dia ajustado
+    (date(2020, 3, 31), 'Mensal', date(2024, 2, 15), date(2024, 5, 30)), # início muito antes do intervalo
+    (date(2025, 1, 15), 'Mensal', date(2024, 1, 1), date(2024, 12, 31)), # começa depois do intervalo
+])
+def test_casos_de_fim_de_mes(data_inicial, frequencia, start_date, end_date):
+    esperado = _ocorrencias_referencia(data_inicial, 100.0, frequencia, start_date, end_date)
+    assert _expandir([data_inicial], [100.0], [frequencia], start_date, end_date) == esperado
+
+
+def test_aleatorio_contra_relativedelta():
+    rng = np.random.default_rng(0)
+    frequencias_validas = list(FREQUENCIA_MESES)
+    base = np.datetime64('2018-01-01')
+    for _ in range(300):
+        n = int(rng.integers(1, 6))
+        datas = [(base + int(d)).astype(object) for d in rng.integers(0, 3000, n)]
+        valores = rng.uniform(1, 1000, n).round(2).tolist()
+        frequencias = [frequencias_validas[i] for i in rng.integers(0, len(frequencias_validas), n)]
+        start_date = (base + int(rng.integers(0, 3000))).astype(object)
+        end_date = start_date + relativedelta(days=int(rng.integers(0, 1500)))
+
+        esperado = sorted(
+            ocorrencia
+            for data, valor, frequencia in zip(datas, valores, frequencias)
+            for ocorrencia in _ocorrencias_referencia(data, valor, frequencia, start_date, end_date)
+        )
+        assert _expandir(datas, valores, frequencias, start_date, end_date) == esperado
+
+
+def test_frequencia_desconhecida_e_ignorada():
+    assert _expandir([date(2024, 1, 1)], [50.0], ['N/A'], date(2024, 1, 1), date(2024, 12, 31)) == []
+
+
+def test_prophet_data_ledger_igual_ao_sqlite(tmp_path):
+    caminho = str(tmp_path / 'teste.db')
+    hoje = date(2024, 3, 15)
+
+    db_manager = DatabaseManager(caminho)
+    try:
+        db_manager.insert_entradas_many([
+            ('Escavadeira', 1200.0, '01/06/2023'),
+            ('Escavadeira', 800.0, '01/06/2023'),
+            ('Retroescavadeira', 950.5, '29/02/2024'),
+            ('Retroescavadeira', 400.0, '20/03/2024'),
+        ])
+        db_manager.insert_saidas_many([
+            ('Aluguel', 3000.0, '31/01/2023', 1, 'Mensal'),
+            ('Seguro', 5000.0, '29/02/2020', 1, 'Anual'),
+            ('Revisão', 700.0, '31/08/2023', 1, 'Semestral'),
+            ('Pneus', 2500.0, '10/01/2024', 0, 'N/A'),
+        ])
+        # Carrega o ledger e grava depois, para cobrir também a atualização incremental
+        db_manager.carregar_ledger()
+        db_manager.insert_entrada('Escavadeira', 300.0, '01/03/2024')
+        db_manager.insert_saida('Licença', 150.0, '30/11/2023', 1, 'Trimestral')
+
+        df_ledger = db_manager.get_prophet_data(horizonte_dias=180, data_referencia=hoje, usar_cache=False)
+    finally:
+        db_manager.close()
+
+    db_sql = DatabaseManager(caminho, ledger_em_memoria=False)
+    try:
+        df_sql = db_sql.get_prophet_data(horizonte_dias=180, data_referencia=hoje, usar_cache=False)
+    finally:
+        db_sql.close()
+
+    assert not df_ledger.empty
+    pd.testing.assert_frame_equal(df_ledger, df_sql)
@@ -0,0 +1,125 @@
+import math
+from collections import Counter
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from database import DatabaseManager
+from exportacao import exportar_ledger
+from importacao import _converter_datas, _converter_valores, _filtrar_repetidas, importar_arquivo
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('1.500', 1500.0), # Pontos de milhar sem decimais
+    ('-2.000', -2000.0),
+    ('+1.500', 1500.0),
+    ('1.234.567', 1234567.0),
+    ('R$ 1.234,56', 1234.56),
+    ('10.000,00', 10000.0),
+    ('1,5', 1.5),
+    ('-1234.56', -1234.56), # Ponto decimal (OFX, planilhas em inglês)
+    ('1500.00', 1500.0),
+    ('12.5', 12.5),
+    ('0.500', 0.5), # Zero à esquerda não é agrupamento de milhar
+    ('1.23.456', None),
+    ('abc', None),
+    ('', None),
+])
+def test_converter_valores(texto, esperado):
+    valor = _converter_valores(pd.Series([texto], dtype=object)).iloc[0]
+    if esperado is None:
+        assert math.isnan(valor)
+    else:
+        assert valor == esperado
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('29/02/2024', date(2024, 2, 29)),
+    ('2024-03-01', date(2024, 3, 1)),
+    ('20240315', date(2024, 3, 15)), # OFX
+    ('31/02/2024', None),
+    ('2023-02-29', None),
+    ('15/13/2024', None),
+    ('ontem', None),
+    ('', None),
+])
+def test_converter_datas(texto, esperado):
+    data = _converter_datas(pd.Series([texto], dtype=object)).iloc[0]
+    if esperado is None:
+        assert pd.isna(data)
+    else:
+        assert data.date() == esperado
+
+
+def _linhas(*chaves):
+    return pd.DataFrame(chaves, columns=['data_iso', 'nome', 'valor'])
+
+
+def test_filtrar_repetidas_compara_multiconjuntos():
+    linhas = _linhas(
+        ('2024-03-01', 'Escavadeira', 100.0),
+        ('2024-03-01', 'Escavadeira', 100.0), # Duas iguais no arquivo, uma no banco
+        ('2024-03-01', 'Escavadeira', 100.004), # Mesmos centavos
+        ('2024-03-01', 'Caminhão', 100.0),
+    )
+    existentes = Counter({('2024-03-01', 'Escavadeira', 10000): 1})
+    gravadas = Counter()
+
+    novas, repetidas = _filtrar_repetidas(linhas, existentes, gravadas)
+
+    assert (novas, repetidas) == ([1, 2, 3], 1)
+    assert gravadas == Counter({('2024-03-01', 'Escavadeira', 10000): 2, ('2024-03-01', 'Caminhão', 10000): 1})
+
+
+def test_filtrar_repetidas_desconta_blocos_anteriores():
+    # O banco já tem as 2 linhas gravadas por esta importação em blocos anteriores (e nenhuma outra)
+    chave = ('2024-03-01', 'Escavadeira', 10000)
+    novas, repetidas = _filtrar_repetidas(_linhas(('2024-03-01', 'Escavadeira', 100.0)),
+                                          Counter({chave: 2}), Counter({chave: 2}))
+    assert (novas, repetidas) == ([0], 0)
+
+
+def test_importar_conta_ocorrencias_expandidas_a_parte(tmp_path):
+    origem = DatabaseManager(str(tmp_path / 'origem.db'), ledger_em_memoria=False)
+    try:
+        origem.insert_saidas_many([('Aluguel', 3000.0, '31/01/2024', 1, 'Mensal'),
+                                   ('Pneus', 2500.0, '10/01/2024', 0, 'N/A')])
+        caminho = str(tmp_path / 'ledger.csv')
+        exportar_ledger(origem, caminho, data_fim=date(2024, 6, 30), expandir_recorrentes=True)
+    finally:
+        origem.close()
+
+    with open(caminho, 'a', encoding='utf-8') as f:
+        f.write('despesa,,Óleo,,80,31/02/2024,0,N/A,\n') # Data inválida
+
+    destino = DatabaseManager(str(tmp_path / 'destino.db'), ledger_em_memoria=False)
+    try:
+        resumo = importar_arquivo(destino, caminho)
+    finally:
+        destino.close()
+
+    assert resumo['despesas'] == 2
+    assert resumo['ocorrencias_expandidas'] == 5 # fev a jun
+    assert resumo['invalidas'] == 1
+    assert [motivo for _, motivo in resumo['linhas_invalidas']] == ['data inválida']
+
+
+def test_bloco_gravado_em_uma_transacao(tmp_path, monkeypatch):
+    caminho = tmp_path / 'extrato.csv'
+    caminho.write_text('data;valor;descricao\n01/03/2024;1.500;Escavadeira\n02/03/2024;-300,00;Pneus\n',
+                       encoding='utf-8')
+    db_manager = DatabaseManager(str(tmp_path / 'destino.db'), ledger_em_memoria=False)
+    try:
+        # Falha ao gravar as despesas: as entradas do mesmo bloco também são desfeitas
+        monkeypatch.setattr(db_manager, 'insert_saidas_many', lambda registros: 0)
+        with pytest.raises(RuntimeError):
+            importar_arquivo(db_manager, str(caminho))
+        assert db_manager.conn.execute('SELECT COUNT(*) FROM entradas').fetchone()[0] == 0
+
+        monkeypatch.undo()
+        resumo = importar_arquivo(db_manager, str(caminho))
+        assert (resumo['entradas'], resumo['despesas']) == (1, 1)
+        assert db_manager.conn.execute('SELECT valor FROM entradas').fetchone()[0] == 1500.0
+    finally:
+        db_manager.close()